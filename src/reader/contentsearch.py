@@ -4,33 +4,140 @@ from whoosh.filedb.filestore import FileStorage
 from whoosh.fields import Schema, NUMERIC, TEXT
 from whoosh.analysis import SimpleAnalyzer, LowercaseFilter, RegexTokenizer
 from whoosh.query import Variations
+from whoosh.searching import ResultsPage
+from whoosh.collectors import TermsCollector
 import whoosh.index as index
 import re
 
 from django.conf import settings
-from django.db.models.signals import post_save
+from django.core.cache import cache
+from django.db import connections
+from django.db.models import Count, Max, Q
+from django.db.models.signals import post_save, post_delete
+from django.core.signals import setting_changed
 from django.dispatch import receiver
 
 from time import time
 import logging
 
-from reader.models import Verse, Division, Work
+from reader.models import Verse, Division, Work, WordDescription, IndexChange
 from reader.language_tools.greek import Greek
-from reader.language_tools import strip_accents, normalize_unicode
-from reader.utils import get_all_related_forms
+from reader.language_tools import strip_accents, strip_accents_word, strip_accents_batch, normalize_unicode
+from reader.utils import get_all_related_form_strings, RelatedFormsTable
 from reader.templatetags.shortcuts import unslugify
 
 import os
+import json
+import shutil
+import hashlib
+import multiprocessing
+import threading
+from functools import lru_cache
+from contextlib import contextmanager
 from collections import OrderedDict # Used to order the stats from the search
+from collections import defaultdict
 
 # Get an instance of a logger
 logger = logging.getLogger(__name__)
 
+class SearcherPool:
+    """
+    Keeps a set of open searchers for an index so that searches can re-use them instead of re-opening
+    the index files and loading the segments for every search.
+
+    Searchers are refreshed when they are taken from the pool so that they reflect the latest generation
+    of the index.
+    """
+
+    def __init__(self, inx, max_size=None):
+        self.inx = inx
+        self.lock = threading.Lock()
+        self.searchers = []
+
+        if max_size is None:
+            self.max_size = settings.SEARCH_SEARCHER_POOL_SIZE
+        else:
+            self.max_size = max_size
+
+    def acquire(self):
+        """
+        Get a searcher for the latest generation of the index. The searcher must be returned with release().
+        """
+
+        with self.lock:
+            if len(self.searchers) > 0:
+                searcher = self.searchers.pop()
+            else:
+                searcher = None
+
+        # Open a new searcher if none were available
+        if searcher is None:
+            return self.inx.searcher()
+
+        # Refresh the searcher in case the index was updated. This returns the same searcher if the index is unchanged.
+        return searcher.refresh()
+
+    def release(self, searcher):
+        """
+        Return the searcher to the pool so that it can be re-used.
+
+        Arguments:
+        searcher -- The searcher obtained from acquire()
+        """
+
+        with self.lock:
+            if len(self.searchers) < self.max_size:
+                self.searchers.append(searcher)
+                return
+
+        # The pool is full so close the searcher
+        searcher.close()
+
+    def close(self):
+        """
+        Close all of the searchers in the pool.
+        """
+
+        with self.lock:
+            searchers = self.searchers
+            self.searchers = []
+
+        for searcher in searchers:
+            searcher.close()
+
+    @contextmanager
+    def searcher(self):
+        """
+        Provides a searcher from the pool that will be returned to the pool when the block exits.
+        """
+
+        searcher = self.acquire()
+
+        try:
+            yield searcher
+        finally:
+            self.release(searcher)
+
 class WorkIndexer:
     """
     The WorkIndexer performs the operations necessary to index Work models using Whoosh.
     """
-    
+
+    # The long-lived index handles and searcher pools for this process (keyed by the index directory)
+    shared_indexes = {}
+    shared_indexes_lock = threading.Lock()
+
+    # The number of verses loaded from the database at a time when indexing
+    VERSE_CHUNK_SIZE = 2000
+
+    # The fields of the verses that the checksum of a work is made from (see get_work_checksum())
+    VERSE_CHECKSUM_FIELDS = ('id', 'division_id', 'content')
+
+    # The states returned by get_work_index_status()
+    WORK_NOT_INDEXED = "not_indexed"
+    WORK_INDEXED = "indexed"
+    WORK_CHANGED = "changed"
+
     @classmethod
     def get_schema(cls):
         """
@@ -107,29 +214,310 @@ class WorkIndexer:
         # Create the verses index
         if create or not index.exists_in(index_dir):
             inx = storage.create_index(schema)
-        
+
+            # Drop the shared searchers since they refer to the index that was just replaced
+            cls.close_shared_index()
+
+            # The works listed in the manifest are no longer in the index
+            cls.delete_manifest(index_dir)
+
         # Open the index
         else:
             inx = whoosh.index.open_dir(index_dir)
-        
+
         # Return a reference to the index
         return inx
-    
+
     @classmethod
-    def is_work_in_index(cls, work):
-        
-        inx = WorkIndexer.get_index()
-        
+    def get_searcher_pool(cls):
+        """
+        Get the searcher pool for the index. The index is opened once per process and the searchers are re-used
+        across searches.
+        """
+
+        index_dir = cls.get_index_dir()
+
+        with cls.shared_indexes_lock:
+            pool = WorkIndexer.shared_indexes.get(index_dir)
+
+        if pool is None:
+            pool = SearcherPool(cls.get_index())
+
+            with cls.shared_indexes_lock:
+                # Use the pool made by another thread if it beat us to it
+                pool = WorkIndexer.shared_indexes.setdefault(index_dir, pool)
+
+        return pool
+
+    @classmethod
+    def get_searcher(cls, inx=None):
+        """
+        Get a searcher to be used in a with statement. The shared searcher pool will be used unless a
+        specific index is provided.
+
+        Arguments:
+        inx -- The Whoosh index to use
+        """
+
+        if inx is None:
+            return cls.get_searcher_pool().searcher()
+        else:
+            return inx.searcher()
+
+    @classmethod
+    def close_shared_index(cls):
+        """
+        Close the shared searchers for the index so that the index will be re-opened on the next search.
+        """
+
+        with cls.shared_indexes_lock:
+            pool = WorkIndexer.shared_indexes.pop(cls.get_index_dir(), None)
+
+        if pool is not None:
+            pool.close()
+
+    @classmethod
+    def is_work_in_index(cls, work, inx=None):
+
         # Perform the search
-        with inx.searcher() as searcher:
-            
-            parser = QueryParser("work", inx.schema)
+        with cls.get_searcher(inx) as searcher:
+
+            parser = QueryParser("work", searcher.schema)
             query_str = work.title_slug
             search_query = parser.parse(query_str)
             
             results = searcher.search_page(search_query, 1, 1)
             return len(results) > 0
             
+    @classmethod
+    def get_manifest_file(cls, index_dir=None):
+        """
+        Gets the path of the manifest that lists the works in the index. The manifest is stored next to the index
+        directory.
+        
+        Arguments:
+        index_dir -- The directory of the index (the main index will be used if none)
+        """
+        
+        if index_dir is None:
+            index_dir = cls.get_index_dir()
+        
+        return os.path.normpath(index_dir) + "_manifest.json"
+    
+    @classmethod
+    def load_manifest(cls, index_dir=None):
+        """
+        Loads the manifest of the works in the index. This returns a dictionary keyed by the slug of the work with the
+        number of verses, the highest verse ID (see get_work_fingerprints()), the checksum of the verses (see
+        get_work_checksum()) and the index generation that the work was committed in. None will be returned if the
+        manifest doesn't exist.
+        
+        Arguments:
+        index_dir -- The directory of the index (the main index will be used if none)
+        """
+        
+        manifest_file = cls.get_manifest_file(index_dir)
+        
+        if not os.path.exists(manifest_file):
+            return None
+        
+        with open(manifest_file, 'r') as f:
+            return json.load(f)
+    
+    @classmethod
+    def save_manifest(cls, manifest, index_dir=None):
+        """
+        Saves the manifest of the works in the index. The file is replaced atomically so that an interrupted write
+        won't corrupt it.
+        
+        Arguments:
+        manifest -- The manifest (see load_manifest())
+        index_dir -- The directory of the index (the main index will be used if none)
+        """
+        
+        manifest_file = cls.get_manifest_file(index_dir)
+        
+        with open(manifest_file + ".tmp", 'w') as f:
+            json.dump(manifest, f, indent=1, sort_keys=True)
+        
+        os.replace(manifest_file + ".tmp", manifest_file)
+    
+    @classmethod
+    def delete_manifest(cls, index_dir=None):
+        """
+        Deletes the manifest of the works in the index.
+        
+        Arguments:
+        index_dir -- The directory of the index (the main index will be used if none)
+        """
+        
+        manifest_file = cls.get_manifest_file(index_dir)
+        
+        if os.path.exists(manifest_file):
+            os.remove(manifest_file)
+    
+    @classmethod
+    def record_indexed_works(cls, indexed_works, generation, index_dir=None):
+        """
+        Adds the given works to the manifest.
+        
+        Arguments:
+        indexed_works -- A dictionary of the works keyed by the slug with the fingerprint (see get_work_fingerprints())
+        generation -- The generation of the index that the works were committed in
+        index_dir -- The directory of the index (the main index will be used if none)
+        """
+        
+        if len(indexed_works) == 0:
+            return
+        
+        manifest = cls.load_manifest(index_dir) or {}
+        
+        for work_title_slug, entry in indexed_works.items():
+            manifest[work_title_slug] = dict(entry, generation=generation)
+        
+        cls.save_manifest(manifest, index_dir)
+    
+    @classmethod
+    def remove_indexed_works(cls, work_title_slugs, index_dir=None):
+        """
+        Removes the given works from the manifest.
+        
+        Arguments:
+        work_title_slugs -- The slugs of the works to remove
+        index_dir -- The directory of the index (the main index will be used if none)
+        """
+        
+        if len(work_title_slugs) == 0:
+            return
+        
+        manifest = cls.load_manifest(index_dir)
+        
+        if manifest is None:
+            return
+        
+        for work_title_slug in work_title_slugs:
+            manifest.pop(work_title_slug, None)
+        
+        cls.save_manifest(manifest, index_dir)
+    
+    @classmethod
+    def get_work_fingerprints(cls, works=None):
+        """
+        Gets the number of verses and the highest verse ID of the works using a single query. These are recorded in the
+        manifest to detect the works that were re-imported or had verses added or removed since they were indexed
+        without reading the verses. Verses that were changed in place are only detected by comparing the checksums
+        (see get_work_checksum()); the changes made through the models are applied from the change journal instead (see
+        apply_index_changes()).
+        
+        Returns a dictionary of the fingerprints keyed by the work ID (see get_work_fingerprint()).
+        
+        Arguments:
+        works -- The works to get the fingerprints of (all works will be included if none)
+        """
+        
+        verses = Verse.objects.all()
+        
+        if works is not None:
+            verses = verses.filter(division__work__in=works)
+        
+        fingerprints = {}
+        
+        for work_id, verse_count, max_verse_id in verses.order_by().values('division__work_id').annotate(verse_count=Count('id'), max_verse_id=Max('id')).values_list('division__work_id', 'verse_count', 'max_verse_id'):
+            fingerprints[work_id] = {'verse_count': verse_count, 'max_verse_id': max_verse_id}
+        
+        return fingerprints
+    
+    @classmethod
+    def get_work_fingerprint(cls, work, fingerprints=None):
+        """
+        Gets the fingerprint of the work (a dictionary with the number of verses and the highest verse ID).
+        
+        Arguments:
+        work -- The work
+        fingerprints -- The fingerprints loaded with get_work_fingerprints() (they will be loaded for the work if none)
+        """
+        
+        if fingerprints is None:
+            fingerprints = cls.get_work_fingerprints([work])
+        
+        return fingerprints.get(work.id, {'verse_count': 0, 'max_verse_id': None})
+    
+    @classmethod
+    def update_checksum(cls, checksum, values):
+        """
+        Adds the values of a verse (see VERSE_CHECKSUM_FIELDS) to the checksum.
+        
+        Arguments:
+        checksum -- The checksum (a hashlib object)
+        values -- The values of the fields of the verse
+        """
+        
+        checksum.update(repr(tuple(values)).encode('utf-8'))
+    
+    @classmethod
+    def get_work_checksum(cls, work):
+        """
+        Gets the checksum of the verses of the work. This is the same checksum that index_work() records in the manifest
+        while it reads the verses. This reads all of the verses of the work so it is only used when verifying the works
+        (see get_work_index_status()) and for works that were partially re-indexed.
+        
+        Arguments:
+        work -- The work
+        """
+        
+        checksum = hashlib.sha1()
+        
+        verses = Verse.objects.filter(division__work=work).order_by('division_id', 'sequence_number', 'id').values_list(*cls.VERSE_CHECKSUM_FIELDS)
+        
+        for values in verses.iterator(chunk_size=cls.VERSE_CHUNK_SIZE):
+            cls.update_checksum(checksum, values)
+        
+        return checksum.hexdigest()
+    
+    @classmethod
+    def get_work_index_status(cls, work, manifest, fingerprints=None, indexed_works=None, verify=False):
+        """
+        Determines if the work is in the index and whether it changed since it was indexed. This returns
+        WORK_NOT_INDEXED, WORK_INDEXED or WORK_CHANGED.
+        
+        The manifest is used to answer this. The index is only searched if the work is not in the manifest since the
+        index may have been made before the manifest was kept; the work is then added to indexed_works so that the
+        caller can add it to the manifest.
+        
+        Only works that had verses added or removed (or were re-imported) are detected as changed unless verify is
+        set, in which case the checksum of the verses is compared too (which requires reading all of the verses).
+        
+        Arguments:
+        work -- The work
+        manifest -- The manifest of the index (see load_manifest())
+        fingerprints -- The fingerprints of the works (see get_work_fingerprints())
+        indexed_works -- A dictionary that the works found by searching the index will be added to
+        verify -- Compare the checksum of the verses to detect verses that were changed in place
+        """
+        
+        entry = (manifest or {}).get(work.title_slug)
+        fingerprint = cls.get_work_fingerprint(work, fingerprints)
+        
+        # Search the index if the work isn't in the manifest
+        if entry is None:
+            
+            if not cls.is_work_in_index(work):
+                return cls.WORK_NOT_INDEXED
+            
+            if indexed_works is not None:
+                indexed_works[work.title_slug] = fingerprint
+            
+            return cls.WORK_INDEXED
+        
+        if entry.get('verse_count') != fingerprint['verse_count'] or entry.get('max_verse_id') != fingerprint['max_verse_id']:
+            return cls.WORK_CHANGED
+        
+        # Compare the checksums to detect verses that were changed without the change journal (such as by an update)
+        if verify and entry.get('checksum') != cls.get_work_checksum(work):
+            return cls.WORK_CHANGED
+        
+        return cls.WORK_INDEXED
+    
     @classmethod
     def get_writer(cls, inx=None):
         """
@@ -142,9 +530,16 @@ class WorkIndexer:
         return inx.writer(limitmb=settings.SEARCH_INDEXER_MEMORY_MB, procs=settings.SEARCH_INDEXER_PROCS)
     
     @classmethod
-    def index_all_works(cls, commit_only_once=False, index_only_if_empty=True):
+    def index_all_works(cls, commit_only_once=False, index_only_if_empty=True, verify=False):
         """
         Indexes all verses for all works.
+        
+        Arguments:
+        commit_only_once -- Commit once at the end instead of after each work
+        index_only_if_empty -- Skip the works that are already in the index (works that had verses added or removed
+                               since they were indexed will be re-indexed)
+        verify -- Compare the checksums of the verses of the works that are already in the index to re-index those
+                  whose verses were changed in place too (see get_work_index_status())
         """
         
         logger.info("Beginning updating the index of all available works, indexing_only_if_empty=%r", index_only_if_empty)
@@ -157,25 +552,386 @@ class WorkIndexer:
         else:
             writer = None
         
+        verse_count = 0
+        indexed_works = {}
+        
+        manifest = cls.load_manifest()
+        
+        if index_only_if_empty:
+            fingerprints = cls.get_work_fingerprints()
+        
         for work in Work.objects.all():
             
             # If we are only indexing if the index does not contain the document, then check first
-            if index_only_if_empty and cls.is_work_in_index(work):
-                logger.info("Work already in index and will be skipped, work=%s", str(work.title_slug))
+            if index_only_if_empty:
+                status = cls.get_work_index_status(work, manifest, fingerprints, indexed_works, verify)
                 
-                # Skip to the next document
-                continue
+                if status == cls.WORK_INDEXED:
+                    logger.info("Work already in index and will be skipped, work=%s", str(work.title_slug))
+                    
+                    # Skip to the next document
+                    continue
+                
+                # Remove the existing documents if the work changed
+                elif status == cls.WORK_CHANGED:
+                    logger.info("Work changed since it was indexed and will be re-indexed, work=%s", str(work.title_slug))
+                    
+                    if not commit_only_once:
+                        cls.delete_work_index(work)
+                    else:
+                        cls.delete_work_documents(writer, work.title_slug)
             
             if not commit_only_once:
-                cls.index_work(work, commit=True)
+                verse_count += cls.index_work(work, commit=True, indexed_works=indexed_works)
             else:
-                cls.index_work(work, commit=False, writer=writer)
+                verse_count += cls.index_work(work, commit=False, writer=writer, indexed_works=indexed_works)
     
         # Commit at the end to reduce the time it takes to index
         if commit_only_once and writer is not None:
             writer.commit()
+            cls.record_indexed_works(indexed_works, writer.generation)
+        
+        # Update the manifest once for all of the works
+        elif len(indexed_works) > 0:
+            cls.record_indexed_works(indexed_works, cls.get_index().latest_generation())
+        
+        duration = time() - start_time
+        
+        logger.info("Successfully indexed all works, verses=%i, duration=%i, verses_per_second=%i", verse_count, duration, verse_count / max(duration, 0.001))
+        
+        return verse_count
+    
+    @classmethod
+    def apply_index_changes(cls, batch_size=1000):
+        """
+        Applies the changes recorded in the change journal (see IndexChange) to the index. Only the documents of the
+        verses affected by the changes are replaced. The changes are applied in batches with one commit per batch.
+        
+        Returns the number of changes that were applied.
+        
+        Arguments:
+        batch_size -- The number of changes to apply per commit
+        """
+        
+        # Record the start time so that we can measure performance
+        start_time = time()
+        
+        change_count = 0
+        verse_count = 0
+        
+        while True:
+            changes = list(IndexChange.objects.order_by('id')[:batch_size])
+            
+            if len(changes) == 0:
+                break
+            
+            # Determine what changed (an object may be listed several times)
+            work_ids = set()
+            division_ids = set()
+            verse_ids = set()
+            deleted_verse_ids = set()
+            deleted_work_title_slugs = set()
+            
+            for change in changes:
+                if change.object_type == IndexChange.WORK and change.deleted:
+                    if change.title_slug is not None:
+                        deleted_work_title_slugs.add(change.title_slug)
+                    
+                elif change.object_type == IndexChange.WORK:
+                    work_ids.add(change.object_id)
+                    
+                elif change.object_type == IndexChange.DIVISION and not change.deleted:
+                    division_ids.add(change.object_id)
+                    
+                elif change.object_type == IndexChange.VERSE and change.deleted:
+                    deleted_verse_ids.add(change.object_id)
+                    
+                elif change.object_type == IndexChange.VERSE:
+                    verse_ids.add(change.object_id)
+            
+            # The deletion of divisions is recorded as a change to their work (see Division.delete())
+            verse_ids.difference_update(deleted_verse_ids)
+            
+            writer = cls.get_writer()
+            
+            for verse_id in deleted_verse_ids:
+                writer.delete_by_term('verse_id', verse_id)
+            
+            # Remove the documents of the deleted works; a work that was re-imported with the same slug is re-indexed
+            # since its documents are removed too
+            for work_title_slug in deleted_work_title_slugs:
+                cls.delete_work_documents(writer, work_title_slug)
+            
+            work_ids.update(Work.objects.filter(title_slug__in=deleted_work_title_slugs).values_list('id', flat=True))
+            
+            # Get the works that have verses that need to be re-indexed
+            changed_works = set(work_ids)
+            changed_works.update(Division.objects.filter(id__in=division_ids).values_list('work_id', flat=True))
+            changed_works.update(Verse.objects.filter(id__in=verse_ids).values_list('division__work_id', flat=True))
+            
+            indexed_works = {}
+            updated_works = []
+            
+            for work in Work.objects.filter(id__in=changed_works):
+                
+                # Re-index the entire work if the work itself changed (the title or authors may be different); the
+                # existing documents are removed since the verses of deleted divisions aren't recorded individually
+                if work.id in work_ids:
+                    cls.delete_work_documents(writer, work.title_slug)
+                    verses = None
+                
+                # Otherwise, re-index the verses that changed and the verses of the divisions that changed (including
+                # those beneath them since the description of the parent division is part of the section)
+                else:
+                    verses = Verse.objects.filter(Q(id__in=verse_ids) | Q(division_id__in=cls.get_division_subtree_ids(work, division_ids)))
+                    updated_works.append(work)
+                
+                verse_count += cls.index_work(work, commit=False, writer=writer, verses=verses, update=True, indexed_works=indexed_works)
+            
+            # Don't optimize since that would rewrite the entire index
+            writer.commit()
+            
+            # Update the manifest (the fingerprints of the works that were only partially re-indexed need to be loaded)
+            fingerprints = cls.get_work_fingerprints(updated_works)
+            
+            for work in updated_works:
+                indexed_works[work.title_slug] = dict(cls.get_work_fingerprint(work, fingerprints), checksum=cls.get_work_checksum(work))
+            
+            cls.remove_indexed_works(deleted_work_title_slugs)
+            cls.record_indexed_works(indexed_works, writer.generation)
+            
+            # Remove the changes that were applied
+            IndexChange.objects.filter(id__lte=changes[-1].id).delete()
+            change_count += len(changes)
+        
+        logger.info("Successfully applied the index changes, changes=%i, verses=%i, duration=%i", change_count, verse_count, time() - start_time)
+        
+        return change_count
+    
+    @classmethod
+    def get_division_subtree_ids(cls, work, division_ids):
+        """
+        Gets the IDs of the given divisions within the work along with the IDs of all of the divisions beneath them.
+        
+        Arguments:
+        work -- The work that the divisions are in
+        division_ids -- The IDs of the divisions
+        """
+        
+        # Build a list of the children of each division
+        children = defaultdict(list)
+        
+        for division_id, parent_division_id in Division.objects.filter(work=work).values_list('id', 'parent_division_id'):
+            children[parent_division_id].append(division_id)
+        
+        # Walk down the hierarchy from the divisions that are in the work
+        subtree_ids = set()
+        pending = [division_id for child_ids in children.values() for division_id in child_ids if division_id in division_ids]
+        
+        while len(pending) > 0:
+            division_id = pending.pop()
+            
+            if division_id not in subtree_ids:
+                subtree_ids.add(division_id)
+                pending.extend(children[division_id])
+        
+        return subtree_ids
+    
+    @classmethod
+    def get_shards_dir(cls):
+        """
+        Gets the directory where the indexes built by the worker processes of index_all_works_parallel() are stored
+        until they are merged into the index.
+        """
+        
+        return cls.get_index_dir() + "_shards"
+    
+    @classmethod
+    def get_shard_numbers(cls):
+        """
+        Gets the numbers of the shards that exist (and have not been merged yet).
+        """
+        
+        shards_dir = cls.get_shards_dir()
+        
+        if not os.path.exists(shards_dir):
+            return []
+        
+        return sorted([int(name) for name in os.listdir(shards_dir) if name.isdigit() and index.exists_in(os.path.join(shards_dir, name))])
+    
+    @classmethod
+    def get_shard_dir(cls, shard_number):
+        """
+        Gets the directory of a shard.
+        
+        Arguments:
+        shard_number -- The number of the shard
+        """
+        
+        return os.path.join(cls.get_shards_dir(), str(shard_number))
+    
+    @classmethod
+    def get_shard_index(cls, shard_number):
+        """
+        Get the Whoosh index of a shard, creating it if necessary.
+        
+        Arguments:
+        shard_number -- The number of the shard
+        """
+        
+        shard_dir = cls.get_shard_dir(shard_number)
+        
+        if index.exists_in(shard_dir):
+            return whoosh.index.open_dir(shard_dir)
+        
+        if not os.path.exists(shard_dir):
+            os.makedirs(shard_dir)
+        
+        return FileStorage(shard_dir).create_index(cls.get_schema())
+    
+    @classmethod
+    def index_shard(cls, shard_number, work_ids):
+        """
+        Indexes the given works into a shard. This is run by each of the worker processes of index_all_works_parallel().
+        
+        The changes are committed after each work so that the works that were completed are retained if the process
+        fails partway through.
+        
+        Arguments:
+        shard_number -- The number of the shard to write to
+        work_ids -- The IDs of the works to index
+        """
+        
+        inx = cls.get_shard_index(shard_number)
+        
+        verse_count = 0
+        
+        for work in Work.objects.filter(id__in=work_ids):
+            verse_count += cls.index_work(work, commit=True, writer=cls.get_writer(inx))
+        
+        return verse_count
+    
+    @classmethod
+    def merge_shards(cls):
+        """
+        Merge the shards into the index and remove them.
+        """
+        
+        shard_numbers = cls.get_shard_numbers()
+        
+        if len(shard_numbers) == 0:
+            return
+        
+        writer = cls.get_writer()
+        readers = []
+        
+        # Get the works in the shards
+        indexed_works = {}
+        
+        for shard_number in shard_numbers:
+            indexed_works.update(cls.load_manifest(cls.get_shard_dir(shard_number)) or {})
+        
+        # Remove the existing documents of works that were re-indexed since they changed
+        manifest = cls.load_manifest() or {}
+        
+        for work_title_slug in indexed_works:
+            if work_title_slug in manifest:
+                cls.delete_work_documents(writer, work_title_slug)
+        
+        try:
+            for shard_number in shard_numbers:
+                reader = cls.get_shard_index(shard_number).reader()
+                readers.append(reader)
+                
+                writer.add_reader(reader)
+            
+            writer.commit()
+        finally:
+            for reader in readers:
+                reader.close()
+        
+        cls.record_indexed_works(indexed_works, writer.generation)
+        
+        shutil.rmtree(cls.get_shards_dir(), ignore_errors=True)
+        
+        logger.info("Successfully merged the shards into the index, shards=%i", len(shard_numbers))
+    
+    @classmethod
+    def index_all_works_parallel(cls, jobs, index_only_if_empty=True, verify=False):
+        """
+        Indexes all verses for all works using several processes. The works are split across the processes which each
+        write to a shard of their own; the shards are then merged into the index.
+        
+        Works that are already in a shard (because an earlier run was interrupted) are not indexed again.
+        
+        Arguments:
+        jobs -- The number of processes to use
+        index_only_if_empty -- Skip the works that are already in the index
+        verify -- Compare the checksums of the verses of the works that are already in the index (see
+                  get_work_index_status())
+        """
+        
+        logger.info("Beginning updating the index of all available works, jobs=%i, indexing_only_if_empty=%r", jobs, index_only_if_empty)
+        
+        # Record the start time so that we can measure performance
+        start_time = time()
+        
+        # Determine which works still need to be indexed
+        sharded_works = {}
+        
+        for shard_number in cls.get_shard_numbers():
+            sharded_works.update(cls.load_manifest(cls.get_shard_dir(shard_number)) or {})
+        
+        manifest = cls.load_manifest()
+        fingerprints = cls.get_work_fingerprints() if index_only_if_empty else None
+        found_works = {}
+        works = []
+        
+        for work in Work.objects.annotate(verse_count=Count('division__verse')).order_by('-verse_count'):
+            
+            if work.title_slug in sharded_works:
+                logger.info("Work already in a shard and will be skipped, work=%s", str(work.title_slug))
+            
+            elif index_only_if_empty and cls.get_work_index_status(work, manifest, fingerprints, found_works, verify) == cls.WORK_INDEXED:
+                logger.info("Work already in index and will be skipped, work=%s", str(work.title_slug))
+            
+            else:
+                works.append(work)
+        
+        # Add the works that were found by searching the index to the manifest
+        if len(found_works) > 0:
+            cls.record_indexed_works(found_works, cls.get_index().latest_generation())
+        
+        # Split the works across the shards such that each gets a similar number of verses (largest works first)
+        shards = [[] for i in range(max(jobs, 1))]
+        shard_sizes = [0] * len(shards)
         
-        logger.info("Successfully indexed all works, duration=%i", time() - start_time )
+        for work in works:
+            shard_number = shard_sizes.index(min(shard_sizes))
+            
+            shards[shard_number].append(work.id)
+            shard_sizes[shard_number] += work.verse_count
+        
+        shard_args = [(shard_number, work_ids) for shard_number, work_ids in enumerate(shards) if len(work_ids) > 0]
+        
+        # Index the shards
+        if jobs <= 1:
+            verse_counts = [cls.index_shard(*args) for args in shard_args]
+        else:
+            # Close the database connections so that each process opens its own
+            connections.close_all()
+            
+            with multiprocessing.Pool(jobs) as pool:
+                verse_counts = pool.starmap(cls.index_shard, shard_args)
+        
+        cls.merge_shards()
+        
+        verse_count = sum(verse_counts)
+        duration = time() - start_time
+        
+        logger.info("Successfully indexed all works, jobs=%i, verses=%i, duration=%i, verses_per_second=%i", jobs, verse_count, duration, verse_count / max(duration, 0.001))
+        
+        return verse_count
     
     @classmethod
     def delete_work_index(cls, work=None, work_title_slug=None):
@@ -195,20 +951,43 @@ class WorkIndexer:
         
         inx = cls.get_index(False)
         
-        parser = QueryParser("content", inx.schema)
-        inx.delete_by_query(parser.parse(u'work:' + work_title_slug))
         writer = cls.get_writer(inx)
-        writer.commit(optimize=True)
+        cls.delete_work_documents(writer, work_title_slug)
+        
+        # Don't optimize since that would rewrite the entire index
+        writer.commit()
+        
+        cls.remove_indexed_works([work_title_slug])
     
     @classmethod
-    def index_work(cls, work, commit=True, writer=None):
+    def delete_work_documents(cls, writer, work_title_slug):
+        """
+        Deletes the documents of the given work using the provided writer. The deletion is not committed.
+        
+        Arguments:
+        writer -- The index writer
+        work_title_slug -- The slug of the work to delete the documents of
+        """
+        
+        parser = QueryParser("content", writer.schema)
+        writer.delete_by_query(parser.parse(u'work:' + work_title_slug))
+    
+    @classmethod
+    def index_work(cls, work, commit=True, writer=None, verses=None, update=False, indexed_works=None):
         """
         Indexes all verses within the given work.
 
+        The divisions of the work are loaded in a single query and the verses are streamed in chunks so that the number
+        of queries doesn't depend on the size of the work.
+
         Arguments:
         work -- The work that the verse is associated with
         commit -- Indicates whether the changes should be committed to the persistence
         writer -- The index writer to write to.
+        verses -- A queryset of the verses of the work to index (all verses will be indexed if none)
+        update -- Replace the existing documents for the verses
+        indexed_works -- A dictionary that the work will be added to for adding to the manifest once the changes are
+                         committed (the manifest is updated directly if this function commits and this isn't provided)
         """
         
         # Record the start time so that we can measure performance
@@ -220,15 +999,64 @@ class WorkIndexer:
             
             commit = True
         
-        # Index eacn division in the work
+        # Load the divisions along with the hierarchy so that the section text can be made without additional queries
+        divisions = {}
+        
         for division in Division.objects.filter(work=work):
-            cls.index_division(division, commit=False, writer=writer)
+            division.work = work
+            divisions[division.id] = division
+        
+        Division.preload_parent_divisions(list(divisions.values()))
+        
+        # Make the text that is shared by the verses in each division
+        author_str = cls.get_author_index_text(work)
+        sections = {}
+        
+        for division in divisions.values():
+            sections[division.id] = cls.get_section_index_text(division)
+        
+        # Keep the fingerprint and the checksum of the work so that the manifest can be used to detect changes to the
+        # work (see get_work_index_status())
+        entire_work = verses is None
+        checksum = hashlib.sha1()
+        
+        # Index each verse in the work
+        verse_count = 0
+        max_verse_id = None
+        
+        if verses is None:
+            verses = Verse.objects.all()
+        
+        verses = verses.filter(division__work=work).defer('original_content').order_by('division_id', 'sequence_number', 'id')
+        
+        for verse in verses.iterator(chunk_size=cls.VERSE_CHUNK_SIZE):
+            division = divisions[verse.division_id]
+            
+            cls.add_verse_document(writer, verse, work, division, author_str, sections[division.id], update)
+            verse_count = verse_count + 1
+            max_verse_id = verse.id if max_verse_id is None else max(max_verse_id, verse.id)
+            
+            if entire_work:
+                cls.update_checksum(checksum, [getattr(verse, field) for field in cls.VERSE_CHECKSUM_FIELDS])
+        
+        entry = {'verse_count': verse_count, 'max_verse_id': max_verse_id, 'checksum': checksum.hexdigest()}
         
         # Commit the changes if necessary
         if commit and writer is not None:
             writer.commit()
-            
-        logger.info('Successfully indexed work, work="%s", duration=%i', str(work.title_slug), time() - start_time )
+        
+        # Add the work to the manifest (or to the works that the caller will add to it)
+        if entire_work and indexed_works is not None:
+            indexed_works[work.title_slug] = entry
+        
+        elif entire_work and commit:
+            cls.record_indexed_works({work.title_slug: entry}, writer.generation, writer.storage.folder)
+        
+        duration = time() - start_time
+        
+        logger.info('Successfully indexed work, work="%s", verses=%i, duration=%i, verses_per_second=%i', str(work.title_slug), verse_count, duration, verse_count / max(duration, 0.001))
+        
+        return verse_count
     
     @classmethod
     def index_division(cls, division, work=None, commit=False, writer=None):
@@ -245,19 +1073,39 @@ class WorkIndexer:
             
             commit = True
         
-        for verse in Verse.objects.filter(division=division):
-            cls.index_verse(verse, division=division, writer=writer, commit=False)
-            
         if work is None:
             work = division.work
+        
+        # Make the text that is shared by the verses in the division
+        author_str = cls.get_author_index_text(work)
+        section_str = cls.get_section_index_text(division)
+        
+        for verse in Verse.objects.filter(division=division).defer('original_content').iterator(chunk_size=cls.VERSE_CHUNK_SIZE):
+            cls.add_verse_document(writer, verse, work, division, author_str, section_str)
             
         if commit and writer is not None:
             writer.commit()
         
-        if work is not None:
-            logger.info('Successfully indexed division, division="%s", work="%s"', str(division), str(work.title_slug) )
+        if work is not None:
+            logger.debug('Successfully indexed division, division="%s", work="%s"', str(division), str(work.title_slug) )
+        else:
+            logger.debug('Successfully indexed division, division="%s"', str(division) )
+    
+    @classmethod
+    def get_author_index_text(cls, work):
+        """
+        Gets the name of the author of the given work (or an empty string if the work has no author).
+        
+        Arguments:
+        work -- The work to get the author of
+        """
+        
+        author = work.authors.first()
+        
+        if author is not None:
+            return author.name
         else:
-            logger.info('Successfully indexed division, division="%s"', str(division) )
+            return ''
     
     @classmethod
     def get_section_index_text(cls, division):
@@ -269,18 +1117,15 @@ class WorkIndexer:
         """
         descriptions = []
         
-        descriptions.append(division.get_division_description(use_titles=False))
-        descriptions.append(division.get_division_description(use_titles=True))
-        
-        # Now add in the parent divisions so that they can be searched without having to specifically define the entire hierarchy
-        next_division = division.parent_division
+        # Get the path to the division (this is materialized on the division so the hierarchy needn't be walked)
+        descriptors = division.get_division_indicators()
+        titles = division.get_division_titles()
         
-        # Keep recursing upwards until we hit the top
-        while next_division is not None:
-            descriptions.append(next_division.get_division_description(use_titles=False))
-            descriptions.append(next_division.get_division_description(use_titles=True))
-            
-            next_division = next_division.parent_division
+        # Add the division and then the parent divisions so that they can be searched without having to specifically
+        # define the entire hierarchy
+        for depth in range(len(descriptors), 0, -1):
+            descriptions.append(Division.make_division_description(descriptors[:depth]))
+            descriptions.append(Division.make_division_description(titles[:depth]))
 
         return ",".join(descriptions)
     
@@ -321,11 +1166,26 @@ class WorkIndexer:
         if work is None and division is not None:
             work = division.work
         
-        # Get the author
-        if work.authors.count() > 0:
-            author_str = work.authors.all()[:1][0].name
-        else:
-            author_str = ''
+        cls.add_verse_document(writer, verse, work, division, cls.get_author_index_text(work), cls.get_section_index_text(division))
+    
+        # Commit it
+        if commit:
+            writer.commit()
+    
+    @classmethod
+    def add_verse_document(cls, writer, verse, work, division, author_str, section_str, update=False):
+        """
+        Adds the document for the provided verse to the writer.
+        
+        Arguments:
+        writer -- The index writer to write to
+        verse -- The verse to index
+        work -- The work that the verse is associated with
+        division -- The division that the verse is associated with
+        author_str -- The name of the author of the work (see get_author_index_text())
+        section_str -- The description of the division (see get_section_index_text())
+        update -- Replace the existing document for the verse
+        """
         
         # Prepare the content for saving
         if verse.content is not None and len(verse.content) > 0:
@@ -340,28 +1200,32 @@ class WorkIndexer:
         else:
             no_diacritics = None
         
+        # Remove the existing document if the verse no longer has any content
+        if content is None and update:
+            writer.delete_by_term('verse_id', verse.id)
+        
         if content is not None:
+            
+            if update:
+                add_document = writer.update_document
+            else:
+                add_document = writer.add_document
+            
             # Add the content
-            writer.add_document(content       = cls.replace_empty_string(content),
-                                no_diacritics = cls.replace_empty_string(no_diacritics),
-                                verse_id      = verse.id,
-                                work_id       = work.title_slug,
-                                section_id    = division.title_slug,
-                                work          = work.title + "," + work.title_slug,
-                                section       = cls.get_section_index_text(division),
-                                author        = author_str
-                                )
-    
-        # Commit it
-        if commit:
-            writer.commit()
-    
-        #logger.info('Successfully indexed verse, verse=%s, division="%s", work="%s"', str(verse), str(division), str(work.title_slug) )
-        logger.info('Successfully indexed verse, verse=%s, division="%s", work="%s"', str(verse), division.get_division_description(use_titles=False), str(work.title_slug) )
+            add_document(content       = cls.replace_empty_string(content),
+                         no_diacritics = cls.replace_empty_string(no_diacritics),
+                         verse_id      = verse.id,
+                         work_id       = work.title_slug,
+                         section_id    = division.title_slug,
+                         work          = work.title + "," + work.title_slug,
+                         section       = section_str,
+                         author        = author_str
+                         )
         
 class VerseSearchResults:
     
-    def add_to_results_string(self, to_str, from_str, separator="..."):
+    @classmethod
+    def add_to_results_string(cls, to_str, from_str, separator="..."):
         
         if to_str is None:
             to_str = ''
@@ -375,32 +1239,84 @@ class VerseSearchResults:
                 
         return to_str
     
-    def get_highlights(self, result, verse):
+    @classmethod
+    def get_highlights(cls, result, verse, no_diacritics=None):
         
         highlights_str = ''
         
-        highlights_str = self.add_to_results_string(highlights_str, result.highlights("content", text=normalize_unicode(verse.content)))
+        highlights_str = cls.add_to_results_string(highlights_str, result.highlights("content", text=normalize_unicode(verse.content)))
         
-        highlights_str = self.add_to_results_string(highlights_str, result.highlights("no_diacritics", text=strip_accents(verse.content)) )        
+        # Strip the diacritical marks unless this was already done
+        if no_diacritics is None:
+            no_diacritics = strip_accents(verse.content)
+        
+        highlights_str = cls.add_to_results_string(highlights_str, result.highlights("no_diacritics", text=no_diacritics) )        
     
         return highlights_str
-        
+
+    @classmethod
+    def load_verses(cls, verse_ids):
+        """
+        Load the verses for the given IDs along with their divisions, works and parent divisions. This uses a
+        fixed number of queries regardless of how many verses are requested.
+
+        Arguments:
+        verse_ids -- The IDs of the verses to load
+        """
+
+        verses = {}
+
+        if len(verse_ids) == 0:
+            return verses
+
+        for verse in Verse.objects.filter(id__in=verse_ids).select_related('division__work'):
+            verses[verse.id] = verse
+
+        # Load the parent divisions and the verse counts so that the results can be described without additional queries
+        Division.preload_parent_divisions([verse.division for verse in verses.values()])
+        Division.preload_verse_counts([verse.division for verse in verses.values()])
+
+        return verses
+
+    @classmethod
+    def make_results(cls, results):
+        """
+        Make a list of VerseSearchResult instances (with the verses and the highlights) for the given Whoosh hits.
+
+        Arguments:
+        results -- The Whoosh hits
+        """
+
+        search_results = []
+
+        # Get the verses so that the highlighting can be done
+        verses = cls.load_verses([r['verse_id'] for r in results])
+
+        # Strip the diacritical marks from all of the verses at once
+        verses_no_diacritics = dict(zip(verses.keys(), strip_accents_batch([verse.content for verse in verses.values()])))
+
+        # Create the list of search results
+        for r in results:
+
+            verse = verses.get(r['verse_id'])
+
+            # Skip hits for verses that no longer exist (the index may be out of date)
+            if verse is None:
+                logger.warning("Unable to find verse for search result, verse_id=%r", r['verse_id'])
+                continue
+
+            highlights = cls.get_highlights(r, verse, verses_no_diacritics[verse.id])
+
+            search_results.append(VerseSearchResult(verse, highlights))
+
+        return search_results
+
     def __init__(self, results, page, pagelen, use_estimated_length=False ):
         
         self.page = page
         self.pagelen = pagelen
         
-        self.verses = []
-        
-        # Create the list of search results
-        for r in results:
-            
-            # Get the verse so that the highlighting can be done
-            verse = Verse.objects.get(id=r['verse_id'])
-            
-            highlights = self.get_highlights(r, verse)
-            
-            self.verses.append(VerseSearchResult(verse, highlights))
+        self.verses = self.make_results(results)
         
         if use_estimated_length:
             self.result_count = results.results.estimated_length()
@@ -450,6 +1366,45 @@ class VerseSearchResult:
         self.verse = verse
         self.highlights = highlights
     
+class VerseSearchResultsStream:
+    """
+    Provides all of the results of a search (not just a page of them). The verses are loaded a chunk at a time as the
+    results are iterated so that memory use doesn't grow with the number of results. The result_count and stats are
+    available once the iteration has started.
+    """
+    
+    # The number of verses to load at a time
+    CHUNK_SIZE = 500
+    
+    def __init__(self, search_text, inx=None, include_related_forms=True, ignore_diacritics=False, chunk_size=None):
+        
+        self.search_text = search_text
+        self.inx = inx
+        self.include_related_forms = include_related_forms
+        self.ignore_diacritics = ignore_diacritics
+        self.chunk_size = chunk_size or self.CHUNK_SIZE
+        
+        self.result_count = None
+        self.stats = None
+        
+    def __iter__(self):
+        
+        logger.info('Performing a search for all results, include_related_forms=%r, search_query="%s"', self.include_related_forms, self.search_text)
+        
+        # Perform the search (the searcher stays open until all of the results have been provided)
+        with WorkIndexer.get_searcher(self.inx) as searcher:
+            
+            search_query = parse_search_query(self.search_text, searcher.schema, self.include_related_forms, self.ignore_diacritics)
+            
+            results = run_search(searcher, search_query, None)
+            
+            self.result_count = len(results)
+            self.stats = make_search_stats(searcher, results)
+            
+            for start in range(0, self.result_count, self.chunk_size):
+                for search_result in VerseSearchResults.make_results(results[start:start + self.chunk_size]):
+                    yield search_result
+    
 class GreekVariations(Variations):
     """
     Provides variations of a Greek word including a beta-code representation and all related forms. This way, users can search
@@ -458,6 +1413,10 @@ class GreekVariations(Variations):
     
     variation_fields = ['no_diacritics', 'content']
     
+    # The process-wide cache of variations (see get_cached_variations()) and the related forms table it was made with
+    variations_cache = None
+    variations_table = None
+    
     def __init__(self, fieldname, text, boost=1.0, include_beta_code=True, include_alternate_forms=True):
         super(GreekVariations,self).__init__( fieldname, text, boost )
         
@@ -479,9 +1438,94 @@ class GreekVariations(Variations):
             #logger.debug( "Found cached variations of the search term, word=%s, variations=%r", text, len(cached_variations[signature]) )
             return cached_variations[ signature ]
         
+        # Get the variations from the process-wide cache
+        forms, variation_messages = GreekVariations.get_cached_variations(text, include_beta_code, include_alternate_forms, ignore_diacritics)
+        
+        forms = list(forms)
+        
+        if messages is not None:
+            messages.extend(variation_messages)
+        
+        # Cache the result
+        if cached_variations is not None:
+            cached_variations[ signature ] = forms
+        
+        # Return the forms
+        return forms
+    
+    @classmethod
+    def get_cached_variations(cls, text, include_beta_code=True, include_alternate_forms=True, ignore_diacritics=False):
+        """
+        Get the variations and the messages from looking them up. The results are cached for the entire process (and in the
+        shared cache if SEARCH_VARIATIONS_SHARED_CACHE_TIMEOUT is set) so that popular words don't need to be looked up again.
+        
+        Returns a tuple of the forms and the messages.
+        """
+        
+        related_forms_table = RelatedFormsTable.get_table()
+        
+        # Make the cache if necessary; it is made again if the related forms table was re-made since the variations were cached
+        if GreekVariations.variations_cache is None or GreekVariations.variations_table is not related_forms_table:
+            GreekVariations.variations_cache = lru_cache(maxsize=settings.SEARCH_VARIATIONS_CACHE_SIZE)(GreekVariations.load_cached_variations)
+            GreekVariations.variations_table = related_forms_table
+        
+        return GreekVariations.variations_cache(text, include_beta_code, include_alternate_forms, ignore_diacritics)
+    
+    @staticmethod
+    def load_cached_variations(text, include_beta_code=True, include_alternate_forms=True, ignore_diacritics=False):
+        """
+        Get the variations and the messages from the shared cache or by looking them up (see get_cached_variations()).
+        
+        Returns a tuple of the forms and the messages.
+        """
+        
+        cache_timeout = settings.SEARCH_VARIATIONS_SHARED_CACHE_TIMEOUT
+        
+        # Try to get the entry from the shared cache
+        if cache_timeout is not None:
+            
+            # Hash the key so that it works with memcache
+            key = "GreekVariations(%r,%r,%r,%r)" % (text, include_beta_code, include_alternate_forms, ignore_diacritics)
+            key_hashed = hashlib.sha224(key.encode('utf-8')).hexdigest()
+            
+            cached = cache.get(key_hashed)
+            
+            if cached is not None:
+                return cached
+        
+        forms, messages = GreekVariations.lookup_variations(text, include_beta_code, include_alternate_forms, ignore_diacritics)
+        
+        result = (tuple(forms), tuple(messages))
+        
+        if cache_timeout is not None:
+            cache.set(key_hashed, result, cache_timeout)
+        
+        return result
+    
+    @classmethod
+    def clear_cached_variations(cls):
+        """
+        Clear the process-wide cache of variations and the related forms table (necessary when the word forms change).
+        """
+        
+        GreekVariations.variations_cache = None
+        GreekVariations.variations_table = None
+        
+        RelatedFormsTable.clear()
+    
+    @classmethod
+    def lookup_variations(cls, text, include_beta_code=True, include_alternate_forms=True, ignore_diacritics=False):
+        """
+        Look up the variations of the given word. This uses the precomputed related forms table if it is available and
+        the database otherwise.
+        
+        Returns a tuple of the list of forms and a list of messages describing what was found.
+        """
+        
         logger.debug( "Looking for variations of the search term in order to perform a search, word=%s", text )
         
         forms = []
+        messages = []
         
         if include_beta_code:
             forms.append(normalize_unicode(Greek.beta_code_to_unicode(text)))
@@ -492,46 +1536,50 @@ class GreekVariations(Variations):
             text = normalize_unicode(Greek.beta_code_to_unicode(text))
             
             # Get the related forms
-            related_forms = get_all_related_forms(text, ignore_diacritics)
+            related_forms = cls.get_related_forms(text, ignore_diacritics)
             
             # If we couldn't find any related forms, then try finding them without diacritical marks
             if len(related_forms) == 0 and ignore_diacritics == False:
-                related_forms = get_all_related_forms(text, True)
-                
-                if len(related_forms) > 0:
-                    logger.debug( "Variations could be only found by ignoring diacritical marks, word=%s", text )
+                related_forms = cls.get_related_forms(text, True)
                 
                 # Make a message noting that we couldn't find any variations of the word
-                if len(related_forms) > 0 and messages is not None:
+                if len(related_forms) > 0:
                     messages.append("Variations of %s could be only found by ignoring diacritical marks" % text)
             
             # Make a message noting that we couldn't find any variations of the word
-            if len(related_forms) == 0 and messages is not None:
+            if len(related_forms) == 0:
                 messages.append("No variations of %s could be found" % text)
                 
-            elif len(related_forms) == 0:
-                logger.debug( "No variations could be found, word=%s", text )
-                
             # Make a message noting that variations were found
-            if len(related_forms) > 0 and messages is not None:
+            else:
                 messages.append("Found variations of the search term, word=%s, variations=%r" % (text, len(related_forms)))
             
-            elif len(related_forms) > 0:
-                logger.debug("Found variations of the search term, word=%s, variations=%r", text, len(related_forms))
+            for message in messages:
+                logger.debug(message)
             
             # Add the related forms
             for r in related_forms:
                 if ignore_diacritics:
-                    forms.append(strip_accents(r.form))
+                    forms.append(strip_accents_word(r))
                 else:
-                    forms.append(r.form)
-        
-        # Cache the result
-        if cached_variations is not None:
-            cached_variations[ signature ] = forms
+                    forms.append(r)
         
         # Return the forms
-        return forms
+        return forms, messages
+    
+    @classmethod
+    def get_related_forms(cls, text, ignore_diacritics=False):
+        """
+        Get the related forms of the given word as a list of strings.
+        """
+        
+        # Use the precomputed table if it exists
+        related_forms_table = RelatedFormsTable.get_table()
+        
+        if related_forms_table is not None:
+            return related_forms_table.get_related_forms(text, ignore_diacritics)
+        
+        return list(get_all_related_form_strings(text, ignore_diacritics))
     
     def _btexts(self, ixreader):
         
@@ -551,7 +1599,7 @@ class GreekVariations(Variations):
         
         # If the field doesn't contain diacritics then make sure to strip them from the word
         if ignore_diacritics:
-            prepared_text = strip_accents(prepared_text)
+            prepared_text = strip_accents_word(prepared_text)
             
         # Add the text we are searching for as a variation
         variations.append( prepared_text )
@@ -604,114 +1652,168 @@ def bytes_to_str(bytes_or_str):
     else:
         return bytes_or_str
     
-def search_stats(search_text, inx=None, limit=2000, include_related_forms=True, ignore_diacritics=False):
+def parse_search_query(search_text, schema, include_related_forms=True, ignore_diacritics=False):
     """
-    Search verses for those with the given text and provide high-level stats about the usage of this term. This function is necessary because Whoosh
-    term matching stats indicate the number of verses that contain the given term, not the count of absolute count of the term.
+    Parse the search string into a Whoosh query.
     
     Arguments:
     search_text -- The content to search for
-    inx -- The Whoosh index to use
-    limit -- A limit on the the number of verses to include
+    schema -- The schema of the index that will be searched
     include_related_forms -- Expand the word into all of the related forms
     ignore_diacritics -- Search ignoring dia-critical marks by default
-    """ 
+    """
     
-    logger.info( 'Performing a stats search, limit=%r, include_related_forms=%r, search_query="%s"', limit, include_related_forms, search_text )
+    # Determine which field will be searched by default
+    default_search_field = "content"
+    
+    if ignore_diacritics:
+        default_search_field = "no_diacritics"
+    
+    # Make a parser to convert the incoming search string into a search
+    if include_related_forms:
+        parser = QueryParser(default_search_field, schema, termclass=GreekVariations)
+    else:
+        parser = QueryParser(default_search_field, schema, termclass=GreekBetaCodeVariations)
+    
+    # Parse the search string into an actual search
+    search_query = parser.parse(search_text)
+    
+    logger.debug('Search query parsed, default_search_field="%s", raw_query="%s"', default_search_field, search_query)
+    
+    return search_query
 
-    # Get the index if provided
-    if inx is None:
-        inx = WorkIndexer.get_index()
-        
-    # Perform the search
-    with inx.searcher() as searcher:
-        
-        # Determine which field will be searched by default
-        default_search_field = "content"
-        
-        if ignore_diacritics:
-            default_search_field = "no_diacritics"
-        
-        # Make a parser to convert the incoming search string into a search
-        if include_related_forms:
-            parser = QueryParser(default_search_field, inx.schema, termclass=GreekVariations)
-        else:
-            parser = QueryParser(default_search_field, inx.schema, termclass=GreekBetaCodeVariations)
-        
-        # Parse the search string into an actual search
-        search_query = parser.parse(search_text)
+class TermFrequencyCollector(TermsCollector):
+    """
+    A collector that records the matched terms (like TermsCollector) and that also sums the frequency of each matched term
+    across all of the matching documents along with the number of term matches within each document. This allows the
+    frequency of the terms to be calculated in the same pass as the search without reading the term vectors of each document.
+    """
+    
+    # These are the fields whose term frequencies are counted
+    counted_fields = ('content', 'no_diacritics')
+    
+    def prepare(self, top_searcher, q, context):
+        TermsCollector.prepare(self, top_searcher, q, context)
         
-        logger.debug('Search query parsed, default_search_field="%s", raw_query="%s"', default_search_field, search_query)
+        # A dictionary mapping (fieldname, text) pairs to the number of times the term occurred
+        self.term_frequencies = defaultdict(int)
         
-        results = searcher.search_page(search_query, 1, limit, terms=True, sortedby="verse_id")
+        # A dictionary mapping docnums to the number of term occurrences within the document
+        self.doc_matches = defaultdict(int)
         
-        stats = {
-                 'matches' : 0
-                 }
+    def collect(self, sub_docnum):
+        child = self.child
         
-        # Build a list of the matched terms
-        matched_terms = {}
+        child.collect(sub_docnum)
         
-        if results.results.has_matched_terms():
-            for term, term_matches in results.results.termdocs.items():
-                if term[0] == "content":
-                    matched_terms[bytes_to_str(term[1])] = 0
-                    
-                if term[0] == "no_diacritics":
-                    matched_terms[bytes_to_str(term[1])] = 0
+        global_docnum = child.offset + sub_docnum
         
-        results_count = 0
-                      
-        # Build a list of matched works
-        matched_works = {}
+        # Make sure the document is included even if only matched on other fields
+        self.doc_matches[global_docnum] += 0
         
-        # Iterate through the search results
-        for r in results:
-            
-            results_count += 1
-            matched_in_result = 0
+        for tm in self.termmatchers:
             
-            # For each document: get the matched terms
-            docnum = searcher.document_number(verse_id=r['verse_id'])
-            
-            # Process the main content
-            for term in searcher.vector(docnum,"content").items_as("frequency"):
+            # If the term matcher is matching the current document...
+            if tm.is_active() and tm.id() == sub_docnum:
+                term = tm.term()
                 
-                for matched_term in matched_terms:
-                    
-                    if matched_term == normalize_unicode(term[0]):
-                        matched_terms[matched_term] += term[1]
-                        matched_in_result += term[1]
-                        
-            # Process the no_diacritics content
-            for term in searcher.vector(docnum,"no_diacritics").items_as("frequency"):
+                self.termdocs[term].append(global_docnum)
+                self.docterms[global_docnum].append(term)
                 
-                for matched_term in matched_terms:
+                # Count the number of times the term occurred
+                if term[0] in self.counted_fields:
+                    frequency = tm.value_as("frequency")
                     
-                    if matched_term == normalize_unicode(term[0]):
-                        matched_terms[matched_term] += term[1]
-                        matched_in_result += term[1]
-            
-            stats['matches'] += matched_in_result
-            
-            # Get the stored fields so that we determine which works were matched 
-            fields = searcher.stored_fields(docnum)
-            
-            for field, value in fields.items():
-                
-                # Make sure that this field is for the work
-                if field == "work_id":
+                    self.term_frequencies[term] += frequency
+                    self.doc_matches[global_docnum] += frequency
                     
-                    # Add the number of matches
-                    if value in matched_works:
-                        matched_works[value] = matched_works[value] + matched_in_result
-                    else:
-                        matched_works[value] = matched_in_result
+    def results(self):
+        r = TermsCollector.results(self)
+        
+        r.term_frequencies = dict(self.term_frequencies)
+        r.doc_matches = dict(self.doc_matches)
+        
+        return r
+    
+def run_search(searcher, search_query, limit):
+    """
+    Run the search and collect the matched terms and the term frequencies.
+    
+    Arguments:
+    searcher -- The searcher to perform the search with
+    search_query -- The query to run
+    limit -- The number of results to retrieve or None for all of them (the term frequencies always include all of the matching documents)
+    """
+    
+    collector = TermFrequencyCollector(searcher.collector(limit=limit, sortedby="verse_id"))
+    
+    searcher.search_with_collector(search_query, collector)
+    
+    return collector.results()
+
+def make_search_stats(searcher, results):
+    """
+    Build the high-level stats about the usage of the matched terms from the results of a search.
+    
+    Arguments:
+    searcher -- The searcher that performed the search
+    results -- The Whoosh results from run_search()
+    """
+    
+    stats = {
+             'matches' : 0
+             }
+    
+    # Build a list of the matched terms
+    matched_terms = {}
+    
+    for term, frequency in results.term_frequencies.items():
+        text = bytes_to_str(term[1])
+        matched_terms[text] = matched_terms.get(text, 0) + frequency
+    
+    # Build a list of matched works
+    matched_works = {}
+    
+    for docnum, matched_in_result in results.doc_matches.items():
+        
+        stats['matches'] += matched_in_result
+        
+        # Get the stored fields so that we determine which works were matched
+        value = searcher.stored_fields(docnum).get("work_id")
+        
+        if value is not None:
+            matched_works[value] = matched_works.get(value, 0) + matched_in_result
+    
+    stats['matched_works'] = replace_work_names_with_titles(matched_works)
+    
+    stats['matched_terms'] = OrderedDict(sorted(matched_terms.items(), key=lambda x: x[1], reverse=True))
+    stats['results_count'] = len(results.doc_matches)
+    
+    return stats
+
+def search_stats(search_text, inx=None, limit=2000, include_related_forms=True, ignore_diacritics=False):
+    """
+    Search verses for those with the given text and provide high-level stats about the usage of this term. This function is necessary because Whoosh
+    term matching stats indicate the number of verses that contain the given term, not the count of absolute count of the term.
+    
+    Arguments:
+    search_text -- The content to search for
+    inx -- The Whoosh index to use
+    limit -- A limit on the the number of verses to retrieve (the stats always include all of the matching verses)
+    include_related_forms -- Expand the word into all of the related forms
+    ignore_diacritics -- Search ignoring dia-critical marks by default
+    """ 
+    
+    logger.info( 'Performing a stats search, limit=%r, include_related_forms=%r, search_query="%s"', limit, include_related_forms, search_text )
+
+    # Perform the search (using the shared searchers unless an index was provided)
+    with WorkIndexer.get_searcher(inx) as searcher:
         
-        stats['matched_works'] = replace_work_names_with_titles(matched_works)
+        search_query = parse_search_query(search_text, searcher.schema, include_related_forms, ignore_diacritics)
         
-        stats['matched_terms'] = OrderedDict(sorted(matched_terms.items(), key=lambda x: x[1], reverse=True))
-        stats['results_count'] = results_count
+        results = run_search(searcher, search_query, limit)
+        
+        stats = make_search_stats(searcher, results)
     
     return stats
 
@@ -730,39 +1832,66 @@ def search_verses(search_text, inx=None, page=1, pagelen=20, include_related_for
     
     logger.info('Performing a search, page=%r, page_len=%r, include_related_forms=%r, search_query="%s"', page, pagelen, include_related_forms, search_text)
     
-    # Get the index if provided
-    if inx is None:
-        inx = WorkIndexer.get_index()
-    
-    # Perform the search
-    with inx.searcher() as searcher:
-        
-        # Determine which field will be searched by default
-        default_search_field = "content"
-        
-        if ignore_diacritics:
-            default_search_field = "no_diacritics"
-        
-        # Make a parser to convert the incoming search string into a search
-        if include_related_forms:
-            parser = QueryParser(default_search_field, inx.schema, termclass=GreekVariations)
-        else:
-            parser = QueryParser(default_search_field, inx.schema, termclass=GreekBetaCodeVariations)
-        
-        # Parse the search string into an actual search
-        search_query = parser.parse(search_text)
+    # Perform the search (using the shared searchers unless an index was provided)
+    with WorkIndexer.get_searcher(inx) as searcher:
         
-        logger.debug('Search query parsed, default_search_field="%s", raw_query="%s"', default_search_field, search_query)
+        search_query = parse_search_query(search_text, searcher.schema, include_related_forms, ignore_diacritics)
         
         # Get the search result
         search_results = VerseSearchResults(searcher.search_page(search_query, page, pagelen, terms=True, sortedby="verse_id"), page, pagelen)
             
     return search_results
 
+def search_verses_and_stats(search_text, inx=None, page=1, pagelen=20, include_related_forms=True, ignore_diacritics=False):
+    """
+    Search all verses for those with the given text and provide the stats about the usage of the terms. This is equivalent to calling
+    search_verses() and search_stats() except that the query is parsed, expanded and executed only once.
+    
+    Returns a tuple of the VerseSearchResults and the stats.
+    
+    Arguments:
+    search_text -- The content to search for
+    inx -- The Whoosh index to use
+    page -- Indicates the page number to retrieve
+    pagelen -- Indicates how many entries constitute a page
+    include_related_forms -- Expand the word into all of the related forms
+    ignore_diacritics -- Search ignoring dia-critical marks by default
+    """
+    
+    logger.info('Performing a search with stats, page=%r, page_len=%r, include_related_forms=%r, search_query="%s"', page, pagelen, include_related_forms, search_text)
+    
+    if page < 1:
+        raise ValueError("page must be >= 1")
+    
+    # Perform the search (using the shared searchers unless an index was provided)
+    with WorkIndexer.get_searcher(inx) as searcher:
+        
+        search_query = parse_search_query(search_text, searcher.schema, include_related_forms, ignore_diacritics)
+        
+        # Get the results for the requested page; the term frequencies for the stats are collected for all matches
+        results = run_search(searcher, search_query, page * pagelen)
+        
+        search_results = VerseSearchResults(ResultsPage(results, page, pagelen), page, pagelen)
+        stats = make_search_stats(searcher, results)
+            
+    return search_results, stats
+
 """
 # Rebuild the search indexes when the work gets updated
 @receiver(post_save, sender=Work)
 def work_search_index_rebuild(work, **kwargs):
     indexer = WorkIndexer()
     indexer.index_work(work)
-"""
\ No newline at end of file
+"""
+
+# Make the cache of variations again when its size or the related forms table is changed (by the tests)
+@receiver(setting_changed)
+def variations_setting_changed(setting, **kwargs):
+    if setting in ("SEARCH_VARIATIONS_CACHE_SIZE", "RELATED_FORMS_TABLE"):
+        GreekVariations.clear_cached_variations()
+
+@receiver(post_save, sender=WordDescription)
+@receiver(post_delete, sender=WordDescription)
+def word_description_changed(sender, **kwargs):
+    # The cached variations may be out of date now that the forms of a lemma changed
+    GreekVariations.clear_cached_variations()
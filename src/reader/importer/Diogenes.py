@@ -98,6 +98,9 @@ class DiogenesAnalysesImporter(LineImporter):
         "enclitic": WordDescription.ENCLITIC
     }
 
+    # The number of lines that import_file_bulk() writes in each transaction
+    BULK_CHUNK_SIZE = 1000
+
     @classmethod
     @transaction.atomic
     def import_line(cls, entry, line_number=None, raise_exception_on_match_failure=False):
@@ -111,6 +114,33 @@ class DiogenesAnalysesImporter(LineImporter):
         line_number -- The line number associated with the entry
         """
 
+        word_form, descriptions = cls.parse_line(entry, line_number, raise_exception_on_match_failure)
+
+        # Save the form and then the descriptions that refer to it
+        word_form.save()
+
+        for description in descriptions:
+            cls.save_description(*description)
+
+        # Log the line
+        if line_number is not None and (line_number % 1000) == 0:
+            logger.info("Importation progress, line_number=%i", line_number)
+
+        return word_form
+
+    @classmethod
+    def parse_line(cls, entry, line_number=None, raise_exception_on_match_failure=False, lemma_ids=None):
+        """
+        Parse an entry in the Diogenes greek-analyses.txt file without saving anything. This returns the (unsaved)
+        WordForm and a list of the descriptions (see parse_analysis_entry()).
+
+        Arguments:
+        entry -- A line in the greek-analysis file
+        line_number -- The line number associated with the entry
+        raise_exception_on_match_failure -- Indicates if an exception should be raised if a description could not be matched to the regular expression
+        lemma_ids -- A dictionary of the lemma IDs by reference number (the lemmas will be queried if not provided)
+        """
+
         # Get the form
         beta_code_string = entry[0:entry.find("\t")]
 
@@ -126,21 +156,139 @@ class DiogenesAnalysesImporter(LineImporter):
         # Make the form
         word_form = WordForm()
         word_form.form = greek_code_string
-        word_form.save()
 
         # Make the descriptions
+        descriptions = []
         form_number = 0
 
         for desc in cls.PARSE_ANALYSIS_DESCRIPTIONS_RE.findall(entry):
             form_number = form_number + 1
-            DiogenesAnalysesImporter.import_analysis_entry(
-                desc, word_form, line_number, form_number, raise_exception_on_match_failure)
+            description = cls.parse_analysis_entry(desc, word_form, line_number, form_number, raise_exception_on_match_failure, lemma_ids)
 
-        # Log the line
-        if line_number is not None and (line_number % 1000) == 0:
-            logger.info("Importation progress, line_number=%i", line_number)
+            if description is not None:
+                descriptions.append(description)
 
-        return word_form
+        return word_form, descriptions
+
+    @staticmethod
+    def read_lines(file_name, start_line_number=None):
+        """
+        Iterate through the lines of the file, yielding the line number and the line.
+
+        Arguments:
+        file_name -- The file to read
+        start_line_number -- The line number to start at (the lines before it are skipped)
+        """
+
+        with open(file_name, 'r') as f:
+            for line_number, line in enumerate(f, 1):
+                if start_line_number is None or line_number >= start_line_number:
+                    yield line_number, line
+
+    @classmethod
+    def import_file_bulk(cls, file_name, start_line_number=None, chunk_size=None, raise_exception_on_match_failure=False):
+        """
+        Import the analyses file using bulk inserts. This is much faster than import_file() for the full analyses file
+        since the lemmas, cases and dialects are looked up in memory and each chunk of lines is written with a few
+        queries in a single transaction. Returns the number of lines imported.
+
+        Arguments:
+        file_name -- The file to import
+        start_line_number -- The line number to start at (the lines before it are skipped)
+        chunk_size -- The number of lines to write in each transaction
+        raise_exception_on_match_failure -- Indicates if an exception should be raised if a description could not be matched to the regular expression
+        """
+
+        if chunk_size is None:
+            chunk_size = cls.BULK_CHUNK_SIZE
+
+        logger.debug("Importing file, file=\"%s\"", file_name)
+
+        # Record the start time so that we can measure performance
+        start_time = time()
+
+        # Load the lemmas, cases and dialects once (use the first lemma with a given reference number like get_lemma() does)
+        lemma_ids = {}
+
+        for reference_number, lemma_id in Lemma.objects.filter(reference_number__isnull=False).order_by('id').values_list('reference_number', 'id'):
+            lemma_ids.setdefault(reference_number, lemma_id)
+
+        cases = {case.name: case for case in Case.objects.all()}
+        dialects = {dialect.name: dialect for dialect in Dialect.objects.all()}
+
+        # Parse the lines and write them out a chunk at a time
+        line_count = 0
+        chunk = []
+
+        for line_number, line in cls.read_lines(file_name, start_line_number):
+            chunk.append(cls.parse_line(line, line_number, raise_exception_on_match_failure, lemma_ids))
+
+            if len(chunk) >= chunk_size:
+                cls.save_lines(chunk, cases, dialects)
+                line_count = line_count + len(chunk)
+                chunk = []
+
+                logger.info("Importation progress, line_number=%i, lines_per_second=%.1f", line_number, line_count / max(time() - start_time, 0.001))
+
+        if len(chunk) > 0:
+            cls.save_lines(chunk, cases, dialects)
+            line_count = line_count + len(chunk)
+
+        duration = time() - start_time
+
+        logger.info("Import complete, lines=%i, duration=%i, lines_per_second=%.1f", line_count, duration, line_count / max(duration, 0.001))
+
+        return line_count
+
+    @classmethod
+    @transaction.atomic
+    def save_lines(cls, lines, cases, dialects):
+        """
+        Save the parsed lines (see parse_line()) using bulk inserts.
+
+        Arguments:
+        lines -- A list of the word forms and descriptions returned by parse_line()
+        cases -- A dictionary of the cases by name (new cases will be added to it)
+        dialects -- A dictionary of the dialects by name (new dialects will be added to it)
+        """
+
+        # Save the forms (bulk_create() doesn't call save() so normalize the forms here)
+        word_forms = [word_form for word_form, _ in lines]
+
+        for word_form in word_forms:
+            word_form.normalize_form()
+
+        WordForm.objects.bulk_create(word_forms)
+
+        # Save the descriptions (the IDs of the forms they refer to are filled in by bulk_create())
+        descriptions = [description for _, descriptions in lines for description in descriptions]
+
+        WordDescription.objects.bulk_create([word_description for word_description, _, _ in descriptions])
+
+        # Save the cases and dialects of the descriptions
+        CaseRelation = WordDescription.cases.through
+        DialectRelation = WordDescription.dialects.through
+
+        case_relations = []
+        dialect_relations = []
+
+        for word_description, case_names, dialect_names in descriptions:
+
+            # Skip the duplicates since the relations must be unique (add() would ignore them too)
+            for name in dict.fromkeys(case_names):
+                if name not in cases:
+                    cases[name] = cls.get_case(name)
+
+                case_relations.append(CaseRelation(worddescription_id=word_description.id, case_id=cases[name].id))
+
+            for name in dict.fromkeys(dialect_names):
+                if name not in dialects:
+                    dialects[name] = cls.get_dialect(name)
+
+                dialect_relations.append(DialectRelation(worddescription_id=word_description.id, dialect_id=dialects[name].id))
+
+        CaseRelation.objects.bulk_create(case_relations)
+        DialectRelation.objects.bulk_create(dialect_relations)
 
     @classmethod
     def get_lemma(cls, reference_number):
@@ -172,6 +320,27 @@ class DiogenesAnalysesImporter(LineImporter):
         raise_exception_on_match_failure -- Indicates if an exception should be raised if the line could not be matched to the regular expression
         """
 
+        description = cls.parse_analysis_entry(desc, word_form, line_number, form_number, raise_exception_on_match_failure)
+
+        if description is not None:
+            return cls.save_description(*description)
+
+    @classmethod
+    def parse_analysis_entry(cls, desc, word_form, line_number=None, form_number=None, raise_exception_on_match_failure=False, lemma_ids=None):
+        """
+        Parse an entry from the Diogenes lemmata file without saving it. This returns the (unsaved) WordDescription
+        along with the names of its cases and dialects, or None if the entry couldn't be parsed.
+
+        Arguments:
+        cls -- The class
+        desc -- A string with the part of the line that describes the given form (e.g. "{537850 9 a(/bra_,a(/bra    favourite slave    fem nom/voc/acc dual}")
+        word_form -- The WordForm instance associated with the description
+        line_number -- The line number that this entry is found on
+        form_number -- The number of the form on this line (since each line can have several forms)
+        raise_exception_on_match_failure -- Indicates if an exception should be raised if the line could not be matched to the regular expression
+        lemma_ids -- A dictionary of the lemma IDs by reference number (the lemma will be queried if not provided)
+        """
+
         # Parse the description
         r = cls.PARSE_ANALYSIS_DESCRIPTION_RE.search(desc)
 
@@ -190,7 +359,11 @@ class DiogenesAnalysesImporter(LineImporter):
 
         # Find the entry associated by the reference number
         reference_number = d['reference_number']
-        lemma = cls.get_lemma(reference_number)
+
+        if lemma_ids is not None:
+            lemma = lemma_ids.get(int(reference_number))
+        else:
+            lemma = cls.get_lemma(reference_number)
 
         # Stop if we couldn't find a matching lemma
         if lemma is None:
@@ -201,14 +374,20 @@ class DiogenesAnalysesImporter(LineImporter):
             # Add the description of the form
             word_description = WordDescription(description=desc)
             word_description.word_form = word_form
-            word_description.lemma = lemma
             word_description.meaning = d['definition']
 
+            if lemma_ids is not None:
+                word_description.lemma_id = lemma
+            else:
+                word_description.lemma = lemma
+
             # Parse into a list of attributes
             attrs = cls.PARSE_FIND_ATTRS.findall(d['attrs'])
 
             # Update the word description with the data from the attributes
-            return cls.create_description_attributes(attrs, word_description, line_number)
+            case_names, dialect_names = cls.parse_description_attributes(attrs, word_description, line_number)
+
+            return word_description, case_names, dialect_names
 
     @classmethod
     def get_case(cls, case):
@@ -276,7 +455,50 @@ class DiogenesAnalysesImporter(LineImporter):
     @classmethod
     def create_description_attributes(cls, attrs, word_description, raise_on_unused_attributes=False, line_number=None):
         """
-        Update the description with attributes from the attrs.
+        Update the description with attributes from the attrs and save it.
+
+        Arguments:
+        cls -- The class
+        attrs -- The list of attributes
+        word_description -- The word description instance to modify
+        raise_on_unused_attributes -- Raise an exception if an attribute is observed that is not recognized
+        line_number -- The line number of the description we are populating
+        """
+
+        case_names, dialect_names = cls.parse_description_attributes(attrs, word_description, raise_on_unused_attributes, line_number)
+
+        return cls.save_description(word_description, case_names, dialect_names)
+
+    @classmethod
+    def save_description(cls, word_description, case_names, dialect_names):
+        """
+        Save the description along with its cases and dialects.
+
+        Arguments:
+        cls -- The class
+        word_description -- The word description instance to save
+        case_names -- The names of the cases of the description
+        dialect_names -- The names of the dialects of the description
+        """
+
+        # Save the description
+        word_description.save()
+
+        # Add the cases
+        for case in case_names:
+            word_description.cases.add(cls.get_case(case))
+
+        # Add the dialects
+        for dialect in dialect_names:
+            word_description.dialects.add(cls.get_dialect(dialect))
+
+        return word_description
+
+    @classmethod
+    def parse_description_attributes(cls, attrs, word_description, raise_on_unused_attributes=False, line_number=None):
+        """
+        Update the description with attributes from the attrs without saving it. This returns the names of the cases
+        and the names of the dialects of the description.
 
         Arguments:
         cls -- The class
@@ -311,7 +533,7 @@ class DiogenesAnalysesImporter(LineImporter):
 
             # Handle dialects
             elif a in ["attic", "doric", "aeolic", "epic", "ionic", "homeric", "parad_form", "prose"]:
-                dialects.append(cls.get_dialect(a))
+                dialects.append(a)
 
             # Handle part of speech
             elif a in ["adverb", "adverbial"]:
@@ -391,7 +613,7 @@ class DiogenesAnalysesImporter(LineImporter):
 
             # Handle cases
             elif a in cls.CASE_MAP:
-                cases.append(cls.get_case(a))
+                cases.append(a)
                 cls.set_part_of_speech(
                     word_description, WordDescription.NOUN, dont_set_if_already_set=True)
 
@@ -413,18 +635,7 @@ class DiogenesAnalysesImporter(LineImporter):
                 else:
                     logger.warning("Attribute was not expected: attribute=%s" % a)
 
-        # Save the description
-        word_description.save()
-
-        # Add the cases
-        for case in cases:
-            word_description.cases.add(case)
-
-        # Add the dialects
-        for dialect in dialects:
-            word_description.dialects.add(dialect)
-
-        return word_description
+        return cases, dialects
 
 
 class DiogenesLemmataImporter():
@@ -12,7 +12,7 @@ The importer performs the import in the three major steps:
  3) Process the verses (convert original content to something that can be displayed)
 '''
 
-from xml.dom import minidom
+from xml.dom import minidom, pulldom
 from xml.dom.minidom import parseString
 import logging
 import re
@@ -149,26 +149,122 @@ class PerseusTextImporter(TextImporter):
         self.work_source.resource = os.path.basename(file_name)
         self.work_source.description = "Text provided by Perseus Digital Library. Original version available for viewing and download at http://www.perseus.tufts.edu/hopper/."
 
-        # Import the document
-        # Read the file into a string
-        f = None
+        # Import the document while it is being parsed (so that a DOM of the entire file isn't needed)
+        with codecs.open(file_name, 'r', encoding) as f:
+            return self.import_xml_stream(f)
 
-        try:
-            f = codecs.open(file_name, 'r', encoding)
+    @transaction.atomic
+    def import_xml_stream(self, stream):
+        """
+        Import the work from the stream provided. The content is imported as it is parsed; only the TEI header and
+        the current child of the body are kept in memory.
 
-            file_string = f.read()
-        finally:
-            if f:
-                f.close()
+        Arguments:
+        stream -- A file-like object containing the XML
+        """
+
+        events = pulldom.parse(stream)
+        document = None
+
+        for event, node in events:
+
+            if event != pulldom.START_ELEMENT:
+                continue
+
+            # Keep the root node so that the header can be attached to it (the header is then used like a document)
+            if document is None:
+                document = node
+
+            if node.tagName == "teiHeader":
+                events.expandNode(node)
+                document.appendChild(node)
+
+            # Import the content of the first group or body node (the header comes before these)
+            elif node.tagName in ["group", "body"]:
+                current_state_set = self.import_tei_header(document)
+
+                try:
+                    return self.import_body(node, current_state_set, PerseusTextImporter.stream_child_nodes(events))
+                finally:
+                    document.unlink()
+
+        raise Exception("No body was found in the document")
+
+    @staticmethod
+    def stream_child_nodes(events):
+        """
+        Yield the child nodes of the element whose start was just read from the pulldom event stream. Each child is
+        fully expanded before it is yielded and is released once the caller moves on to the next one.
+
+        Arguments:
+        events -- A pulldom event stream positioned just after the start of the parent element
+        """
+
+        text_node = None
+
+        for event, node in events:
+
+            # The parser may split text into several events; merge them into one node like minidom.parse() does
+            if event == pulldom.CHARACTERS:
+                if text_node is None:
+                    text_node = node
+                else:
+                    text_node.data = text_node.data + node.data
+
+                continue
+
+            if text_node is not None:
+                yield text_node
+                text_node = None
+
+            # Stop once the parent element ends
+            if event == pulldom.END_ELEMENT:
+                return
 
-        file_string = file_string.encode('utf-8')
-        doc = parseString(file_string)
+            if event == pulldom.START_ELEMENT:
+                events.expandNode(node)
+                node.normalize()
+
+            yield node
+
+            node.unlink()
+
+    @staticmethod
+    def read_tei_header(file_name):
+        """
+        Get the TEI header from the file without parsing the rest of the file. This returns the root node with the
+        header as its only child so that it can be used with the functions that expect a document (such as
+        get_author() and get_language()).
+
+        Arguments:
+        file_name -- The file name of a Perseus XML work
+        """
+
+        events = pulldom.parse(file_name)
+        document = None
 
         try:
-            return self.import_xml_document(doc)
+            for event, node in events:
+
+                if event != pulldom.START_ELEMENT:
+                    continue
+
+                if document is None:
+                    document = node
+
+                if node.tagName == "teiHeader":
+                    events.expandNode(node)
+                    document.appendChild(node)
+                    break
+
+                # Stop if we got to the content since the header must come before it
+                elif node.tagName in ["text", "body", "group"]:
+                    break
+
         finally:
-            doc.unlink()
-            del(doc)
+            events.stream.close()
+
+        return document
 
     def close_division(self, import_context, new_division=None):
         """
@@ -201,6 +297,10 @@ class PerseusTextImporter(TextImporter):
         # Save the XML content for the previous chapter
         self.save_original_content(import_context)
 
+        # Make the verses now that the content of the division is complete (from the XML we already have so that it doesn't need to be parsed again)
+        if import_context is not None and import_context.division is not None and import_context.document is not None:
+            self.make_verses(import_context.division, import_context.document)
+
     def does_division_exist(self, division):
         return True
 
@@ -258,6 +358,10 @@ class PerseusTextImporter(TextImporter):
             #else:
             #    logger.warning("Did not make division for level %i in %s" %(level, self.work.title) )
 
+            # Note that the parent has children (so that it isn't treated as a leaf when its verses are made)
+            if new_division.parent_division is not None:
+                new_division.parent_division.has_child_divisions = True
+
         # Make the section 
         else:
 
@@ -283,13 +387,13 @@ class PerseusTextImporter(TextImporter):
 
         # Save the newly created section
         if new_division is not None:
-            new_division.save()
+            self.unit_of_work.save_division(new_division)
 
         # Log the creation of a division
         if new_division.parent_division is not None:
-            logger.debug("Successfully created division: descriptor=%s, title=%s, id=%i, level=%i, parent=%s", new_division.descriptor, new_division.original_title, new_division.id, level, str(new_division.parent_division.descriptor))
+            logger.debug("Successfully created division: descriptor=%s, title=%s, sequence_number=%i, level=%i, parent=%s", new_division.descriptor, new_division.original_title, new_division.sequence_number, level, str(new_division.parent_division.descriptor))
         else:
-            logger.debug("Successfully created division: descriptor=%s, title=%s, id=%i, level=%i", new_division.descriptor, new_division.original_title, new_division.id, level)
+            logger.debug("Successfully created division: descriptor=%s, title=%s, sequence_number=%i, level=%i", new_division.descriptor, new_division.original_title, new_division.sequence_number, level)
 
         # Set the created division as the new one
         import_context.divisions.append(new_division)
@@ -318,9 +422,9 @@ class PerseusTextImporter(TextImporter):
         if self.only_leaf_divisions_readable and import_context.division is not None and import_context.division.readable_unit == True:
 
             # If the division has children, make sure readability is set to false
-            if Division.objects.filter(parent_division=import_context.division).count() > 0:
+            if getattr(import_context.division, 'has_child_divisions', False):
                 import_context.division.readable_unit = False
-                import_context.division.save()
+                self.unit_of_work.save_division(import_context.division)
 
         return import_context.verse
 
@@ -335,7 +439,7 @@ class PerseusTextImporter(TextImporter):
         
         if import_context is not None and import_context.division is not None and import_context.document is not None:
             import_context.division.original_content = import_context.document.toxml()
-            import_context.division.save()
+            self.unit_of_work.save_division(import_context.division)
         else:
             logger.error("Cannot save division content")
         
@@ -350,7 +454,7 @@ class PerseusTextImporter(TextImporter):
         
         if import_context is not None and import_context.verse is not None and import_context.document is not None:
             import_context.verse.original_content = import_context.document.toxml()
-            import_context.verse.save()
+            self.unit_of_work.save_verse(import_context.verse)
         
     @staticmethod
     def getStates(refs_decl):
@@ -701,6 +805,27 @@ class PerseusTextImporter(TextImporter):
         document -- A parsed TEI XML document
         """            
         
+        current_state_set = self.import_tei_header(document)
+        
+        # Look for group nodes which indicate the presence of multiple text nodes (from which we will start the import)
+        body_node = document.getElementsByTagName("group")
+        
+        # If no group nodes exist, then just import starting at the body node
+        if body_node is not None and len(body_node) > 0:
+            body_node = body_node[0]
+        else:
+            body_node = document.getElementsByTagName("body")[0]  
+        
+        return self.import_body(body_node, current_state_set)
+        
+    def import_tei_header(self, document):
+        """
+        Make the work from the information in the TEI header and return the state set to use for splitting up the text.
+        
+        Arguments:
+        document -- A parsed TEI XML document (or a node that contains the TEI header)
+        """
+        
         # Obtain references to the nodes that contain meta-data about the book
         tei_header = document.getElementsByTagName("teiHeader")[0]
         
@@ -759,17 +884,24 @@ class PerseusTextImporter(TextImporter):
             self.work_source.work = self.work
             self.work_source.save()
         
-        # Look for group nodes which indicate the presence of multiple text nodes (from which we will start the import)
-        body_node = document.getElementsByTagName("group")
+        return current_state_set
         
-        # If no group nodes exist, then just import starting at the body node
-        if body_node is not None and len(body_node) > 0:
-            body_node = body_node[0]
-        else:
-            body_node = document.getElementsByTagName("body")[0]  
+    def import_body(self, body_node, current_state_set, child_nodes=None):
+        """
+        Import the divisions and verses from the body of the document.
+        
+        Arguments:
+        body_node -- The group or body node to import the content from
+        current_state_set -- The state set to use for splitting up the text
+        child_nodes -- The child nodes of the body node (defaults to body_node.childNodes; a generator can be provided so that the nodes are parsed as they are imported)
+        """
+        
+        # Chunk the text into divisions (the verses are made as each division is completed)
+        self.start_making_verses(current_state_set)
+        divisions = self.import_body_sub_node(body_node, current_state_set, child_nodes=child_nodes)
         
-        # Chunk the text into divisions
-        divisions = self.import_body_sub_node(body_node, current_state_set)
+        # Insert the divisions and verses that are still pending
+        self.unit_of_work.flush()
         
         if len(divisions) == 0:
             self.work.delete() # Delete the work just in case the transaction doesn't get rolled back 
@@ -777,8 +909,7 @@ class PerseusTextImporter(TextImporter):
         else:
             logger.info("Successfully imported divisions of work, division_count=%i, title=%s", len(divisions), self.work.title)
             
-        # Make the verses
-        verses_created = self.make_verses(divisions, current_state_set)
+        verses_created = self.verses_created
         
         if verses_created == 0:
             self.work.delete() # Delete the work just in case the transaction doesn't get rolled back
@@ -788,104 +919,123 @@ class PerseusTextImporter(TextImporter):
         
         return self.work
         
-    def make_verses(self, divisions, state_set):
+    def start_making_verses(self, state_set):
         """
-        Parse out the verses from the divisions provided and create the individual verses.
+        Reset the information used to make the verses of the divisions (see make_verses()).
         
         Arguments:
-        divisions -- A list of divisions with the original content to get the verses from.
         state_set -- The state set to use for splitting the verses.
         """
         
-        verses_created = 0
-        line_number_range = LineNumberRange()
-        previous_line_number_division = None
-        previous_line_number_range = None
+        self.current_state_set = state_set
+        self.verses_created = 0
+        
+        self.line_number_range = LineNumberRange()
+        self.previous_line_number_division = None
+        self.previous_line_number_range = None
         
-        for division in divisions:
+    def make_verses(self, division, document):
+        """
+        Parse out the verses from the division provided and create the individual verses. This is called once the
+        content of the division is complete (the divisions must be provided in order since the titles of the divisions
+        may be set from the line numbers of the ones before them).
+        
+        Arguments:
+        division -- The division to make the verses for.
+        document -- The XML document with the original content of the division.
+        """
+        
+        # Merge the adjacent text nodes so that the document matches what would be parsed from the original content
+        document.normalize()
+        
+        # Make the verse
+        self.verses_created = self.verses_created + self.make_verses_for_division(division, self.current_state_set, document)
+        
+        # The following is for setting the titles of divisions which ought to indicate the line numbers
+        
+        # Set the line count if necessary (but only if the division is a leaf node)
+        if self.use_line_count_for_divisions == True and not getattr(division, 'has_child_divisions', False):
             
-            # Make the verse
-            verses_created = verses_created + self.make_verses_for_division(division, state_set)
+            line_number_range = self.line_number_range
+            previous_line_number_division = self.previous_line_number_division
+            previous_line_number_range = self.previous_line_number_range
             
-            # The following is for setting the titles of divisions which ought to indicate the line numbers
+            # Update the line count by looking through the verse nodes and counting the relevant tags or looking for verse nodes that include a count
+            line_number_range = self.update_line_count_info(document, line_number_range, reset_start_line_count=False)
             
-            # Set the line count if necessary (but only if the division is a leaf node)
-            if self.use_line_count_for_divisions == True and Division.objects.filter(parent_division=division).count() == 0:# and verses_created > 0:
-                
-                # Parse the content
-                original_content = division.original_content.encode('utf-8')
-                division_doc = parseString(original_content)
-                
-                # Update the line count by looking through the verse nodes and counting the relevant tags or looking for verse nodes that include a count
-                line_number_range = self.update_line_count_info(division_doc, line_number_range, reset_start_line_count=False)
+            # If the line number is starting fresh, then don't treat the previous range as part of this range (since we are starting fresh)
+            if line_number_range.line_number_start.number <= 1:
+                previous_line_number_division = None
+                previous_line_number_range = None
+            
+            # If this is for a division title containing a line number, then set the start number for the current division and set the previous division accordingly
+            if division.type in ["card"] and division.descriptor is not None and LineNumber.is_line_number(str(division.descriptor)):
                 
-                # If the line number is starting fresh, then don't treat the previous range as part of this range (since we are starting fresh)
-                if line_number_range.line_number_start.number <= 1:
-                    previous_line_number_division = None
-                    previous_line_number_range = None
+                # Set the start of the current line number
+                # We want this value to override whatever we already determined
+                line_number_range.line_number_start = LineNumber(str(division.descriptor))
                 
-                # If this is for a division title containing a line number, then set the start number for the current division and set the previous division accordingly
-                if division.type in ["card"] and division.descriptor is not None and LineNumber.is_line_number(str(division.descriptor)):
-                    
-                    # Set the start of the current line number
-                    # We want this value to override whatever we already determined
-                    line_number_range.line_number_start = LineNumber(str(division.descriptor))
-                    
-                    # Set the previous division to the new start line minus one
-                    if previous_line_number_division is not None:
-                        next_line_number = line_number_range.line_number_start.copy()
-                        next_line_number.decrement()
-                        previous_line_number_range.line_number_end = next_line_number
-                        
-                        if previous_line_number_range.makes_sense():
-                            
-                            previous_line_number_division.title = previous_line_number_range.get_line_count_title()
-                            previous_line_number_division.title_slug = slugify(previous_line_number_division.title)
-                            previous_line_number_division.descriptor = str(previous_line_number_range.line_number_start.number)
-                            previous_line_number_division.save()
-                
-                # Ok, lets update the previous division
-                elif previous_line_number_division is not None and line_number_range.line_number_start is not None and line_number_range.line_number_start.number > 0 and line_number_range.line_number_end.number > 0:
-                    
-                    # Set the division title if we have a division to update
-                    previous_line_number_range.line_number_end = line_number_range.line_number_start.copy()
-                    previous_line_number_range.line_number_end.decrement()
+                # Set the previous division to the new start line minus one
+                if previous_line_number_division is not None:
+                    next_line_number = line_number_range.line_number_start.copy()
+                    next_line_number.decrement()
+                    previous_line_number_range.line_number_end = next_line_number
                     
                     if previous_line_number_range.makes_sense():
+                        
                         previous_line_number_division.title = previous_line_number_range.get_line_count_title()
                         previous_line_number_division.title_slug = slugify(previous_line_number_division.title)
                         previous_line_number_division.descriptor = str(previous_line_number_range.line_number_start.number)
-                        
-                        # Save the division
-                        previous_line_number_division.save()
+                        self.unit_of_work.save_division(previous_line_number_division)
+            
+            # Ok, lets update the previous division
+            elif previous_line_number_division is not None and line_number_range.line_number_start is not None and line_number_range.line_number_start.number > 0 and line_number_range.line_number_end.number > 0:
                 
-                # Now, set the current division
-                if line_number_range.makes_sense():
-                    division.title = line_number_range.get_line_count_title()
-                    division.title_slug = slugify(division.title)
-                    division.descriptor = str(line_number_range.line_number_start.number)
-                    division.save()
+                # Set the division title if we have a division to update
+                previous_line_number_range.line_number_end = line_number_range.line_number_start.copy()
+                previous_line_number_range.line_number_end.decrement()
                 
-                # Record the previous line count range set
-                previous_line_number_range = line_number_range.copy()
-                previous_line_number_division = division
+                if previous_line_number_range.makes_sense():
+                    previous_line_number_division.title = previous_line_number_range.get_line_count_title()
+                    previous_line_number_division.title_slug = slugify(previous_line_number_division.title)
+                    previous_line_number_division.descriptor = str(previous_line_number_range.line_number_start.number)
                     
-                # Restart the line count for the next division
-                line_number_range.reset_start_line_count()
-        
-        return verses_created
+                    # Save the division
+                    self.unit_of_work.save_division(previous_line_number_division)
+            
+            # Now, set the current division
+            if line_number_range.makes_sense():
+                division.title = line_number_range.get_line_count_title()
+                division.title_slug = slugify(division.title)
+                division.descriptor = str(line_number_range.line_number_start.number)
+                self.unit_of_work.save_division(division)
+            
+            # Record the previous line count range set
+            self.previous_line_number_range = line_number_range.copy()
+            self.previous_line_number_division = division
+                
+            # Restart the line count for the next division
+            line_number_range.reset_start_line_count()
+            self.line_number_range = line_number_range
 
-    def make_verses_for_division(self, division, state_set):
+    def make_verses_for_division(self, division, state_set, document=None):
         """
         Parse out the verses from the division content and create the individual verses.
         
         Arguments:
         division -- The division with the original content to get the verses from.
         state_set -- The state set to use for splitting the verses.
+        document -- The XML document with the original content (the original content of the division will be parsed if not provided)
         """
         
+        # Use the document if we already have it
+        if document is not None:
+            root_node = document.getElementsByTagName(PerseusTextImporter.CHAPTER_TAG_NAME)[0]
+            
+            return self.import_verse_content(division, root_node, state_set)
+        
         # Parse the original content if it is available
-        if division.original_content:
+        elif division.original_content:
             
             original_content = division.original_content.encode('utf-8')
             division_doc = parseString(original_content)
@@ -1113,7 +1263,7 @@ class PerseusTextImporter(TextImporter):
                     
                     if import_context.verse is not None:
                         import_context.verse.content = import_context.verse.content + self.process_text(node.data)
-                        import_context.verse.save()
+                        self.unit_of_work.save_verse(import_context.verse)
                     else:
                         attach_xml_content = False
                 
@@ -1133,7 +1283,7 @@ class PerseusTextImporter(TextImporter):
                     import_context.verse.indicator = str(verses_created + 1)
                     logger.warning('Milestone observed that did not have an associated unit, the sequence number will be used instead, division=%s, verse=%s, title=%s', import_context.division.sequence_number, import_context.verse.indicator, self.work.title)
                 
-                import_context.verse.save()
+                self.unit_of_work.save_verse(import_context.verse)
                 
                 attach_xml_content = False
                 verses_created = verses_created + 1
@@ -1267,7 +1417,7 @@ class PerseusTextImporter(TextImporter):
         else:
             return default_value 
 
-    def import_body_sub_node(self, content_node, state_set, import_context=None, recurse=True, parent_node=None):
+    def import_body_sub_node(self, content_node, state_set, import_context=None, recurse=True, parent_node=None, child_nodes=None):
         """
         Imports the content from the children of the given node (which ought to be in the body).
         
@@ -1277,8 +1427,12 @@ class PerseusTextImporter(TextImporter):
         import_context -- An ImportContext instance; used for determining which book, division, and verse is being imported
         recurse -- Indicates if the sub-nodes of the given
         parent_node -- The node that the child nodes ought to be appended to. That is, this node ought to be the parent of the newly created node.
+        child_nodes -- The child nodes to import (defaults to content_node.childNodes)
         """
         
+        if child_nodes is None:
+            child_nodes = content_node.childNodes
+        
         # Setup an import context if this is the first, top level call
         if import_context is None:
             import_context = PerseusTextImporter.ImportContext(PerseusTextImporter.CHAPTER_TAG_NAME)
@@ -1293,7 +1447,7 @@ class PerseusTextImporter(TextImporter):
         new_division_node = None
         
         # Let's go through each node and pull in the content until we find the next division marker
-        for node in content_node.childNodes:
+        for node in child_nodes:
             
             # Determines if we are going to merge the XML content to the original content for the given section
             if self.ignore_content_before_first_milestone and not import_context.get_custom_attribute("milestone_observed", False):
@@ -9,7 +9,6 @@ import logging
 import csv
 import pprint
 from time import time
-from xml.dom.minidom import parse
 from reader.importer.Perseus import PerseusTextImporter
 from reader.models import Work
 from reader.importer.batch_import import ImportTransforms
@@ -86,8 +85,8 @@ class PerseusFileProcessor():
         if not file_path.endswith(".xml"):
             return
         
-        # Get the document XML
-        document_xml = parse(file_path)
+        # Get the document XML (only the header is needed to determine if the file ought to be imported)
+        document_xml = PerseusTextImporter.read_tei_header(file_path)
         
         try:
             # Get the information we need to get the import policy
@@ -331,7 +330,7 @@ class PerseusBatchImporter(PerseusFileProcessor):
                     
                     # Get the document XML
                     file_path =  os.path.join( root, f)
-                    document_xml = parse(file_path)
+                    document_xml = PerseusTextImporter.read_tei_header(file_path)
                     
                     # Get the information we need to get the import policy
                     title = self.get_title(document_xml)
@@ -1,9 +1,14 @@
 from reader.language_tools import Greek
 from reader.models import Lemma, Case, WordForm, WordDescription, Dialect
 from reader.importer.greek_analyses_parser import GreekAnalysesParser
-from reader import utils
+from reader import utils, language_tools
 import re
+import os
 import logging
+import django
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
 from time import time
 from django.db import transaction
 
@@ -76,6 +81,10 @@ class RosenAnalysesImporter(GreekAnalysesParser):
         "enclitic": WordDescription.ENCLITIC
     }
 
+    # The number of entries that each process parses at a time (and that are written in each transaction) when doing a
+    # bulk import
+    BULK_CHUNK_SIZE = 1000
+
     def __init__(self, raise_exception_on_match_failure=False, logger=None):
         self.logger = logger
         self.raise_exception_on_match_failure = raise_exception_on_match_failure
@@ -112,6 +121,207 @@ class RosenAnalysesImporter(GreekAnalysesParser):
 
         return objects
 
+    @classmethod
+    def import_file_bulk(cls, file_name, start_line_number=None, logger=None, raise_exception_on_match_failure=False, processes=None, chunk_size=None):
+        """
+        Import the analyses file using a pool of processes to parse the entries and a single writer that saves them with
+        bulk inserts. The forms, lemmas, cases and dialects are looked up in memory (they are loaded once) so that they
+        don't need to be queried for each description. Returns the number of descriptions imported.
+
+        Arguments:
+        file_name -- The file to import
+        start_line_number -- The line number to start at (the lines before it are skipped)
+        logger -- The logger to write the progress to
+        raise_exception_on_match_failure -- Indicates if an exception should be raised if the file is malformed
+        processes -- The number of processes to parse the entries with (defaults to the number of CPUs)
+        chunk_size -- The number of entries to parse in each process at a time
+        """
+
+        if chunk_size is None:
+            chunk_size = cls.BULK_CHUNK_SIZE
+
+        if processes is None:
+            processes = os.cpu_count() or 1
+
+        if logger:
+            logger.debug("Importing file, file=\"%s\"", file_name)
+
+        # Record the start time so that we can measure performance
+        start_time = time()
+
+        # Load the existing forms, lemmas, cases and dialects (use the first one like the utils.get_* functions do)
+        word_forms = {}
+
+        for form_id, form in WordForm.objects.order_by('id').values_list('id', 'form'):
+            word_forms.setdefault(form, form_id)
+
+        lemmas = {}
+
+        for lemma_id, lexical_form in Lemma.objects.order_by('id').values_list('id', 'lexical_form'):
+            lemmas.setdefault(lexical_form, lemma_id)
+
+        cases = {case.name: case for case in Case.objects.order_by('-id')}
+        dialects = {dialect.name: dialect for dialect in Dialect.objects.order_by('-id')}
+
+        description_count = 0
+
+        with open(file_name, 'r') as f, ProcessPoolExecutor(processes, initializer=django.setup) as executor:
+
+            # Read the entries a chunk at a time
+            importer = RosenAnalysesImporter(raise_exception_on_match_failure, logger)
+            entries = importer.read_entries(f, start_line_number, logger, raise_exception_on_match_failure)
+            chunks = iter(lambda: list(islice(entries, chunk_size)), [])
+
+            # Keep a couple of chunks per process queued so that the processes don't wait on the writer
+            queue_size = 2 * processes
+            pending = deque()
+
+            for chunk in chunks:
+                pending.append(executor.submit(cls.parse_entries, chunk))
+
+                if len(pending) >= queue_size:
+                    description_count = description_count + cls.save_descriptions(pending.popleft().result(), word_forms, lemmas, cases, dialects)
+
+                    if logger:
+                        logger.info("Importation progress, descriptions=%i, descriptions_per_second=%.1f", description_count, description_count / max(time() - start_time, 0.001))
+
+            # Write out the rest of the chunks (in the order they were read so that the first form or lemma wins)
+            while len(pending) > 0:
+                description_count = description_count + cls.save_descriptions(pending.popleft().result(), word_forms, lemmas, cases, dialects)
+
+        if logger:
+            duration = time() - start_time
+            logger.info("Import complete, descriptions=%i, duration=%i, descriptions_per_second=%.1f", description_count, duration, description_count / max(duration, 0.001))
+
+        return description_count
+
+    @classmethod
+    def parse_entries(cls, entries):
+        """
+        Parse the entries into unsaved descriptions. This is run in the worker processes by import_file_bulk() and
+        returns a list of the form, the lexical form of the lemma, the description and the names of its cases and
+        dialects.
+
+        Arguments:
+        entries -- A list of the line number, the line with the forms and the line with the definitions of each entry
+        """
+
+        importer = RosenAnalysesImporter()
+        parsed = []
+
+        for line_number, form_line, entry in entries:
+            for form, lexical_form, meaning, details, attrs, description in importer.parse_entry(form_line, entry):
+
+                word_description = WordDescription(description=description)
+                word_description.meaning = meaning
+
+                case_names, dialect_names = cls.parse_description_attributes(attrs, word_description, line_number=line_number)
+
+                parsed.append((form, lexical_form, word_description, case_names, dialect_names))
+
+        return parsed
+
+    @staticmethod
+    def get_lookup_form(form):
+        """
+        Get the version of the form that is used to look up existing forms and lemmas (see utils.get_word_form()).
+
+        Arguments:
+        form -- The form of the word
+        """
+
+        return Greek.fix_final_sigma(language_tools.normalize_unicode(form.lower()))
+
+    @classmethod
+    @transaction.atomic
+    def save_descriptions(cls, parsed, word_forms, lemmas, cases, dialects):
+        """
+        Save the descriptions returned by parse_entries() using bulk inserts. The forms and lemmas that don't exist yet
+        are created. Returns the number of descriptions saved.
+
+        Arguments:
+        parsed -- The list returned by parse_entries()
+        word_forms -- A dictionary of the IDs of the forms by form (new forms will be added to it)
+        lemmas -- A dictionary of the IDs of the lemmas by lexical form (new lemmas will be added to it)
+        cases -- A dictionary of the cases by name (new cases will be added to it)
+        dialects -- A dictionary of the dialects by name (new dialects will be added to it)
+        """
+
+        new_word_forms = []
+        new_lemmas = []
+
+        # Find the forms and lemmas of the descriptions and make the ones that don't exist yet
+        for form, lexical_form, word_description, _, _ in parsed:
+
+            word_form = word_forms.get(cls.get_lookup_form(form))
+
+            if word_form is None:
+                word_form = WordForm(form=form)
+                word_form.normalize_form()
+                word_forms.setdefault(word_form.form, word_form)
+                new_word_forms.append(word_form)
+
+            lemma = lemmas.get(cls.get_lookup_form(lexical_form))
+
+            if lemma is None:
+                lemma = Lemma(language="Greek", lexical_form=lexical_form)
+                lemma.normalize_lexical_form()
+                lemmas.setdefault(lemma.lexical_form, lemma)
+                new_lemmas.append(lemma)
+
+            # The new forms and lemmas don't have IDs yet; bulk_create() will fill them in when the descriptions are saved
+            if isinstance(word_form, WordForm):
+                word_description.word_form = word_form
+            else:
+                word_description.word_form_id = word_form
+
+            if isinstance(lemma, Lemma):
+                word_description.lemma = lemma
+            else:
+                word_description.lemma_id = lemma
+
+        WordForm.objects.bulk_create(new_word_forms)
+        Lemma.objects.bulk_create(new_lemmas)
+
+        # Only keep the IDs in the dictionaries so that the objects can be released
+        for word_form in new_word_forms:
+            if word_forms.get(word_form.form) is word_form:
+                word_forms[word_form.form] = word_form.id
+
+        for lemma in new_lemmas:
+            if lemmas.get(lemma.lexical_form) is lemma:
+                lemmas[lemma.lexical_form] = lemma.id
+
+        # Save the descriptions
+        WordDescription.objects.bulk_create([word_description for _, _, word_description, _, _ in parsed])
+
+        # Save the cases and dialects of the descriptions
+        CaseRelation = WordDescription.cases.through
+        DialectRelation = WordDescription.dialects.through
+
+        case_relations = []
+        dialect_relations = []
+
+        for _, _, word_description, case_names, dialect_names in parsed:
+
+            # Skip the duplicates since the relations must be unique (add() would ignore them too)
+            for name in dict.fromkeys(case_names):
+                if name not in cases:
+                    cases[name] = cls.get_case(name)
+
+                case_relations.append(CaseRelation(worddescription_id=word_description.id, case_id=cases[name].id))
+
+            for name in dict.fromkeys(dialect_names):
+                if name not in dialects:
+                    dialects[name] = cls.get_dialect(name)
+
+                dialect_relations.append(DialectRelation(worddescription_id=word_description.id, dialect_id=dialects[name].id))
+
+        CaseRelation.objects.bulk_create(case_relations)
+        DialectRelation.objects.bulk_create(dialect_relations)
+
+        return len(parsed)
+
     @classmethod
     def get_word_form(cls, form):
         """
@@ -156,7 +366,36 @@ class RosenAnalysesImporter(GreekAnalysesParser):
     @classmethod
     def create_description_attributes(cls, attrs, word_description, raise_on_unused_attributes=False, line_number=None, logger=None):
         """
-        Update the description with attributes from the attrs.
+        Update the description with attributes from the attrs and save it.
+
+        Arguments:
+        cls -- The class
+        attrs -- The list of attributes
+        word_description -- The word description instance to modify
+        raise_on_unused_attributes -- Raise an exception if an attribute is observed that is not recognized
+        line_number -- The line number of the description we are populating
+        """
+
+        case_names, dialect_names = cls.parse_description_attributes(attrs, word_description, raise_on_unused_attributes, line_number, logger)
+
+        # Save the description
+        word_description.save()
+
+        # Add the cases
+        for case in case_names:
+            word_description.cases.add(cls.get_case(case))
+
+        # Add the dialects
+        for dialect in dialect_names:
+            word_description.dialects.add(cls.get_dialect(dialect))
+
+        return word_description
+
+    @classmethod
+    def parse_description_attributes(cls, attrs, word_description, raise_on_unused_attributes=False, line_number=None, logger=None):
+        """
+        Update the description with attributes from the attrs without saving it. This returns the names of the cases
+        and the names of the dialects of the description.
 
         Arguments:
         cls -- The class
@@ -166,6 +405,9 @@ class RosenAnalysesImporter(GreekAnalysesParser):
         line_number -- The line number of the description we are populating
         """
 
+        if logger is None:
+            logger = default_logger
+
         dialects = []
         cases = []
 
@@ -191,7 +433,7 @@ class RosenAnalysesImporter(GreekAnalysesParser):
 
             # Handle dialects
             elif a in ["attic", "doric", "aeolic", "epic", "ionic", "homeric", "parad_form", "prose"]:
-                dialects.append(cls.get_dialect(a))
+                dialects.append(a)
 
             # Handle part of speech
             elif a in ["adverb", "adverbial"]:
@@ -271,7 +513,7 @@ class RosenAnalysesImporter(GreekAnalysesParser):
 
             # Handle cases
             elif a in cls.CASE_MAP:
-                cases.append(cls.get_case(cls.CASE_MAP[a]))
+                cases.append(cls.CASE_MAP[a])
                 cls.set_part_of_speech(
                     word_description, WordDescription.NOUN, dont_set_if_already_set=True)
 
@@ -293,18 +535,7 @@ class RosenAnalysesImporter(GreekAnalysesParser):
                 else:
                     logger.warning("Attribute was not expected: attribute=%s" % a)
 
-        # Save the description
-        word_description.save()
-
-        # Add the cases
-        for case in cases:
-            word_description.cases.add(case)
-
-        # Add the dialects
-        for dialect in dialects:
-            word_description.dialects.add(dialect)
-
-        return word_description
+        return cases, dialects
 
     @classmethod
     def get_or_make_lemma(cls, lexical_form):
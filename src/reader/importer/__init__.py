@@ -6,6 +6,8 @@ import logging
 
 from django.core.exceptions import ObjectDoesNotExist
 from django.template.defaultfilters import slugify
+from django.db import transaction
+from django.db.models.signals import post_save
 
 from reader.models import Author, Work, WorkSource, Verse, Division
 
@@ -142,6 +144,143 @@ class LineNumberRange():
         else:
             return True
 
+class ImportUnitOfWork():
+    """
+    Collects the divisions and verses made during an import so that they can be inserted in batches instead of one
+    at a time. The importers set the sequence numbers and parent divisions in memory; the IDs are populated when the
+    objects are flushed (the divisions are inserted before the verses and the parents before the divisions under
+    them). Objects that were already inserted are saved right away.
+    """
+    
+    def __init__(self, batch_size=500, flush_size=5000):
+        """
+        Arguments:
+        batch_size -- The number of objects to insert per query
+        flush_size -- The number of pending objects at which they are flushed automatically
+        """
+        
+        self.batch_size = batch_size
+        self.flush_size = flush_size
+        
+        # The pending objects keyed by their identity (unsaved model instances cannot be hashed)
+        self.divisions = {}
+        self.verses = {}
+        
+    def save_division(self, division):
+        """
+        Save the division or note that it needs to be inserted if it is new.
+        
+        Arguments:
+        division -- The division to save
+        """
+        
+        # Save the division right away if it was already inserted
+        if division.id is not None:
+            division.save()
+            return
+        
+        # Set the slug now since save() only sets it when the division is first saved
+        if id(division) not in self.divisions:
+            
+            if not division.title_slug:
+                division.update_title_slug()
+            
+            self.divisions[id(division)] = division
+            self.flush_if_full()
+        
+    def save_verse(self, verse):
+        """
+        Save the verse or note that it needs to be inserted if it is new.
+        
+        Arguments:
+        verse -- The verse to save
+        """
+        
+        # Save the verse right away if it was already inserted
+        if verse.id is not None:
+            verse.save()
+            return
+        
+        if id(verse) not in self.verses:
+            self.verses[id(verse)] = verse
+            self.flush_if_full()
+        
+    def flush_if_full(self):
+        """
+        Insert the pending objects if there are enough of them to make a batch worth flushing.
+        """
+        
+        if len(self.divisions) + len(self.verses) >= self.flush_size:
+            self.flush()
+        
+    @transaction.atomic
+    def flush(self):
+        """
+        Insert the pending divisions and verses.
+        """
+        
+        divisions = list(self.divisions.values())
+        verses = list(self.verses.values())
+        
+        self.divisions = {}
+        self.verses = {}
+        
+        # Insert the divisions in the order they were made (so that their IDs are in the same order as when they are
+        # saved one at a time) but start a new batch when a division's parent is in the batch since the parent's ID is
+        # needed for the path
+        batch = []
+        batch_ids = set()
+        
+        for division in divisions:
+            
+            if division.parent_division is not None and id(division.parent_division) in batch_ids:
+                self.insert_divisions(batch)
+                batch = []
+                batch_ids = set()
+            
+            batch.append(division)
+            batch_ids.add(id(division))
+        
+        self.insert_divisions(batch)
+        
+        # Insert the verses now that their divisions have IDs
+        for verse in verses:
+            verse.normalize_content()
+        
+        Verse.objects.bulk_create(verses, batch_size=self.batch_size)
+        
+        # Send the save signal for the works since bulk_create() doesn't send the signals of the divisions and verses
+        # (the receivers of the work's signal cover the changes to its content, such as the search index journal)
+        works = {}
+        
+        for division in divisions + [verse.division for verse in verses]:
+            if division.work_id not in works:
+                works[division.work_id] = division.work
+        
+        for work in works.values():
+            post_save.send(sender=Work, instance=work, created=False, update_fields=None, raw=False, using=work._state.db)
+        
+    def insert_divisions(self, divisions):
+        """
+        Insert the divisions. The parents of the divisions must already be inserted.
+        
+        Arguments:
+        divisions -- The divisions to insert
+        """
+        
+        # Update the path like save() does (the descriptor is stored as a string so use it as one)
+        for division in divisions:
+            
+            if division.descriptor is not None:
+                division.descriptor = str(division.descriptor)
+            
+            if division.parent_division is not None and division.parent_division.id is None:
+                raise ValueError("Division cannot be saved because its parent division was not saved, descriptor=%s" % (division.descriptor))
+            
+            division.update_path()
+        
+        Division.objects.bulk_create(divisions, batch_size=self.batch_size)
+        
 class TextImporter():
     
     class ImportContext():
@@ -233,6 +372,9 @@ class TextImporter():
             self.work_source = work_source
         else:
             self.work_source = WorkSource()
+        
+        # The divisions and verses are inserted in batches (call self.unit_of_work.flush() once the import is done)
+        self.unit_of_work = ImportUnitOfWork()
 
     @staticmethod
     def copy_node(src_node, dst_doc, dst_node, copy_attributes=True, copy_children=False, concatenate_child_text_nodes=True, handle_inappropriate_text_node_children=True):
@@ -302,7 +444,7 @@ class TextImporter():
         division.work = self.work
         
         if save:
-            division.save()
+            self.unit_of_work.save_division(division)
         
         return division
     
@@ -321,11 +463,11 @@ class TextImporter():
         
         if division is not None and division.readable_unit == False:
             division.readable_unit = True
-            division.save()
+            self.unit_of_work.save_division(division)
             logger.info("Marking division as a readable unit because it contains a verse, division=%s", division.descriptor)
         
         if save:
-            verse.save()
+            self.unit_of_work.save_verse(verse)
         
         return verse
     
@@ -136,6 +136,9 @@ class BereanBibleImporter(TextImporter):
         finally:
             if f is not None:
                 f.close()
+        
+        # Insert the divisions and verses that are still pending
+        self.unit_of_work.flush()
     
         # Execute import policy actions
         self.execute_import_policy_actions(self.work, file_name, self.work.title)
@@ -160,7 +163,7 @@ class BereanBibleImporter(TextImporter):
             self.current_book_division.title = book
             self.current_book_division.level = 1
             self.current_book_division.type = "Book"
-            self.current_book_division.save()
+            self.unit_of_work.save_division(self.current_book_division)
 
             self.current_chapter_division = None
             self.current_chapter = None
@@ -174,7 +177,7 @@ class BereanBibleImporter(TextImporter):
             self.current_chapter_division.level = 2
             self.current_chapter_division.type = "Chapter"
             self.current_chapter_division.parent_division = self.current_book_division
-            self.current_chapter_division.save()
+            self.unit_of_work.save_division(self.current_chapter_division)
 
             self.current_division = self.current_chapter_division
 
@@ -182,7 +185,7 @@ class BereanBibleImporter(TextImporter):
         verse = self.make_verse(self.current_verse, self.current_chapter_division, save=False)
         verse.indicator = verse_number
         verse.content = language_tools.normalize_unicode(text.strip())
-        verse.save()
+        self.unit_of_work.save_verse(verse)
         
         self.verses_created = self.verses_created + 1
         logger.info('Successfully imported verse of work, verse_count=%i, title="%s"', self.verses_created, self.work.title) 
@@ -35,6 +35,25 @@ class GreekAnalysesParser():
         # Keep a list of the parse forms
         parsed_forms = []
 
+        for possibleForm, lemma_form, meaning, details, attrs, definition in self.parse_entry(form, entry):
+            word_description = self.process_word_description(possibleForm, lemma_form, meaning, details, attrs, definition)
+
+            if word_description is not None:
+                parsed_forms.append(word_description)
+
+        # Return what we parsed
+        return parsed_forms
+
+    def parse_entry(self, form, entry):
+        """
+        Parse an entry in the analysis file into the descriptions of each form. This yields a tuple of the form, the
+        lemma's form, the meaning, the details, the attributes and the definition for each description.
+
+        Arguments:
+        form -- The line in the greek-analysis file with the list of forms
+        entry -- The line in the greek-analysis file with the definitions
+        """
+
         # Break up the forms into a list
         possibleForms = GreekAnalysesParser.FORMS_RE.findall(form)
 
@@ -56,14 +75,8 @@ class GreekAnalysesParser():
 
                 # Parse into a list of attributes
                 attrs = GreekAnalysesParser.PARSE_FIND_ATTRS.findall(details)
-    
-                word_description = self.process_word_description(possibleForm, lemma_form, meaning, details, attrs, definition)
-
-                if word_description is not None:
-                    parsed_forms.append(word_description)
 
-        # Return what we parsed
-        return parsed_forms
+                yield possibleForm, lemma_form, meaning, details, attrs, definition
 
     def parse_file(self, file_handle, return_created_objects=False, start_line_number=None, logger=None, raise_exception_on_match_failure=False, **kwargs):
 
@@ -76,6 +89,35 @@ class GreekAnalysesParser():
         else:
             objects = 0
 
+        for line_number, formLine, line in self.read_entries(file_handle, start_line_number, logger, raise_exception_on_match_failure):
+
+            # Import the line
+            obj = self.import_line(formLine, line, line_number, **kwargs)
+
+            # Create the entries
+            if return_created_objects:
+                if obj is not None:
+                    objects.extend(obj)
+            else:
+                objects = objects + len(obj)
+
+        if logger:
+            logger.info("Parsing complete, duration=%i", time() - start_time)
+
+        return objects
+
+    def read_entries(self, file_handle, start_line_number=None, logger=None, raise_exception_on_match_failure=False):
+        """
+        Iterate through the entries in the file (each is made of a line with the forms followed by a line with the
+        definitions). This yields a tuple of the line number, the line with the forms and the line with the definitions.
+
+        Arguments:
+        file_handle -- The file to read
+        start_line_number -- The line number to start at (the lines before it are skipped)
+        logger -- The logger to report problems with the file to
+        raise_exception_on_match_failure -- Indicates if an exception should be raised if the file is malformed
+        """
+
         # Initialize a couple more things...
         line_number = 0  # The line number
 
@@ -121,20 +163,7 @@ class GreekAnalysesParser():
 
                 elif formLine is not None:
 
-                    # Import the line
-                    obj = self.import_line(formLine, line, line_number, **kwargs)
+                    yield line_number, formLine, line
 
                     # Reset the form line since we are done with it
                     formLine = None
-
-                    # Create the entries
-                    if return_created_objects:
-                        if obj is not None:
-                            objects.extend(obj)
-                    else:
-                        objects = objects + len(obj)
-
-        if logger:
-            logger.info("Parsing complete, duration=%i", time() - start_time)
-
-        return objects
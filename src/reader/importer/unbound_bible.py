@@ -52,7 +52,7 @@ class UnboundBibleTextImporter(TextImporter):
             self.current_book_division.title = self.book_names[orig_book_index]
             self.current_book_division.level = 1
             self.current_book_division.type = "Book"
-            self.current_book_division.save()
+            self.unit_of_work.save_division(self.current_book_division)
             
             self.current_chapter_division = None
             self.current_chapter = None
@@ -66,7 +66,7 @@ class UnboundBibleTextImporter(TextImporter):
             self.current_chapter_division.level = 2
             self.current_chapter_division.type = "Chapter"
             self.current_chapter_division.parent_division = self.current_book_division
-            self.current_chapter_division.save()
+            self.unit_of_work.save_division(self.current_chapter_division)
             
             self.current_chapter = orig_chapter
             self.current_division = self.current_chapter_division
@@ -75,7 +75,7 @@ class UnboundBibleTextImporter(TextImporter):
         verse = self.make_verse(self.current_verse, self.current_chapter_division, save=False)
         verse.indicator = orig_verse + orig_subverse
         verse.content = language_tools.normalize_unicode(text.strip())
-        verse.save()
+        self.unit_of_work.save_verse(verse)
         
         self.verses_created = self.verses_created + 1
         logger.info('Successfully imported verse of work, verse_count=%i, title="%s"', self.verses_created, self.work.title) 
@@ -205,6 +205,9 @@ class UnboundBibleTextImporter(TextImporter):
                 else:
                     self.import_line(line)
         
+        # Insert the divisions and verses that are still pending
+        self.unit_of_work.flush()
+        
         if self.import_policy is not None:
             
             # Get the import parameters
@@ -1,5 +1,6 @@
 from reader.language_tools.greek import Greek
 import unicodedata
+from functools import lru_cache
 
 def transform_text(text, language, return_as_unicode=False):
     """
@@ -35,9 +36,10 @@ def transform_text(text, language, return_as_unicode=False):
 def normalize_unicode(s):
     return unicodedata.normalize("NFKC", s)
     
-def strip_accents(s):
+def strip_accents_slow(s):
     """
-    Remove accents from the provided unicode string.
+    Remove accents from the provided unicode string by decomposing it and dropping the combining characters. This is
+    the reference implementation for strip_accents().
     
     Arguments:
     s -- unicode string to remove accents from.
@@ -50,6 +52,77 @@ def strip_accents(s):
     return normalize_unicode(stripped_form)
     #return ''.join((c for c in unicodedata.normalize('NFD', s) if unicodedata.category(c) != 'Mn'))
 
+class StripAccentsTable(dict):
+    """
+    A translation table for str.translate() that maps each character to the character(s) it becomes once the accents are
+    removed. Entries for characters that were not pre-computed are added the first time that they are seen.
+    
+    Stripping the accents of each character separately and then normalizing the whole string gives the same result as
+    strip_accents_slow() since the only characters that decomposition re-orders are combining characters (which are
+    removed anyway).
+    """
+    
+    # The Latin, Greek, Greek Extended and general punctuation ranges
+    PRECOMPUTED_RANGES = [(0x0000, 0x036F), (0x0370, 0x03FF), (0x1E00, 0x1FFF), (0x2000, 0x206F)]
+    
+    def __init__(self):
+        super().__init__()
+        
+        for start, end in StripAccentsTable.PRECOMPUTED_RANGES:
+            for code_point in range(start, end + 1):
+                self[code_point]
+    
+    def __missing__(self, code_point):
+        self[code_point] = strip_accents_slow(chr(code_point))
+        return self[code_point]
+
+strip_accents_table = None
+
+def strip_accents(s):
+    """
+    Remove accents from the provided unicode string.
+    
+    Arguments:
+    s -- unicode string to remove accents from.
+    """
+    
+    global strip_accents_table
+    
+    if strip_accents_table is None:
+        strip_accents_table = StripAccentsTable()
+    
+    return normalize_unicode(s.translate(strip_accents_table))
+
+@lru_cache(maxsize=100000)
+def strip_accents_word(word):
+    """
+    Remove accents from the provided word. This caches the results and is intended for strings that are looked up
+    repeatedly (like the words of a search or of a lexicon).
+    
+    Arguments:
+    word -- unicode string to remove accents from.
+    """
+    
+    return strip_accents(word)
+
+def strip_accents_batch(strings):
+    """
+    Remove accents from each of the provided unicode strings (like the content of a list of verses). The strings are
+    converted at once.
+    
+    Arguments:
+    strings -- a list of unicode strings to remove accents from.
+    """
+    
+    # Fall back to converting the strings separately if the separator is used within them
+    if any(["\0" in s for s in strings]):
+        return [strip_accents(s) for s in strings]
+    
+    if len(strings) == 0:
+        return []
+    
+    return strip_accents("\0".join(strings)).split("\0")
+
 def strip_accents_str(s):
     """
     Remove accents from the provided string.
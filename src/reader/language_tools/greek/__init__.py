@@ -6,6 +6,7 @@ Created on Aug 30, 2012
 '''
 
 import re
+from functools import lru_cache
 
 class Greek():
     """
@@ -251,8 +252,18 @@ class Greek():
     
     ENDING_SIGMA_RE = re.compile("(σ(?=\Z))|(σ(?=[^\w]))",re.UNICODE)
     
+    # Matches a run of characters that beta-code entries are made of (a beta-code word)
+    BETA_CODE_WORD_RE = re.compile("[" + re.escape("".join(set("".join([entry[0] for entry in BETA_CODE_TABLE])))) + "]+")
+    
+    # The number of beta-code words whose conversion is kept in memory
+    BETA_CODE_WORD_CACHE_SIZE = 100000
+    
     ordered_code_table = None
     
+    beta_code_lookup = None
+    
+    unicode_translation_table = None
+    
     @staticmethod
     def __get_ordered_code_table__():
         """
@@ -264,6 +275,93 @@ class Greek():
     
         return Greek.ordered_code_table
     
+    @staticmethod
+    def __get_beta_code_lookup__():
+        """
+        Get a dictionary that maps each beta-code entry to its priority (the position in the ordered code table) and
+        the Greek character that it converts to. Only the first entry is kept for beta-codes listed more than once.
+        """
+        
+        if Greek.beta_code_lookup is None:
+            beta_code_lookup = {}
+            
+            for priority, (beta_char, greek_char) in enumerate(Greek.__get_ordered_code_table__()):
+                beta_code_lookup.setdefault(beta_char, (priority, greek_char))
+            
+            Greek.beta_code_lookup = beta_code_lookup
+        
+        return Greek.beta_code_lookup
+    
+    @staticmethod
+    def __get_unicode_translation_table__():
+        """
+        Get a table for str.translate() that converts Greek characters into beta-code. Only the first entry is kept for
+        Greek characters listed more than once.
+        """
+        
+        if Greek.unicode_translation_table is None:
+            translation_table = {}
+            
+            for beta_char, greek_char in Greek.BETA_CODE_TABLE:
+                translation_table.setdefault(ord(greek_char), beta_char)
+            
+            Greek.unicode_translation_table = translation_table
+        
+        return Greek.unicode_translation_table
+    
+    @staticmethod
+    @lru_cache(maxsize=BETA_CODE_WORD_CACHE_SIZE)
+    def __beta_code_word_to_unicode__(beta_code_word):
+        """
+        Convert a single upper-case beta-code word (a run of characters matched by BETA_CODE_WORD_RE) into unicode.
+        
+        The entries are applied in the same order as replacing each entry of the ordered code table in turn would: the
+        longest entries win and entries of the same length are applied in the order of the table. Final sigmas are not
+        fixed here.
+        
+        Arguments:
+        beta_code_word -- A string of beta-code
+        """
+        
+        beta_code_lookup = Greek.__get_beta_code_lookup__()
+        max_length = len(Greek.__get_ordered_code_table__()[0][0])
+        
+        # Find every entry that occurs in the word
+        matches = []
+        
+        for start in range(len(beta_code_word)):
+            for length in range(1, max_length + 1):
+                entry = beta_code_lookup.get(beta_code_word[start:start + length])
+                
+                if entry is not None:
+                    matches.append((entry[0], start, length, entry[1]))
+        
+        # Apply the matches by priority, skipping those that overlap with text that was already converted
+        matches.sort()
+        
+        converted = [None] * len(beta_code_word)
+        replacements = {}
+        
+        for priority, start, length, greek_char in matches:
+            if not any(converted[start:start + length]):
+                converted[start:start + length] = [True] * length
+                replacements[start] = (length, greek_char)
+        
+        # Make the resulting string
+        result = []
+        position = 0
+        
+        while position < len(beta_code_word):
+            if position in replacements:
+                length, greek_char = replacements[position]
+                result.append(greek_char)
+                position += length
+            else:
+                result.append(beta_code_word[position])
+                position += 1
+        
+        return "".join(result)
+    
     @staticmethod
     def beta_code_str_to_unicode(beta_code_string, mode='strict'):
         """
@@ -299,12 +397,8 @@ class Greek():
         # This is necessary because Perseus texts are in lower case (but should be upper case)
         beta_code_string = beta_code_string.upper()
         
-        # We need to sort the code table such that the largest entries are first
-        beta_code_table = Greek.__get_ordered_code_table__()
-        
-        # Convert each entry
-        for beta_char, greek_char in beta_code_table:
-            beta_code_string = beta_code_string.replace(beta_char, greek_char)
+        # Convert each beta-code word
+        beta_code_string = Greek.BETA_CODE_WORD_RE.sub(lambda match: Greek.__beta_code_word_to_unicode__(match.group(0)), beta_code_string)
     
         # Fix the ending sigmas (i.e. change "λογοσ" to "λογος")
         beta_code_string = Greek.fix_final_sigma(beta_code_string)
@@ -321,11 +415,8 @@ class Greek():
         greek_unicode_string -- A string containing Greek
         """
         
-        # Convert each entry
-        for beta_char, greek_char in Greek.BETA_CODE_TABLE:
-            greek_unicode_string = greek_unicode_string.replace(greek_char, beta_char)
-            
-        return greek_unicode_string
+        # Convert each character
+        return greek_unicode_string.translate(Greek.__get_unicode_translation_table__())
         
     @staticmethod
     def unicode_to_beta_code_str(greek_unicode_string, mode='replace'):
@@ -3,6 +3,7 @@ from django.core.management.base import BaseCommand
 from reader.importer.Diogenes import DiogenesAnalysesImporter
 
 import os
+from time import time
 
 class Command(BaseCommand):
 
@@ -11,6 +12,8 @@ class Command(BaseCommand):
     def add_arguments(self, parser):
         parser.add_argument("-f", "--file", dest="filename", help="The file to import")
         parser.add_argument("-l", "--line_number", dest="line_number", help="The line-number to begin")
+        parser.add_argument("-b", "--bulk", action="store_true", dest="bulk", default=False, help="Import the lines in chunks using bulk inserts (much faster for the full analyses file)")
+        parser.add_argument("-c", "--chunk_size", dest="chunk_size", help="The number of lines to write in each transaction when doing a bulk import")
 
     def handle(self, *args, **options):
         
@@ -32,6 +35,19 @@ class Command(BaseCommand):
         
         print("Importing ", filename)
         importer = DiogenesAnalysesImporter()
-        importer.import_file(filename, start_line_number=line_number)
         
-        print(os.path.basename(filename), "successfully imported")
\ No newline at end of file
+        if options['bulk']:
+            chunk_size = options['chunk_size']
+            
+            if chunk_size is not None:
+                chunk_size = int(chunk_size)
+            
+            start_time = time()
+            line_count = importer.import_file_bulk(filename, start_line_number=line_number, chunk_size=chunk_size)
+            duration = time() - start_time
+            
+            print("%s successfully imported, lines=%i, duration=%i, lines_per_second=%.1f" % (os.path.basename(filename), line_count, duration, line_count / max(duration, 0.001)))
+        else:
+            importer.import_file(filename, start_line_number=line_number)
+            
+            print(os.path.basename(filename), "successfully imported")
\ No newline at end of file
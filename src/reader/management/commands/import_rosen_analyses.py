@@ -3,6 +3,7 @@ from django.core.management.base import BaseCommand
 from reader.importer.Rosen import RosenAnalysesImporter
 
 import os
+from time import time
 
 class Command(BaseCommand):
 
@@ -11,6 +12,8 @@ class Command(BaseCommand):
     def add_arguments(self, parser):
         parser.add_argument("-f", "--file", dest="filename", help="The file to import")
         parser.add_argument("-l", "--line_number", dest="line_number", help="The line-number to begin")
+        parser.add_argument("-b", "--bulk", action="store_true", dest="bulk", default=False, help="Parse the entries in parallel and save them using bulk inserts (much faster for the full analyses file)")
+        parser.add_argument("-p", "--processes", dest="processes", help="The number of processes to parse the entries with when doing a bulk import (defaults to the number of CPUs)")
 
     def handle(self, *args, **options):
         
@@ -32,6 +35,19 @@ class Command(BaseCommand):
         
         print("Importing ", filename)
         importer = RosenAnalysesImporter()
-        importer.import_file(filename, start_line_number=line_number)
         
-        print(os.path.basename(filename), "successfully imported")
\ No newline at end of file
+        if options['bulk']:
+            processes = options['processes']
+            
+            if processes is not None:
+                processes = int(processes)
+            
+            start_time = time()
+            description_count = importer.import_file_bulk(filename, start_line_number=line_number, processes=processes)
+            duration = time() - start_time
+            
+            print("%s successfully imported, descriptions=%i, duration=%i, descriptions_per_second=%.1f" % (os.path.basename(filename), description_count, duration, description_count / max(duration, 0.001)))
+        else:
+            importer.import_file(filename, start_line_number=line_number)
+            
+            print(os.path.basename(filename), "successfully imported")
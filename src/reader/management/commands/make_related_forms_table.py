@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from django.conf import settings
+
+from reader.utils import RelatedFormsTable
+
+from time import time
+
+class Command(BaseCommand):
+
+    help = "Creates the table of related word forms that is used for expanding search terms (re-run this after importing analyses)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("-f", "--file", dest="filename", help="The file to write the table to (defaults to the RELATED_FORMS_TABLE setting)")
+
+    def handle(self, *args, **options):
+        
+        filename = options['filename']
+        
+        if filename is None:
+            filename = settings.RELATED_FORMS_TABLE
+        
+        # Validate the arguments
+        if filename is None:
+            print("No filename was provided and the RELATED_FORMS_TABLE setting is not defined")
+            return
+        
+        print("Creating the related forms table...")
+        start_time = time()
+        
+        table = RelatedFormsTable.build()
+        table.save(filename)
+        
+        print("Related forms table successfully created, lemmas=%i, forms=%i, duration=%i" % (len(table.lemma_forms), len(table.form_lemmas), time() - start_time))
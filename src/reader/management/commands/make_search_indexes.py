@@ -5,14 +5,18 @@ from reader.models import Work
 from django.db.models import Q
 from django.conf import settings
 
+from time import time
+
 class Command(BaseCommand):
 
-    help = "Creates the indexes necessary for facilitating searches"
+    help = "Creates the indexes necessary for facilitating searches (works already in the index are skipped unless verses were added to or removed from them; use --verify to detect verses changed in place too)"
 
     def add_arguments(self, parser):
         parser.add_argument("-w", "--work", dest="work", help="The work to index")
         parser.add_argument("-c", "--clear", action="store_true", dest="clear_indexes", default=False, help="Clear the existing indexes before starting")
         parser.add_argument("-f", "--fresh", action="store_true", dest="fresh_index", default=False, help="Start with a fresh index for the given work before re-indexing it")
+        parser.add_argument("-j", "--jobs", type=int, dest="jobs", default=None, help="The number of processes to use when indexing all works (re-running resumes an interrupted build)")
+        parser.add_argument("--verify", action="store_true", dest="verify", default=False, help="Compare the checksums of the verses of the works that are already in the index so that works whose verses were changed in place are re-indexed too (this reads every verse; without it, only works with verses added or removed are detected as changed)")
 
     def handle(self, *args, **options):
         
@@ -36,8 +40,14 @@ class Command(BaseCommand):
                 return
             
             print("Creating search indexes...")
-            WorkIndexer.index_all_works()
-            print("Search indexes successfully created")
+            start_time = time()
+            
+            if options['jobs'] is not None:
+                verse_count = WorkIndexer.index_all_works_parallel(options['jobs'], verify=options['verify'])
+            else:
+                verse_count = WorkIndexer.index_all_works(verify=options['verify'])
+            
+            print("Search indexes successfully created, verses=%i, verses_per_second=%i" % (verse_count, verse_count / max(time() - start_time, 0.001)))
             
         # Index the provided work
         else:
@@ -54,7 +64,8 @@ class Command(BaseCommand):
                     print("Existing index for work successfully deleted")
                 
                 print("Creating search indexes for work...")
-                WorkIndexer.index_work(work)
-                print("Search indexes successfully created")
+                start_time = time()
+                verse_count = WorkIndexer.index_work(work)
+                print("Search indexes successfully created, verses=%i, verses_per_second=%i" % (verse_count, verse_count / max(time() - start_time, 0.001)))
             except Work.DoesNotExist:
                 print("Work could not be found with the given title")
\ No newline at end of file
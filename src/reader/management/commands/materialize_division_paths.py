@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand
+
+from reader.models import Work, Division
+from django.db.models import Q
+
+from time import time
+
+class Command(BaseCommand):
+
+    help = "Populates the path columns of the divisions (full_descriptor, full_title_path, ancestor_ids and depth) for divisions imported before they existed"
+
+    def add_arguments(self, parser):
+        parser.add_argument("-w", "--work", dest="work", help="The work to update (all works will be updated if not provided)")
+        parser.add_argument("-f", "--force", action="store_true", dest="force", default=False, help="Update the works whose divisions already have paths too")
+
+    def handle(self, *args, **options):
+        
+        work_title = options['work']
+        
+        if work_title is None and len(args) > 0:
+            work_title = args[0]
+        
+        force = options['force']
+        
+        if work_title is not None:
+            works = Work.objects.filter( Q(title=work_title) | Q(title_slug=work_title) )
+            
+            if len(works) == 0:
+                print("Work could not be found with the given title")
+                return
+        else:
+            works = Work.objects.all()
+        
+        start_time = time()
+        division_count = 0
+        
+        print("Updating division paths...")
+        
+        for work in works:
+            
+            # Skip the works whose divisions already have paths
+            if not force and not Division.objects.filter(work=work, full_descriptor__isnull=True).exists():
+                continue
+            
+            divisions = list(Division.objects.filter(work=work).defer('original_content'))
+            
+            # Compute the paths in memory and write them in batches (without sending the save signals since the
+            # content of the divisions didn't change)
+            Division.preload_parent_divisions(divisions)
+            Division.update_paths(divisions)
+            Division.objects.bulk_update(divisions, Division.PATH_FIELDS, batch_size=500)
+            
+            division_count = division_count + len(divisions)
+        
+        print("Division paths successfully updated, divisions=%i, duration=%i" % (division_count, time() - start_time))
@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand
+
+from reader.models import Work, Division, RenderedDivision
+from reader.utils.work_helpers import render_division
+from django.db.models import Q
+
+from time import time
+
+class Command(BaseCommand):
+
+    help = "Renders the HTML of the readable divisions ahead of time so that the works can be read without converting the content"
+
+    def add_arguments(self, parser):
+        parser.add_argument("-w", "--work", dest="work", help="The work to render (all works will be rendered if not provided)")
+        parser.add_argument("-f", "--force", action="store_true", dest="force", default=False, help="Render the divisions that were already rendered too")
+
+    def handle(self, *args, **options):
+        
+        work_title = options['work']
+        
+        if work_title is None and len(args) > 0:
+            work_title = args[0]
+        
+        force = options['force']
+        
+        if work_title is not None:
+            works = Work.objects.filter( Q(title=work_title) | Q(title_slug=work_title) )
+            
+            if len(works) == 0:
+                print("Work could not be found with the given title")
+                return
+        else:
+            works = Work.objects.all()
+        
+        start_time = time()
+        division_count = 0
+        
+        print("Rendering divisions...")
+        
+        for work in works:
+            divisions = Division.objects.filter(work=work, readable_unit=True)
+            
+            # Skip the divisions that were already rendered
+            if not force:
+                divisions = divisions.filter(rendereddivision__isnull=True)
+            
+            for division in divisions:
+                RenderedDivision.store_html(division, render_division(work, division))
+                division_count = division_count + 1
+        
+        print("Divisions successfully rendered, divisions=%i, duration=%i" % (division_count, time() - start_time))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from reader.contentsearch import WorkIndexer
+from reader.models import IndexChange
+
+class Command(BaseCommand):
+
+    help = "Applies the recorded changes to works, divisions and verses to the search indexes"
+
+    def add_arguments(self, parser):
+        parser.add_argument("-b", "--batch-size", type=int, dest="batch_size", default=1000, help="The number of changes to apply per commit")
+
+    def handle(self, *args, **options):
+        
+        batch_size = options['batch_size']
+        
+        print("Applying %i changes to the search indexes..." % IndexChange.objects.count())
+        change_count = WorkIndexer.apply_index_changes(batch_size)
+        print("Search indexes successfully updated, changes=%i" % change_count)
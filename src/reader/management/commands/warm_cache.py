@@ -0,0 +1,76 @@
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.urls import reverse
+
+from reader.models import Work, Author, Division
+from reader.utils.work_helpers import get_work_page_json
+from django.db.models import Q
+
+from time import time
+
+class Command(BaseCommand):
+
+    help = "Populates the cache with the list of works, the type-ahead hints and the chapters of the works (run this after deploying)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("-w", "--work", dest="work", help="The work whose chapters ought to be cached (all works will be cached if not provided)")
+        parser.add_argument("--host", dest="host", default="localhost", help="The host name that the site is served from (the cached pages are specific to the host)")
+        parser.add_argument("--insecure", action="store_false", dest="secure", default=True, help="Request the pages over HTTP rather than HTTPS (the cached pages are specific to the scheme too)")
+        parser.add_argument("--skip-chapters", action="store_true", dest="skip_chapters", default=False, help="Only cache the list of works and the type-ahead hints")
+
+    def handle(self, *args, **options):
+
+        work_title = options['work']
+
+        if work_title is None and len(args) > 0:
+            work_title = args[0]
+
+        if work_title is not None:
+            works = Work.objects.filter( Q(title=work_title) | Q(title_slug=work_title) )
+
+            if len(works) == 0:
+                print("Work could not be found with the given title")
+                return
+        else:
+            works = Work.objects.all()
+
+        start_time = time()
+
+        # Request the pages that are cached by the views (the cache keys include the host and the scheme so use the ones
+        # of the site)
+        print("Caching the list of works and the type-ahead hints...")
+
+        client = Client(HTTP_HOST=options['host'])
+
+        urls = [reverse('api_works_list'), reverse('api_works_typeahead_hints')]
+
+        for author in Author.objects.all().values_list('name', flat=True).distinct():
+            urls.append(reverse('api_works_list_for_author', args=[author]))
+
+        for url in urls:
+            response = client.get(url, secure=options['secure'])
+
+            if response.status_code != 200:
+                print("Unable to cache url=%s, status=%i" % (url, response.status_code))
+
+        print("Pages successfully cached, pages=%i, duration=%i" % (len(urls), time() - start_time))
+
+        if options['skip_chapters']:
+            return
+
+        # Cache the chapters of the works
+        start_time = time()
+        chapter_count = 0
+
+        print("Caching chapters...")
+
+        for work in works:
+            for division in Division.objects.filter(work=work, readable_unit=True).order_by('sequence_number'):
+                descriptors = dict(zip(['division_0', 'division_1', 'division_2', 'division_3'], division.get_division_indicators()))
+
+                get_work_page_json(title=work.title_slug, **descriptors)
+                chapter_count = chapter_count + 1
+
+        duration = time() - start_time
+
+        print("Chapters successfully cached, chapters=%i, duration=%i, chapters_per_second=%.1f" % (chapter_count, duration, chapter_count / max(duration, 0.001)))
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.27 on 2026-10-17 21:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reader', '0012_auto_20230420_0045'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IndexChange',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_type', models.CharField(choices=[('work', 'Work'), ('division', 'Division'), ('verse', 'Verse')], max_length=10)),
+                ('object_id', models.IntegerField()),
+                ('deleted', models.BooleanField(default=False)),
+            ],
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.27 on 2026-10-17 21:14
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reader', '0013_index_change'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RenderedDivision',
+            fields=[
+                ('division', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to='reader.division')),
+                ('html', models.BinaryField()),
+            ],
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.27 on 2026-10-17 21:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reader', '0014_rendered_division'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='division',
+            name='ancestor_ids',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='division',
+            name='depth',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='division',
+            name='full_descriptor',
+            field=models.CharField(blank=True, max_length=200, null=True),
+        ),
+        migrations.AddField(
+            model_name='division',
+            name='full_title_path',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
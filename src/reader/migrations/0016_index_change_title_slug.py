@@ -0,0 +1,18 @@
+# Generated by Django 4.2.27 on 2026-10-17 23:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reader', '0015_division_path'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='indexchange',
+            name='title_slug',
+            field=models.SlugField(null=True),
+        ),
+    ]
@@ -19,8 +19,12 @@ The following models are currently included:
 |-----------------|-----------------------------------------------------------|
 | Verse           | A verse within the work                                   |
 |-----------------|-----------------------------------------------------------|
+| RenderedDivision| The pre-rendered HTML of the verses of a division         |
+|-----------------|-----------------------------------------------------------|
 | WorkSource      | A definition of where a work came from                    |
 |-----------------|-----------------------------------------------------------|
+| IndexChange     | A change that needs to be applied to the search index     |
+|-----------------|-----------------------------------------------------------|
 | Lemma           | A root word                                               |
 |-----------------|-----------------------------------------------------------|
 | LexiconEntry    | An entry in a lexicon (form to definition relationship)   |
@@ -44,18 +48,24 @@ The following models are currently included:
 from django.db import models
 from django.db.models import Q, CASCADE, PROTECT, SET_NULL
 from django.template.defaultfilters import slugify
-from django.db.models.signals import post_save
-from django.dispatch import receiver
+from django.db.models.signals import post_save, pre_delete, m2m_changed
+from django.dispatch import receiver, Signal
 from django.core.exceptions import ObjectDoesNotExist
 from django.contrib.auth.models import User
+from django.conf import settings
 
 import logging
 import re
+import zlib
 from reader import language_tools
 
 # Get an instance of a logger
 logger = logging.getLogger(__name__)
 
+# Sent when a division is deleted on its own (the deletion of a work doesn't send one for each of its divisions so that
+# they can be deleted in bulk)
+division_deleted = Signal()
+
 class Author(models.Model):
     """
     Identifies the author of a work.
@@ -346,6 +356,12 @@ class Division(models.Model):
     parent_division  = models.ForeignKey('self', blank=True, null=True, on_delete=CASCADE)
     readable_unit    = models.BooleanField(default=False, db_index=True)
     
+    # The path to the division (materialized on save so that the hierarchy doesn't need to be walked)
+    full_descriptor  = models.CharField(max_length=200, blank=True, null=True)
+    full_title_path  = models.JSONField(blank=True, null=True)
+    ancestor_ids     = models.JSONField(blank=True, null=True)
+    depth            = models.IntegerField(blank=True, null=True)
+    
     def __str__(self):
         if self.title is not None and len(self.title) > 0:
             return self.title
@@ -376,24 +392,201 @@ class Division(models.Model):
             
             # Newly created object, so set slug
             self.update_title_slug()
+        
+        # Update the path to the division (the descriptor is stored as a string so use it as one)
+        if self.descriptor is not None:
+            self.descriptor = str(self.descriptor)
+        
+        created = self.id is None
+        old_path = (self.full_descriptor, self.full_title_path)
+        
+        self.update_path()
 
         super(Division, self).save(*args, **kwargs)
         
-    def get_division_description(self, use_titles=False, verse=None, section_divider=" "):
+        # Remove the rendered HTML of the division since it may be out of date
+        if not created:
+            RenderedDivision.objects.filter(division_id=self.id).delete()
         
-        s = ""
-        prior_was_number = False
+        # Update the divisions underneath this one if the path changed
+        if not created and old_path != (self.full_descriptor, self.full_title_path):
+            self.update_descendant_paths()
+    
+    def delete(self, *args, **kwargs):
         
-        next_division = self
+        result = super(Division, self).delete(*args, **kwargs)
+        
+        # Re-index the work since the documents of the verses that were deleted need to be removed (this isn't done with
+        # a signal so that deleting a work doesn't need to send one for each of its divisions)
+        IndexChange.record(IndexChange.WORK, self.work_id)
+        
+        division_deleted.send(sender=Division, instance=self)
+        
+        return result
+    
+    def update_descendant_paths(self):
+        """
+        Update the path columns of the divisions underneath this one. The divisions are updated without sending the
+        save signals since the change of this division already covers them.
+        """
+        
+        descendants = []
+        parents = {self.id: self}
+        
+        # Load the descendants one level at a time
+        while len(parents) > 0:
+            children = list(Division.objects.filter(parent_division__in=parents.keys()).defer('original_content'))
+            
+            for child in children:
+                child.parent_division = parents[child.parent_division_id]
+                child.update_path()
+            
+            descendants.extend(children)
+            parents = {child.id: child for child in children}
+        
+        Division.objects.bulk_update(descendants, Division.PATH_FIELDS, batch_size=500)
+    
+    def is_path_materialized(self):
+        """
+        Determine if the path columns (full_descriptor, full_title_path, ancestor_ids and depth) have been populated.
+        """
+        
+        return self.full_descriptor is not None and self.full_title_path is not None and self.ancestor_ids is not None
+    
+    def update_path(self):
+        """
+        Populate the path columns (full_descriptor, full_title_path, ancestor_ids and depth) from the parent division.
+        The division isn't saved.
+        """
+        
+        parent = self.parent_division
+        
+        if parent is None:
+            ancestor_ids = []
+            descriptors = []
+            titles = []
+        else:
+            ancestor_ids = parent.get_ancestor_ids() + [parent.id]
+            descriptors = parent.get_division_indicators()
+            titles = parent.get_division_titles()
+        
+        self.full_descriptor = "/".join([str(descriptor) for descriptor in descriptors + [self.descriptor]])
+        self.full_title_path = titles + [str(self)]
+        self.ancestor_ids = ancestor_ids
+        self.depth = len(ancestor_ids)
+    
+    def get_ancestor_ids(self):
+        """
+        Get the IDs of the parent divisions (starting at the top of the hierarchy).
+        """
+        
+        if self.is_path_materialized():
+            return list(self.ancestor_ids)
+        
+        ancestor_ids = []
+        next_division = self.parent_division
         
-        # Keep recursing upwards until we hit the top
         while next_division is not None:
+            ancestor_ids.insert(0, next_division.id)
+            next_division = next_division.parent_division
+        
+        return ancestor_ids
+
+    @staticmethod
+    def preload_verse_counts(divisions):
+        """
+        Loads the number of verses in each of the given divisions (see get_verse_count()) using a single query.
+
+        Arguments:
+        divisions -- A list of divisions to load the verse counts of
+        """
+
+        verse_counts = {}
+
+        division_ids = set([division.id for division in divisions])
+
+        if len(division_ids) > 0:
+            for entry in Verse.objects.filter(division_id__in=division_ids).values('division_id').annotate(count=models.Count('id')):
+                verse_counts[entry['division_id']] = entry['count']
+
+        for division in divisions:
+            division.verse_count = verse_counts.get(division.id, 0)
+
+        return divisions
+
+    def get_verse_count(self):
+        """
+        Get the number of verses in the division. The count loaded by preload_verse_counts() is used if available.
+        """
+
+        if getattr(self, 'verse_count', None) is None:
+            self.verse_count = Verse.objects.filter(division=self).count()
+
+        return self.verse_count
+
+    @staticmethod
+    def preload_parent_divisions(divisions):
+        """
+        Loads the parent divisions of the given divisions (all the way up the hierarchy) and attaches them
+        so that walking up parent_division doesn't cause a query for every division. This performs one query
+        per level of the hierarchy regardless of how many divisions are provided.
+
+        Arguments:
+        divisions -- A list of divisions to load the parents of
+        """
+
+        loaded_divisions = {}
+
+        for division in divisions:
+            loaded_divisions[division.id] = division
+
+        pending = list(divisions)
+
+        while len(pending) > 0:
+
+            # Get the parents that haven't been loaded yet
+            missing_ids = set()
+
+            for division in pending:
+                if division.parent_division_id is not None and division.parent_division_id not in loaded_divisions:
+                    missing_ids.add(division.parent_division_id)
+
+            if len(missing_ids) > 0:
+                for parent in Division.objects.filter(id__in=missing_ids):
+                    loaded_divisions[parent.id] = parent
+
+            # Attach the parents and move up to the next level
+            next_pending = {}
+
+            for division in pending:
+                parent = loaded_divisions.get(division.parent_division_id)
+
+                if parent is not None:
+                    division.parent_division = parent
+                    next_pending[parent.id] = parent
+
+            pending = list(next_pending.values())
+
+        return divisions
+
+    @staticmethod
+    def make_division_description(titles, verse=None, section_divider=" "):
+        """
+        Make a description of a division from the descriptors (or titles) of it and its parents.
+        
+        Arguments:
+        titles -- The descriptors or titles of the divisions (starting at the top of the hierarchy)
+        verse -- The verse to include in the description
+        section_divider -- The string to put between non-numeric descriptors
+        """
+        
+        s = ""
+        prior_was_number = False
+        
+        # Work upwards from the bottom of the hierarchy
+        for title in reversed(titles):
             
-            # Get the title that we are going to use
-            if use_titles:
-                title = str(next_division)
-            else:
-                title = str(next_division.descriptor)
+            title = str(title)
             
             # Determine if this is a number
             is_number = re.match("^[0-9]+ ?$", title)
@@ -412,9 +605,6 @@ class Division(models.Model):
             else:
                 s = title + s
             
-            # Get the next division
-            next_division = next_division.parent_division
-            
         # Make sure we don't have any trailing spaces
         s = s.strip()
             
@@ -430,6 +620,41 @@ class Division(models.Model):
         # Return the result
         return s
     
+    PATH_FIELDS = ['full_descriptor', 'full_title_path', 'ancestor_ids', 'depth']
+    
+    @staticmethod
+    def update_paths(divisions):
+        """
+        Populate the path columns of the given divisions without saving them. The parents of the divisions ought to
+        be in the list or be preloaded (see preload_parent_divisions) to avoid a query for each division.
+        
+        Arguments:
+        divisions -- A list of divisions to update
+        """
+        
+        # Attach the parents that are in the list
+        divisions_by_id = {division.id: division for division in divisions}
+        
+        for division in divisions:
+            if division.parent_division_id in divisions_by_id:
+                division.parent_division = divisions_by_id[division.parent_division_id]
+        
+        # Clear the existing paths so that they are computed from the hierarchy and not from stale values
+        for division in divisions:
+            division.full_descriptor = None
+            division.full_title_path = None
+            division.ancestor_ids = None
+        
+        # Update the parents before the divisions underneath them so that their paths can be used
+        for division in sorted(divisions, key=lambda d: len(d.get_ancestor_ids())):
+            division.update_path()
+        
+        return divisions
+    
+    def get_division_description(self, use_titles=False, verse=None, section_divider=" "):
+        
+        return Division.make_division_description(self.get_division_indicators(use_titles), verse, section_divider)
+    
     def get_division_description_titles(self):
         return self.get_division_description(True)
         
@@ -438,6 +663,13 @@ class Division(models.Model):
         Make a list of the divisions.
         """
         
+        # Use the materialized path if it is available
+        if self.is_path_materialized():
+            if use_titles:
+                return list(self.full_title_path)
+            else:
+                return self.full_descriptor.split("/")
+        
         descriptors = []
         
         next_division = self
@@ -480,15 +712,95 @@ class Verse(models.Model):
         else:
             return str(self.sequence_number)
         
-    def save(self, *args, **kwargs):
+    def normalize_content(self):
+        """
+        Normalize the content to the same form of Unicode so that it can be searched (save() calls this; call it
+        before inserting verses with bulk_create()).
+        """
         
-        # Normalize the content so that we can do searches by normalizing to the same form of Unicode
         if not isinstance(self.content, str):
             self.content = language_tools.normalize_unicode(str(self.content, "UTF-8", 'strict'))
         else:
             self.content = language_tools.normalize_unicode(self.content)
+    
+    def save(self, *args, **kwargs):
+        
+        # Normalize the content so that we can do searches by normalizing to the same form of Unicode
+        self.normalize_content()
         
         super(Verse, self).save(*args, **kwargs)
+        
+        # Record the change for the search index (this isn't done with a signal so that deleting a work doesn't need to
+        # send one for each of its verses)
+        IndexChange.record(IndexChange.VERSE, self.id)
+        
+        self.content_changed()
+    
+    def delete(self, *args, **kwargs):
+        
+        verse_id = self.id
+        result = super(Verse, self).delete(*args, **kwargs)
+        
+        IndexChange.record(IndexChange.VERSE, verse_id, deleted=True)
+        
+        self.content_changed()
+        
+        return result
+    
+    def content_changed(self):
+        """
+        Remove the rendered HTML of the division and change the version of the content of the work (which the cached
+        pages and their ETags are based on) since the verse changed.
+        """
+        
+        # Imported here since the work helpers import the models
+        from reader.utils.work_helpers import clear_work_content_version
+        
+        RenderedDivision.objects.filter(division_id=self.division_id).delete()
+        clear_work_content_version(self.division.work_id)
+    
+class RenderedDivision(models.Model):
+    """
+    The HTML of the verses of a readable division, rendered ahead of time (see the render_divisions command) so that
+    the content doesn't need to be converted from XML when the division is read. The HTML is stored compressed.
+    
+    The rendered HTML is removed when the division or one of its verses is saved or deleted, and when the work is saved
+    (which the importer does once the divisions and verses of the work are flushed).
+    """
+    
+    division = models.OneToOneField(Division, on_delete=CASCADE, primary_key=True)
+    html     = models.BinaryField()
+    
+    def __str__(self):
+        return str(self.division)
+    
+    @staticmethod
+    def get_html(division):
+        """
+        Get the rendered HTML of the division or None if it has not been rendered.
+        
+        Arguments:
+        division -- The division to get the HTML of
+        """
+        
+        try:
+            rendered_division = RenderedDivision.objects.get(division=division)
+        except RenderedDivision.DoesNotExist:
+            return None
+        
+        return zlib.decompress(bytes(rendered_division.html)).decode('utf-8')
+    
+    @staticmethod
+    def store_html(division, html):
+        """
+        Store the rendered HTML of the division.
+        
+        Arguments:
+        division -- The division that the HTML is of
+        html -- The HTML
+        """
+        
+        RenderedDivision.objects.update_or_create(division=division, defaults={'html': zlib.compress(html.encode('utf-8'))})
     
 class WorkSource(models.Model):
     """
@@ -500,6 +812,51 @@ class WorkSource(models.Model):
     description = models.TextField(blank=True)
     work        = models.ForeignKey(Work, on_delete=CASCADE)
     
+class IndexChange(models.Model):
+    """
+    Records a change to a work, division or verse that has not been applied to the search index yet. The changes are
+    applied by WorkIndexer.apply_index_changes() (see the update_search_indexes command).
+    
+    This model has no foreign keys since the changes to deleted objects must be retained. The slug of deleted works
+    is kept so that their documents can be removed from the index.
+    
+    The changes are recorded per work and division so that deleting a work doesn't need to load its verses; the verses
+    are only recorded when they are saved or deleted individually (see Verse.save() and Verse.delete()).
+    """
+    
+    WORK = "work"
+    DIVISION = "division"
+    VERSE = "verse"
+    
+    OBJECT_TYPES = (
+        (WORK, "Work"),
+        (DIVISION, "Division"),
+        (VERSE, "Verse"),
+    )
+    
+    object_type = models.CharField(max_length=10, choices=OBJECT_TYPES)
+    object_id   = models.IntegerField()
+    deleted     = models.BooleanField(default=False)
+    title_slug  = models.SlugField(null=True)
+    
+    def __str__(self):
+        return "%s %i%s" % (self.object_type, self.object_id, " (deleted)" if self.deleted else "")
+    
+    @staticmethod
+    def record(object_type, object_id, deleted=False, title_slug=None):
+        """
+        Record a change unless journaling of changes is disabled (see SEARCH_INDEX_CHANGE_JOURNAL).
+        
+        Arguments:
+        object_type -- The type of the object that changed (IndexChange.WORK, IndexChange.DIVISION or IndexChange.VERSE)
+        object_id -- The ID of the object that changed
+        deleted -- Indicates if the object was deleted
+        title_slug -- The slug of the work (needed for deleted works)
+        """
+        
+        if settings.SEARCH_INDEX_CHANGE_JOURNAL:
+            IndexChange.objects.create(object_type=object_type, object_id=object_id, deleted=deleted, title_slug=title_slug)
+    
 class Lemma(models.Model):
     """
     Represents a root word.
@@ -513,13 +870,21 @@ class Lemma(models.Model):
     def __str__(self):
         return str(self.lexical_form)
     
-    def save(self, *args, **kwargs):
+    def normalize_lexical_form(self):
+        """
+        Normalize the lexical form and populate the basic form (this is done by save() but needs to be called directly
+        when the lemmas are saved with bulk_create()).
+        """
         
         # Normalize the form to NFKC so that we can do queries reliably
         self.lexical_form = language_tools.normalize_unicode(self.lexical_form)
         
         # Save the basic form
         self.basic_lexical_form = language_tools.strip_accents(self.lexical_form)
+    
+    def save(self, *args, **kwargs):
+        
+        self.normalize_lexical_form()
 
         super(Lemma, self).save(*args, **kwargs)
 
@@ -572,13 +937,21 @@ class WordForm(models.Model):
     def __str__(self):
         return str(self.form)
     
-    def save(self, *args, **kwargs):
+    def normalize_form(self):
+        """
+        Normalize the form and populate the basic form (this is done by save() but needs to be called directly when
+        the forms are saved with bulk_create()).
+        """
         
         # Normalize the form to NFKC so that we can do queries reliably
         self.form = language_tools.normalize_unicode(self.form)
         
         # Save the basic form
         self.basic_form = language_tools.strip_accents(self.form)
+    
+    def save(self, *args, **kwargs):
+        
+        self.normalize_form()
 
         super(WordForm, self).save(*args, **kwargs)
     
@@ -907,3 +1280,26 @@ class NoteReference(models.Model):
 @receiver(post_save, sender=Work)
 def work_alias_create(sender, instance, signal, created, **kwargs):
     WorkAlias.populate_alias_from_work(instance)
+
+# Record the changes that need to be applied to the search index
+@receiver(post_save, sender=Work)
+def work_index_change(sender, instance, **kwargs):
+    IndexChange.record(IndexChange.WORK, instance.id)
+
+@receiver(pre_delete, sender=Work)
+def work_index_delete(sender, instance, **kwargs):
+    IndexChange.record(IndexChange.WORK, instance.id, deleted=True, title_slug=instance.title_slug)
+
+@receiver(m2m_changed, sender=Work.authors.through)
+def work_authors_index_change(sender, instance, action, **kwargs):
+    if action in ("post_add", "post_remove", "post_clear") and isinstance(instance, Work):
+        IndexChange.record(IndexChange.WORK, instance.id)
+
+@receiver(post_save, sender=Division)
+def division_index_change(sender, instance, **kwargs):
+    IndexChange.record(IndexChange.DIVISION, instance.id)
+
+# Remove the rendered HTML that is out of date (imports send this once the divisions and verses are flushed)
+@receiver(post_save, sender=Work)
+def work_rendered_divisions_change(sender, instance, **kwargs):
+    RenderedDivision.objects.filter(division__work=instance).delete()
@@ -49,6 +49,37 @@ class TestDiogenesAnalysesImport(TestReader):
         self.assertEqual(descriptions[0].meaning, "favourite slave")
         
         
+    def get_imported_descriptions(self):
+        
+        descriptions = []
+        
+        for description in WordDescription.objects.all().select_related('word_form').prefetch_related('cases', 'dialects'):
+            descriptions.append((description.word_form.form, description.word_form.basic_form, description.lemma_id, description.description, str(description),
+                                 sorted(case.name for case in description.cases.all()), sorted(dialect.name for dialect in description.dialects.all())))
+        
+        return sorted(descriptions)
+    
+    def test_import_file_bulk(self):
+        
+        # Get the lemmas so that we can match up the analyses
+        DiogenesLemmataImporter.import_file(self.get_test_resource_file_name("greek-lemmata.txt"), return_created_objects=True)
+        
+        # Import the analyses one line at a time
+        DiogenesAnalysesImporter.import_file(self.get_test_resource_file_name("greek-analyses2.txt"), return_created_objects=True)
+        
+        expected_form_count = WordForm.objects.count()
+        expected = self.get_imported_descriptions()
+        
+        WordForm.objects.all().delete()
+        
+        # Import the analyses in bulk (using a small chunk size so that several chunks are written)
+        line_count = DiogenesAnalysesImporter.import_file_bulk(self.get_test_resource_file_name("greek-analyses2.txt"), chunk_size=3)
+        
+        self.assertEqual(line_count, expected_form_count)
+        self.assertEqual(WordForm.objects.count(), expected_form_count)
+        self.assertGreater(len(expected), 0)
+        self.assertEqual(self.get_imported_descriptions(), expected)
+        
     def make_lemma(self):
         lemma = Lemma(lexical_form=Greek.beta_code_str_to_unicode("a(/bra"), language="Greek", reference_number=537850)
         lemma.save()
@@ -39,4 +39,66 @@ class TestDivisionModel(TestReader):
         
         division = Division.objects.filter(work=self.importer.work)[1]
         
-        self.assertEqual(division.get_full_division_indicator_string(), 'Matthew/1')
\ No newline at end of file
+        self.assertEqual(division.get_full_division_indicator_string(), 'Matthew/1')
+        
+    def test_division_path(self):
+        book_xml = self.load_test_resource('nt_gk.xml')
+        self.importer.import_xml_string(book_xml)
+        
+        division = Division.objects.filter(work=self.importer.work)[1]
+        
+        # The path should have been populated at import
+        self.assertEqual(division.full_descriptor, 'Matthew/1')
+        self.assertEqual(division.full_title_path, ['ΚΑΤΑ ΜΑΘΘΑΙΟΝ', 'chapter 1'])
+        self.assertEqual(division.ancestor_ids, [division.parent_division_id])
+        self.assertEqual(division.depth, 1)
+        
+        # The description shouldn't require loading the parent divisions
+        with self.assertNumQueries(0):
+            self.assertEqual(division.get_division_description(use_titles=True), "ΚΑΤΑ ΜΑΘΘΑΙΟΝ chapter 1")
+        
+        # The path should match the one found by walking up the hierarchy
+        division.full_descriptor = None
+        self.assertEqual(division.get_division_indicators(), ['Matthew', '1'])
+        
+    def test_division_path_parent_change(self):
+        book_xml = self.load_test_resource('nt_gk.xml')        
+        self.importer.import_xml_string(book_xml)
+        
+        division = Division.objects.filter(work=self.importer.work)[1]
+        
+        # Changing the parent should update the divisions underneath it
+        parent = division.parent_division
+        parent.descriptor = "Mt"
+        parent.save()
+        
+        division = Division.objects.get(id=division.id)
+        self.assertEqual(division.full_descriptor, 'Mt/1')
+        
+    def test_update_paths(self):
+        book_xml = self.load_test_resource('nt_gk.xml')        
+        self.importer.import_xml_string(book_xml)
+        
+        # Clear out the paths as if the divisions were imported before they existed
+        Division.objects.filter(work=self.importer.work).update(full_descriptor=None, full_title_path=None, ancestor_ids=None, depth=None)
+        
+        divisions = list(Division.objects.filter(work=self.importer.work))
+        
+        with self.assertNumQueries(0):
+            Division.update_paths(divisions)
+        
+        self.assertEqual(divisions[1].full_descriptor, 'Matthew/1')
+        self.assertEqual(divisions[1].depth, 1)
+        
+    def test_preload_verse_counts(self):
+        book_xml = self.load_test_resource('nt_gk.xml')        
+        self.importer.import_xml_string(book_xml)
+        
+        divisions = list(Division.objects.filter(work=self.importer.work))
+        
+        Division.preload_verse_counts(divisions)
+        
+        with self.assertNumQueries(0):
+            verse_counts = [division.get_verse_count() for division in divisions]
+        
+        self.assertEqual(verse_counts, [Verse.objects.filter(division=division).count() for division in divisions])
@@ -1,12 +1,66 @@
 from reader.language_tools.greek import Greek
 from reader import language_tools
 from . import TestReader
+import random
+import time
+import re
+import os
+
+def replace_beta_code(beta_code_string):
+    """
+    Convert beta-code into unicode by replacing each entry of the code table in turn. This is how
+    Greek.beta_code_to_unicode() used to work and it is used as a reference for the output.
+    """
+    
+    beta_code_string = beta_code_string.upper()
+    
+    for beta_char, greek_char in Greek.__get_ordered_code_table__():
+        beta_code_string = beta_code_string.replace(beta_char, greek_char)
+        
+    return Greek.fix_final_sigma(beta_code_string)
+
+def replace_unicode(greek_unicode_string):
+    """
+    Convert unicode into beta-code by replacing each entry of the code table in turn.
+    """
+    
+    for beta_char, greek_char in Greek.BETA_CODE_TABLE:
+        greek_unicode_string = greek_unicode_string.replace(greek_char, beta_char)
+        
+    return greek_unicode_string
 
 class TestGreekLanguageTools(TestReader):
     
     def test_strip_accents(self):
         self.assertEqual(language_tools.normalize_unicode(language_tools.strip_accents("θεός")), "θεος")
         
+    def test_strip_accents_matches_decomposition(self):
+        
+        test_files_dir = os.path.dirname(self.get_test_resource_file_name('07_gk.xml'))
+        
+        # Check every line of the test corpus, both as it is and converted from beta-code
+        for file_name in sorted(os.listdir(test_files_dir)):
+            
+            try:
+                with open(os.path.join(test_files_dir, file_name), 'r', encoding='utf-8') as f:
+                    text = f.read()
+            except (UnicodeDecodeError, IsADirectoryError):
+                continue
+            
+            for lines in [text.splitlines(), Greek.beta_code_to_unicode(text).splitlines()]:
+                expected = [language_tools.strip_accents_slow(line) for line in lines]
+                
+                self.assertEqual([language_tools.strip_accents(line) for line in lines], expected)
+                self.assertEqual(language_tools.strip_accents_batch(lines), expected)
+        
+    def test_strip_accents_word(self):
+        self.assertEqual(language_tools.strip_accents_word("θεός"), "θεος")
+        self.assertEqual(language_tools.strip_accents_word("θεός"), "θεος")
+        
+    def test_strip_accents_batch(self):
+        self.assertEqual(language_tools.strip_accents_batch(["θεός", "ἤλιος", "", "a\0b"]), ["θεος", "ηλιος", "", "a\0b"])
+        self.assertEqual(language_tools.strip_accents_batch([]), [])
+        
     def test_strip_accents_str(self):
         self.assertEqual(language_tools.normalize_unicode("θεός"), "θεός")
     
@@ -72,3 +126,39 @@ fwnh=s sunegraya/mhn."""
             
     def test_fix_final_sigma(self):
         self.assertEqual(Greek.fix_final_sigma("κόσμοσ"), "κόσμος")
+
+    def test_beta_code_conversion_matches_replacement(self):
+        
+        # Make random strings out of the characters used in beta-code (including malformed beta-code)
+        characters = sorted(set("".join([beta_char for beta_char, greek_char in Greek.BETA_CODE_TABLE]))) + [' ', 'a', '.', '\n']
+        random_generator = random.Random(1)
+        
+        for i in range(20000):
+            beta_code = "".join([random_generator.choice(characters) for j in range(random_generator.randint(1, 12))])
+            greek = replace_beta_code(beta_code)
+            
+            self.assertEqual(Greek.beta_code_to_unicode(beta_code), greek)
+            self.assertEqual(Greek.unicode_to_beta_code(greek), replace_unicode(greek))
+            
+    def test_beta_code_conversion_benchmark(self):
+        
+        # Get the text of a full Perseus work
+        with open(self.get_test_resource_file_name('07_gk.xml'), 'r', encoding='utf-8') as f:
+            beta_code = re.sub("<[^>]+>", "", f.read())
+        
+        greek = replace_beta_code(beta_code)
+        
+        self.assertEqual(Greek.beta_code_to_unicode(beta_code), greek)
+        self.assertEqual(Greek.unicode_to_beta_code(greek), replace_unicode(greek))
+        
+        for name, convert_fx, text in [("beta_code_to_unicode (replacement)", replace_beta_code, beta_code),
+                                       ("beta_code_to_unicode", Greek.beta_code_to_unicode, beta_code),
+                                       ("unicode_to_beta_code (replacement)", replace_unicode, greek),
+                                       ("unicode_to_beta_code", Greek.unicode_to_beta_code, greek)]:
+            
+            start = time.time()
+            
+            for i in range(20):
+                convert_fx(text)
+                
+            print("%s, chars=%i, average_duration=%s seconds" % (name, len(text), round((time.time() - start) / 20, 6)))
@@ -0,0 +1,63 @@
+from django.test import TestCase
+from reader.importer import ImportUnitOfWork
+from reader.models import Work, Division, Verse
+
+class TestImportUnitOfWork(TestCase):
+
+    def setUp(self):
+        self.work = Work(title="test_import_unit_of_work")
+        self.work.save()
+
+        self.unit_of_work = ImportUnitOfWork()
+
+    def make_divisions(self):
+        book = Division(work=self.work, descriptor="1", title="Book 1", level=1, sequence_number=1)
+        chapter = Division(work=self.work, descriptor=2, title="Chapter 2", level=2, sequence_number=2, parent_division=book)
+        verse = Verse(division=chapter, indicator="1", sequence_number=1, content="\u03b1\u0313\u0301")
+
+        self.unit_of_work.save_division(book)
+        self.unit_of_work.save_division(chapter)
+        self.unit_of_work.save_verse(verse)
+
+        return book, chapter, verse
+
+    def test_flush(self):
+        book, chapter, verse = self.make_divisions()
+
+        # Nothing should be inserted until the objects are flushed
+        self.assertEqual(Division.objects.filter(work=self.work).count(), 0)
+
+        self.unit_of_work.flush()
+
+        # The IDs should be in the order the divisions were made and the parent should be associated
+        self.assertLess(book.id, chapter.id)
+        self.assertEqual(Division.objects.get(id=chapter.id).parent_division_id, book.id)
+
+        # The paths and slugs should be populated like save() does
+        chapter = Division.objects.get(id=chapter.id)
+        self.assertEqual(chapter.full_descriptor, "1/2")
+        self.assertEqual(chapter.ancestor_ids, [book.id])
+        self.assertEqual(chapter.title_slug, "2")
+
+        # The verse content should be normalized
+        self.assertEqual(Verse.objects.get(division=chapter).content, "\u1f04")
+
+    def test_save_after_flush(self):
+        book, chapter, verse = self.make_divisions()
+        self.unit_of_work.flush()
+
+        # Objects that were already inserted should be saved right away
+        verse.content = "updated"
+        self.unit_of_work.save_verse(verse)
+
+        self.assertEqual(Verse.objects.get(id=verse.id).content, "updated")
+        self.assertEqual(Verse.objects.filter(division__work=self.work).count(), 1)
+
+    def test_flush_size(self):
+        self.unit_of_work = ImportUnitOfWork(flush_size=3)
+
+        # The objects should be flushed once there are enough of them
+        self.make_divisions()
+
+        self.assertEqual(Division.objects.filter(work=self.work).count(), 2)
+        self.assertEqual(Verse.objects.filter(division__work=self.work).count(), 1)
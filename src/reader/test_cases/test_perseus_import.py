@@ -264,6 +264,43 @@ th=s *)ioudai+kh=s a)rxaiologi/as.</head></list></note></div1>"""
         file_name = self.get_test_resource_file_name('plut.cat.ma_gk_portion.xml')
         self.importer.import_file(file_name)
     
+    def get_imported_content(self, work):
+        
+        divisions = []
+        
+        for division in Division.objects.filter(work=work).order_by("sequence_number"):
+            verses = [(verse.sequence_number, verse.indicator, verse.content, verse.original_content) for verse in division.verse_set.order_by("sequence_number")]
+            parent_sequence_number = division.parent_division.sequence_number if division.parent_division is not None else None
+            
+            divisions.append((division.sequence_number, parent_sequence_number, division.level, division.type, division.descriptor, division.title, division.original_title,
+                              division.original_content, division.readable_unit, verses))
+        
+        return divisions
+    
+    def test_import_file_streaming_matches_document(self):
+        
+        for file_name, options in [('1_gk.xml', {'state_set': 0}), ('52_gk.xml', {}), ('plut.cat.ma_gk_portion.xml', {}),
+                                   ('aesch.ag_eng.xml', {'state_set': "*", 'ignore_division_markers': True, 'use_line_count_for_divisions': True})]:
+            
+            # Import the file while it is being parsed
+            importer = PerseusTextImporter(**options)
+            importer.import_file(self.get_test_resource_file_name(file_name))
+            streamed = self.get_imported_content(importer.work)
+            
+            # Import the file from a DOM of the entire document
+            importer = PerseusTextImporter(**options)
+            importer.import_xml_string(self.load_test_resource(file_name).encode('utf-8'))
+            
+            self.assertGreater(len(streamed), 0)
+            self.assertEqual(streamed, self.get_imported_content(importer.work), file_name)
+    
+    def test_read_tei_header(self):
+        
+        document = PerseusTextImporter.read_tei_header(self.get_test_resource_file_name('aristot.vir_gk.xml'))
+        
+        self.assertEqual(PerseusTextImporter.get_author(document), "Aristotle")
+        self.assertEqual(len(document.getElementsByTagName("body")), 0)
+        
     def test_load_book_with_basic_div(self):
         file_name = self.get_test_resource_file_name('52_gk.xml')
         self.importer.import_file(file_name)
@@ -842,6 +879,24 @@ semno/teron *)idoumai/an w)no/masan.
         self.assertEqual(divisions.count(), 13)
         self.assertEqual(divisions.filter(readable_unit=True).count(), 11) #is 13 without using only_leaf_divisions_readable = True 
         
+    def test_load_book_verses_made_from_division_documents(self):
+        
+        # Make an importer that fails if the original content of a division would need to be parsed again
+        class NoReparsePerseusTextImporter(PerseusTextImporter):
+            def make_verses_for_division(self, division, state_set, document=None):
+                if document is None:
+                    raise Exception("The original content of the division was parsed again")
+                
+                return super().make_verses_for_division(division, state_set, document)
+        
+        importer = NoReparsePerseusTextImporter(only_leaf_divisions_readable=True, state_set="*", use_line_count_for_divisions=True)
+        importer.import_file(self.get_test_resource_file_name('01_gk.xml'))
+        
+        divisions = Division.objects.filter(work=importer.work)
+        
+        self.assertEqual(divisions.count(), 13)
+        self.assertEqual(divisions.filter(readable_unit=True).count(), 11)
+        
     def test_load_book_explicit_division_tags(self):
         # See #503, http://lukemurphey.net/issues/503
         
@@ -46,3 +46,23 @@ class TestReaderUtils(TestReader):
         forms = utils.get_all_related_forms("αβραν", True) #a(/bran
         
         self.assertEqual(len(forms), 6) 
+        
+    def test_related_forms_table(self):
+        table = utils.RelatedFormsTable.build()
+        
+        expected_forms = [f.form for f in utils.get_all_related_forms("ἅβραν", False)]
+        
+        self.assertEqual(sorted(table.get_related_forms("ἅβραν", False)), sorted(expected_forms))
+        self.assertEqual(len(table.get_related_forms("αβραν", True)), 6)
+        self.assertEqual(table.get_related_forms("ἅβρανxyz", False), [])
+
+    @time_function_call
+    def test_get_all_related_form_strings(self):
+        forms = list(utils.get_all_related_form_strings("ἅβραν", False)) #a(/bran
+        
+        self.assertEqual(forms, [f.form for f in utils.get_all_related_forms("ἅβραν", False)])
+        self.assertEqual(len(forms), 6)
+        
+    def test_get_all_related_forms_query_count(self):
+        with self.assertNumQueries(1):
+            utils.get_all_related_forms("ἅβραν", False)
@@ -72,3 +72,50 @@ class TestRosenAnalysesImport(TestReader):
         RosenAnalysesImporter.import_file(self.get_test_resource_file_name("greek-analyses-unicode-babylon-with-variants-BOM-dupes.txt"), return_created_objects=True, raise_exception_on_match_failure=True)
         numberAtEnd = WordForm.objects.count()
         self.assertEqual(numberAtEnd - numberAtBeginning, 0)
+
+    def get_imported_descriptions(self):
+
+        descriptions = []
+
+        for description in WordDescription.objects.all().select_related('word_form', 'lemma').prefetch_related('cases', 'dialects'):
+            descriptions.append((description.word_form.form, description.word_form.basic_form, description.lemma.lexical_form, description.lemma.basic_lexical_form, description.description, str(description),
+                                 sorted(case.name for case in description.cases.all()), sorted(dialect.name for dialect in description.dialects.all())))
+
+        return sorted(descriptions)
+
+    def test_import_file_bulk(self):
+
+        file_name = self.get_test_resource_file_name("greek-analyses-unicode-babylon-with-variants-BOM-dupes.txt")
+
+        # Import the analyses one entry at a time
+        RosenAnalysesImporter.import_file(file_name, raise_exception_on_match_failure=True)
+
+        expected_form_count = WordForm.objects.count()
+        expected_lemma_count = Lemma.objects.count()
+        expected = self.get_imported_descriptions()
+
+        WordForm.objects.all().delete()
+        Lemma.objects.all().delete()
+
+        # Import the analyses in bulk (using a small chunk size so that the forms and lemmas are shared across chunks)
+        description_count = RosenAnalysesImporter.import_file_bulk(file_name, raise_exception_on_match_failure=True, processes=2, chunk_size=5)
+
+        self.assertEqual(description_count, 126)
+        self.assertEqual(WordForm.objects.count(), expected_form_count)
+        self.assertEqual(Lemma.objects.count(), expected_lemma_count)
+        self.assertEqual(self.get_imported_descriptions(), expected)
+
+    def test_import_file_bulk_existing_forms(self):
+
+        file_name = self.get_test_resource_file_name("greek-analyses-unicode-babylon-with-variants-BOM-dupes.txt")
+
+        RosenAnalysesImporter.import_file_bulk(file_name, processes=1)
+
+        form_count = WordForm.objects.count()
+        lemma_count = Lemma.objects.count()
+
+        # Import it again; the existing forms and lemmas ought to be used
+        RosenAnalysesImporter.import_file_bulk(file_name, processes=1)
+
+        self.assertEqual(WordForm.objects.count(), form_count)
+        self.assertEqual(Lemma.objects.count(), lemma_count)
@@ -1,9 +1,16 @@
 import os
+import time
 import shutil
 
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+
 from . import TestReader
-from reader.models import Author, Work, Division, Verse
-from reader.contentsearch import WorkIndexer, search_verses, search_stats
+from reader.models import Author, Work, Division, Verse, IndexChange
+from reader.contentsearch import WorkIndexer, GreekVariations, VerseSearchResultsStream, search_verses, search_stats, search_verses_and_stats
+from reader.importer.Diogenes import DiogenesLemmataImporter, DiogenesAnalysesImporter
+from reader.utils import RelatedFormsTable
 
 class TestWorkIndexer(WorkIndexer):
     
@@ -14,6 +21,8 @@ class TestWorkIndexer(WorkIndexer):
     @classmethod
     def delete_index(cls):
         shutil.rmtree(cls.get_index_dir(), ignore_errors=True)
+        shutil.rmtree(cls.get_shards_dir(), ignore_errors=True)
+        cls.delete_manifest()
     
 class TestContentSearch(TestReader):
     
@@ -25,6 +34,9 @@ class TestContentSearch(TestReader):
         
         # Remove any existing index files from previous tests
         self.indexer.delete_index()
+        
+        # Don't use variations cached by previous tests since they may have had different word forms
+        GreekVariations.clear_cached_variations()
 
     def make_work(self, content="Lorem ipsum dolor sit amet, consectetur adipiscing elit.", division_title="test_add_doc(division)", work_title="test_add_doc", work_title_slug=None, division_title_slug=None, division_descriptor=None):
         author = Author()
@@ -151,6 +163,258 @@ class TestContentSearch(TestReader):
         
         self.assertEqual(len(results.verses), 1)
         
+    def test_index_work_query_count_is_fixed(self):
+        
+        self.indexer.get_index(create=True)
+        
+        # Index a small and a large work and make sure that the number of queries is the same
+        query_counts = []
+        
+        for chapters in [2, 10]:
+            work = self.make_work_with_chapters(chapters=chapters, work_title="test_index_work_query_count_" + str(chapters))
+            
+            with CaptureQueriesContext(connection) as context:
+                verse_count = self.indexer.index_work(work)
+            
+            self.assertEqual(verse_count, chapters * 2)
+            query_counts.append(len(context.captured_queries))
+        
+        self.assertEqual(query_counts[0], query_counts[1])
+        
+    def test_index_work_section_text(self):
+        
+        work = self.make_work_with_chapters(chapters=3)
+        
+        self.indexer.get_index(create=True)
+        self.indexer.index_work(work)
+        
+        # The parent division must be included in the section text
+        results = search_verses('section:"Book Chapter 2"', self.indexer.get_index())
+        self.assertEqual(len(results.verses), 2)
+        
+        results = search_verses('section:"Book"', self.indexer.get_index())
+        self.assertEqual(len(results.verses), 6)
+        
+    def test_index_all_works_parallel(self):
+        
+        for chapters in [1, 2, 3]:
+            self.make_work_with_chapters(chapters=chapters, work_title="test_index_all_works_parallel_" + str(chapters))
+        
+        self.indexer.get_index(create=True)
+        
+        self.assertEqual(self.indexer.index_all_works_parallel(jobs=1), 12)
+        self.assertEqual(self.indexer.get_shard_numbers(), [])
+        
+        results = search_verses("amet", self.indexer.get_index(), pagelen=20)
+        self.assertEqual(len(results.verses), 12)
+        
+    def get_indexed_documents(self):
+        
+        with self.indexer.get_index().searcher() as searcher:
+            return sorted((fields['verse_id'], fields['work_id']) for fields in searcher.all_stored_fields())
+        
+    def test_index_all_works_parallel_processes(self):
+        
+        for chapters in [1, 2, 3, 4]:
+            self.make_work_with_chapters(chapters=chapters, work_title="test_index_all_works_parallel_processes_" + str(chapters))
+        
+        # Build the index in a single process to compare against
+        self.indexer.get_index(create=True)
+        self.indexer.index_all_works(commit_only_once=True, index_only_if_empty=False)
+        
+        expected_documents = self.get_indexed_documents()
+        expected_results = search_verses('section:"Book Chapter 2"', self.indexer.get_index(), pagelen=50)
+        self.assertEqual(len(expected_results.verses), 6)
+        
+        # Build the index again with several processes; the merged shards ought to match the serial build
+        self.indexer.delete_index()
+        self.indexer.get_index(create=True)
+        
+        self.assertEqual(self.indexer.index_all_works_parallel(jobs=2), 20)
+        self.assertEqual(self.indexer.get_shard_numbers(), [])
+        
+        self.assertEqual(self.get_indexed_documents(), expected_documents)
+        
+        results = search_verses('section:"Book Chapter 2"', self.indexer.get_index(), pagelen=50)
+        self.assertEqual(sorted(result.verse.id for result in results.verses), sorted(result.verse.id for result in expected_results.verses))
+        
+    def test_index_all_works_parallel_resume(self):
+        
+        works = [self.make_work_with_chapters(chapters=chapters, work_title="test_index_all_works_parallel_resume_" + str(chapters)) for chapters in [1, 2]]
+        
+        self.indexer.get_index(create=True)
+        
+        # Simulate a worker that stopped after indexing the first work
+        self.indexer.index_shard(3, [works[0].id])
+        
+        # Only the remaining work should be indexed and then both should be merged
+        self.assertEqual(self.indexer.index_all_works_parallel(jobs=1), 4)
+        self.assertEqual(self.indexer.get_shard_numbers(), [])
+        
+        results = search_verses("amet", self.indexer.get_index(), pagelen=20)
+        self.assertEqual(len(results.verses), 6)
+        
+    def test_index_change_journal(self):
+        
+        verse, division, work = self.make_work()
+        
+        self.assertTrue(IndexChange.objects.filter(object_type=IndexChange.VERSE, object_id=verse.id, deleted=False).exists())
+        self.assertTrue(IndexChange.objects.filter(object_type=IndexChange.DIVISION, object_id=division.id).exists())
+        self.assertTrue(IndexChange.objects.filter(object_type=IndexChange.WORK, object_id=work.id).exists())
+        
+        verse_id = verse.id
+        verse.delete()
+        
+        self.assertTrue(IndexChange.objects.filter(object_type=IndexChange.VERSE, object_id=verse_id, deleted=True).exists())
+        
+    def test_apply_index_changes(self):
+        
+        work = self.make_work_with_chapters(chapters=3, work_title="test_apply_index_changes")
+        
+        self.indexer.get_index(create=True)
+        self.indexer.index_work(work)
+        IndexChange.objects.all().delete()
+        
+        # Change a verse
+        verse = Verse.objects.filter(division__work=work).first()
+        verse.content = "Consectetur adipiscing elit"
+        verse.save()
+        
+        # Change the title of the parent division
+        book = Division.objects.get(work=work, parent_division=None)
+        book.title = "Volume"
+        book.save()
+        
+        # Delete a verse
+        Verse.objects.filter(division__work=work).last().delete()
+        
+        self.assertEqual(self.indexer.apply_index_changes(batch_size=2), 3)
+        self.assertEqual(IndexChange.objects.count(), 0)
+        
+        self.assertEqual(len(search_verses("adipiscing", self.indexer.get_index()).verses), 1)
+        self.assertEqual(len(search_verses("amet", self.indexer.get_index()).verses), 4)
+        
+        # The manifest should have the checksum of the changed verses
+        self.assertEqual(self.indexer.load_manifest()["test_apply_index_changes"]["checksum"], self.indexer.get_work_checksum(work))
+        self.assertEqual(len(search_verses('section:"Volume"', self.indexer.get_index()).verses), 5)
+        self.assertEqual(len(search_verses('section:"Book"', self.indexer.get_index()).verses), 0)
+        
+    def test_apply_index_changes_deleted_work(self):
+        
+        work = self.make_work_with_chapters(chapters=3, work_title="test_apply_index_changes_deleted")
+        self.make_work_with_chapters(chapters=1, work_title="test_apply_index_changes_kept")
+        
+        self.indexer.get_index(create=True)
+        self.assertEqual(self.indexer.index_all_works(), 8)
+        IndexChange.objects.all().delete()
+        
+        # Deleting the work ought to record a single change (not one per division and verse)
+        work.delete()
+        
+        self.assertEqual(IndexChange.objects.count(), 1)
+        self.assertTrue(IndexChange.objects.filter(object_type=IndexChange.WORK, deleted=True, title_slug="test_apply_index_changes_deleted").exists())
+        
+        self.assertEqual(self.indexer.apply_index_changes(), 1)
+        
+        self.assertEqual(len(search_verses("amet", self.indexer.get_index()).verses), 2)
+        self.assertNotIn("test_apply_index_changes_deleted", self.indexer.load_manifest())
+        
+    def test_apply_index_changes_deleted_division(self):
+        
+        work = self.make_work_with_chapters(chapters=3, work_title="test_apply_index_changes_deleted_division")
+        
+        self.indexer.get_index(create=True)
+        self.indexer.index_work(work)
+        IndexChange.objects.all().delete()
+        
+        # The verses of the division ought to be removed from the index
+        Division.objects.get(work=work, descriptor="2", level=2).delete()
+        
+        self.indexer.apply_index_changes()
+        
+        self.assertEqual(len(search_verses("amet", self.indexer.get_index()).verses), 4)
+        
+    def test_index_manifest(self):
+        
+        work = self.make_work_with_chapters(chapters=2, work_title="test_index_manifest")
+        
+        self.indexer.get_index(create=True)
+        self.assertEqual(self.indexer.index_all_works(), 4)
+        
+        manifest = self.indexer.load_manifest()
+        self.assertEqual(manifest["test_index_manifest"]["verse_count"], 4)
+        self.assertEqual(manifest["test_index_manifest"]["max_verse_id"], Verse.objects.filter(division__work=work).order_by('-id')[0].id)
+        self.assertEqual(manifest["test_index_manifest"]["generation"], self.indexer.get_index().latest_generation())
+        
+        # The work is unchanged so it should be skipped
+        self.assertEqual(self.indexer.get_work_index_status(work, manifest), self.indexer.WORK_INDEXED)
+        self.assertEqual(self.indexer.index_all_works(), 0)
+        
+        # Re-make the verses (like a re-import does) such that the work needs to be re-indexed
+        for verse in Verse.objects.filter(division__work=work):
+            verse.delete()
+            Verse.objects.create(division=verse.division, indicator=verse.indicator, sequence_number=verse.sequence_number, content="Consectetur adipiscing elit")
+        
+        self.assertEqual(self.indexer.get_work_index_status(work, manifest), self.indexer.WORK_CHANGED)
+        self.assertEqual(self.indexer.index_all_works(commit_only_once=True), 4)
+        
+        self.assertEqual(len(search_verses("adipiscing", self.indexer.get_index()).verses), 4)
+        self.assertEqual(len(search_verses("amet", self.indexer.get_index()).verses), 0)
+        
+    def test_index_manifest_verify(self):
+        
+        work = self.make_work_with_chapters(chapters=2, work_title="test_index_manifest_verify")
+        
+        self.indexer.get_index(create=True)
+        self.indexer.index_all_works()
+        
+        # The checksum recorded while indexing should match the one computed from the database
+        manifest = self.indexer.load_manifest()
+        self.assertEqual(manifest["test_index_manifest_verify"]["checksum"], self.indexer.get_work_checksum(work))
+        
+        # Change the verses in place without the change journal
+        Verse.objects.filter(division__work=work).update(content="Consectetur adipiscing elit")
+        
+        # Only the checksum detects the change
+        self.assertEqual(self.indexer.get_work_index_status(work, manifest), self.indexer.WORK_INDEXED)
+        self.assertEqual(self.indexer.get_work_index_status(work, manifest, verify=True), self.indexer.WORK_CHANGED)
+        
+        self.assertEqual(self.indexer.index_all_works(verify=True), 4)
+        self.assertEqual(len(search_verses("adipiscing", self.indexer.get_index()).verses), 4)
+        
+        # The work is now unchanged
+        self.assertEqual(self.indexer.index_all_works(verify=True), 0)
+        
+    def test_index_manifest_status_query_count(self):
+        
+        for chapters in [1, 2, 3]:
+            self.make_work_with_chapters(chapters=chapters, work_title="test_index_manifest_status_" + str(chapters))
+        
+        self.indexer.get_index(create=True)
+        self.indexer.index_all_works()
+        
+        # The unchanged works ought to be skipped without reading their verses
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(self.indexer.index_all_works(), 0)
+        
+        self.assertEqual(len(context.captured_queries), 2)
+        
+    def test_index_manifest_missing(self):
+        
+        work = self.make_work_with_chapters(chapters=1, work_title="test_index_manifest_missing")
+        
+        self.indexer.get_index(create=True)
+        self.indexer.index_work(work)
+        
+        # Works in an index made before the manifest was kept should be found by searching the index
+        self.indexer.delete_manifest()
+        
+        self.assertEqual(self.indexer.get_work_index_status(work, self.indexer.load_manifest()), self.indexer.WORK_INDEXED)
+        
+        # The work ought to be added to the manifest once it is found
+        self.assertEqual(self.indexer.index_all_works(), 0)
+        self.assertIn("test_index_manifest_missing", self.indexer.load_manifest())
+        
     def test_index_division(self):
         
         # Make a work
@@ -205,3 +469,210 @@ class TestContentSearch(TestReader):
         self.assertEqual(results['matches'], 5)
         self.assertEqual(results['matched_terms']["εἰς"], 3)
         self.assertEqual(results['matched_terms']["το"], 2)
+        
+    def make_work_with_chapters(self, chapters=5, verses_per_chapter=2, work_title="test_search_query_count"):
+        
+        work = Work(title=work_title)
+        work.save()
+        
+        book = Division(work=work, title="Book", descriptor="1", readable_unit=False, level=1, sequence_number=1)
+        book.save()
+        
+        for i in range(1, chapters + 1):
+            chapter = Division(work=work, title="Chapter " + str(i), descriptor=str(i), readable_unit=True, level=2, sequence_number=i + 1, parent_division=book)
+            chapter.save()
+            
+            for j in range(1, verses_per_chapter + 1):
+                verse = Verse(division=chapter, indicator=str(j), sequence_number=j, content="Lorem ipsum dolor sit amet")
+                verse.save()
+        
+        return work
+    
+    def count_search_queries(self, pagelen):
+        
+        with CaptureQueriesContext(connection) as context:
+            results = search_verses("amet", self.indexer.get_index(), pagelen=pagelen)
+            
+            # Access the hierarchy the way the search API does
+            for result in results.verses:
+                result.verse.division.work.title_slug
+                result.verse.division.get_division_indicators()
+                result.verse.division.get_division_description()
+                result.verse.division.get_verse_count()
+        
+        return len(results.verses), len(context.captured_queries)
+    
+    def test_search_query_count_is_fixed(self):
+        
+        work = self.make_work_with_chapters()
+        
+        self.indexer.get_index(create=True)
+        self.indexer.index_work(work)
+        
+        # Run the search once so that the expansion of the search terms is cached
+        search_verses("amet", self.indexer.get_index())
+        
+        verses_small, queries_small = self.count_search_queries(pagelen=1)
+        verses_large, queries_large = self.count_search_queries(pagelen=10)
+        
+        self.assertEqual(verses_small, 1)
+        self.assertEqual(verses_large, 10)
+        self.assertEqual(queries_small, queries_large)
+    
+    def test_searcher_pool_refresh(self):
+        
+        verse, division, work = self.make_work()
+        
+        self.indexer.get_index(create=True)
+        self.indexer.index_verse(verse, commit=True)
+        
+        with override_settings(SEARCH_INDEXES=self.indexer.get_index_dir()):
+            try:
+                results = search_verses("amet")
+                self.assertEqual(len(results.verses), 1)
+                
+                # Update the index; the pooled searcher ought to pick up the new document
+                verse2 = Verse(division=division, indicator="2", sequence_number=2, content="amet amet")
+                verse2.save()
+                self.indexer.index_verse(verse2, commit=True)
+                
+                results = search_verses("amet")
+                self.assertEqual(len(results.verses), 2)
+            finally:
+                WorkIndexer.close_shared_index()
+    
+    def test_searcher_pool_benchmark(self):
+        
+        work = self.make_work_with_chapters(chapters=20)
+        
+        self.indexer.get_index(create=True)
+        self.indexer.index_work(work)
+        
+        iterations = 25
+        
+        with override_settings(SEARCH_INDEXES=self.indexer.get_index_dir()):
+            try:
+                # Cold queries open the index and a new searcher every time
+                start_time = time.time()
+                
+                for i in range(iterations):
+                    cold_results = search_verses("amet", self.indexer.get_index())
+                    
+                cold_duration = time.time() - start_time
+                
+                # Pooled queries re-use the shared index and searchers
+                search_verses("amet")
+                start_time = time.time()
+                
+                for i in range(iterations):
+                    pooled_results = search_verses("amet")
+                    
+                pooled_duration = time.time() - start_time
+            finally:
+                WorkIndexer.close_shared_index()
+        
+        print("search latency, cold=%.6f seconds, pooled=%.6f seconds" % (cold_duration / iterations, pooled_duration / iterations))
+        
+        self.assertEqual(cold_results.result_count, pooled_results.result_count)
+        
+    def test_search_verses_and_stats(self):
+        
+        # Make a work
+        verse, division, work = self.make_work("οὐ νοεῖτε ὅτι πᾶν τὸ εἰσπορευόμενον εἰς τὸ στόμα εἰς τὴν κοιλίαν χωρεῖ καὶ εἰς ἀφεδρῶνα ἐκβάλλεται;")
+        
+        self.indexer.get_index(create=True)
+        self.indexer.index_verse(verse, commit=True)
+        
+        results, stats = search_verses_and_stats("εἰς OR τὸ", self.indexer.get_index())
+        
+        # The results should be the same as running the search and the stats separately
+        expected_results = search_verses("εἰς OR τὸ", self.indexer.get_index())
+        expected_stats = search_stats("εἰς OR τὸ", self.indexer.get_index())
+        
+        self.assertEqual(len(results.verses), len(expected_results.verses))
+        self.assertEqual(results.result_count, expected_results.result_count)
+        self.assertEqual(results.matched_terms, expected_results.matched_terms)
+        self.assertEqual(stats, expected_stats)
+        self.assertEqual(stats['matches'], 5)
+        
+    def test_search_results_stream(self):
+        
+        work = self.make_work_with_chapters(chapters=5, verses_per_chapter=2)
+        
+        self.indexer.get_index(create=True)
+        self.indexer.index_work(work)
+        
+        # All of the results ought to be provided (in order) even though they are loaded a few at a time
+        results = VerseSearchResultsStream("amet", self.indexer.get_index(), chunk_size=3)
+        verses = [result.verse for result in results]
+        
+        self.assertEqual(len(verses), 10)
+        self.assertEqual([verse.id for verse in verses], sorted(verse.id for verse in verses))
+        self.assertEqual(results.result_count, 10)
+        self.assertEqual(results.stats['matches'], 10)
+        self.assertTrue("amet" in list(results)[0].highlights)
+        
+    def test_search_stats_beyond_limit(self):
+        
+        work = self.make_work_with_chapters(chapters=5, verses_per_chapter=2)
+        
+        self.indexer.get_index(create=True)
+        self.indexer.index_work(work)
+        
+        # The stats ought to include all of the matches even if the number of results retrieved is limited
+        results = search_stats("amet OR ipsum", self.indexer.get_index(), limit=3)
+        
+        self.assertEqual(results['matches'], 20)
+        self.assertEqual(results['results_count'], 10)
+        self.assertEqual(results['matched_terms']["amet"], 10)
+        self.assertEqual(results['matched_terms']["ipsum"], 10)
+        self.assertEqual(results['matched_works']["test_search_query_count"], 20)
+        
+    def test_variations_cache(self):
+        
+        # Get the lemmas and analyses so that variations can be found
+        DiogenesLemmataImporter.import_file(self.get_test_resource_file_name("greek-lemmata.txt"), return_created_objects=True)
+        DiogenesAnalysesImporter.import_file(self.get_test_resource_file_name("greek-analyses2.txt"), return_created_objects=True)
+        
+        messages = []
+        forms = GreekVariations.get_variations("ἅβραν", messages=messages)
+        
+        self.assertEqual(len(forms), 7)
+        self.assertEqual(len(messages), 1)
+        
+        # The second lookup ought to be served from the cache
+        cached_messages = []
+        
+        with self.assertNumQueries(0):
+            cached_forms = GreekVariations.get_variations("ἅβραν", messages=cached_messages)
+        
+        self.assertEqual(cached_forms, forms)
+        self.assertEqual(cached_messages, messages)
+        
+    def test_variations_cache_related_forms_table_changed(self):
+        
+        # Get the lemmas and analyses so that a related forms table can be made
+        DiogenesLemmataImporter.import_file(self.get_test_resource_file_name("greek-lemmata.txt"), return_created_objects=True)
+        DiogenesAnalysesImporter.import_file(self.get_test_resource_file_name("greek-analyses2.txt"), return_created_objects=True)
+        
+        table_file = os.path.join("..", "var", "tests", "related_forms.pickle")
+        os.makedirs(os.path.dirname(table_file), exist_ok=True)
+        
+        RelatedFormsTable.build().save(table_file)
+        
+        try:
+            with override_settings(RELATED_FORMS_TABLE=table_file, SEARCH_VARIATIONS_CACHE_SIZE=1):
+                
+                self.assertEqual(len(GreekVariations.get_variations("ἅβραν")), 7)
+                
+                # The size of the cache ought to come from the settings in effect
+                self.assertEqual(GreekVariations.variations_cache.cache_info().maxsize, 1)
+                
+                # Re-make the table without any forms; the variations ought to be looked up from the new table
+                RelatedFormsTable().save(table_file)
+                modified = os.path.getmtime(table_file) + 10
+                os.utime(table_file, (modified, modified))
+                
+                self.assertEqual(len(GreekVariations.get_variations("ἅβραν")), 1)
+        finally:
+            os.remove(table_file)
@@ -0,0 +1,92 @@
+import os
+import shutil
+import tempfile
+from . import TestReader
+from reader.utils.sqlite_cache import SQLiteCache
+
+class TestSQLiteCache(TestReader):
+    
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix="TextCritical_test_cache_")
+        self.cache = SQLiteCache(os.path.join(self.directory, "cache.sqlite"), {'OPTIONS': {'MAX_ENTRIES': 10, 'CULL_FREQUENCY': 5, 'CULL_INTERVAL': 1, 'ACCESS_INTERVAL': 0}})
+        
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        
+    def test_get_set(self):
+        self.cache.set("word", {'form': "λόγος"})
+        
+        self.assertEqual(self.cache.get("word"), {'form': "λόγος"})
+        self.assertEqual(self.cache.get("missing", "default"), "default")
+        
+        self.cache.delete("word")
+        self.assertEqual(self.cache.get("word"), None)
+        
+    def test_add(self):
+        self.assertTrue(self.cache.add("word", 1))
+        self.assertFalse(self.cache.add("word", 2))
+        self.assertEqual(self.cache.get("word"), 1)
+        
+        # An expired entry can be replaced
+        self.cache.set("expired", 1, timeout=-1)
+        self.assertTrue(self.cache.add("expired", 2))
+        self.assertEqual(self.cache.get("expired"), 2)
+        
+    def test_expiration(self):
+        self.cache.set("word", 1, timeout=-1)
+        
+        self.assertEqual(self.cache.get("word"), None)
+        self.assertFalse(self.cache.has_key("word"))
+        
+    def test_shared(self):
+        self.cache.set("word", 1)
+        
+        # Another instance (e.g. in another process) should see the same entries
+        other_cache = SQLiteCache(self.cache.location, {})
+        self.assertEqual(other_cache.get("word"), 1)
+        
+    def test_cull_least_recently_used(self):
+        
+        for i in range(10):
+            self.cache.set("word_%i" % i, i)
+        
+        # Use the first entry so that it is kept
+        self.cache.get("word_0")
+        
+        self.cache.set("word_10", 10)
+        
+        self.assertEqual(self.cache.get("word_0"), 0)
+        self.assertEqual(self.cache.get("word_1"), None)
+        self.assertEqual(self.cache.get("word_10"), 10)
+        
+    def get_accessed(self, key):
+        return self.cache.get_connection().execute("SELECT accessed FROM cache WHERE key = ?", (self.cache.make_key(key),)).fetchone()[0]
+        
+    def test_access_interval(self):
+        self.cache.access_interval = 60
+        self.cache.set("word", 1)
+        
+        accessed = self.get_accessed("word")
+        
+        # Reading an entry that was used recently shouldn't write to the database
+        self.assertEqual(self.cache.get("word"), 1)
+        self.assertEqual(self.get_accessed("word"), accessed)
+        
+        # But it should once the interval passed
+        self.cache.access_interval = 0
+        self.cache.get("word")
+        
+        self.assertGreater(self.get_accessed("word"), accessed)
+        
+    def test_cull_interval(self):
+        self.cache.cull_interval = 5
+        
+        for i in range(14):
+            self.cache.set("word_%i" % i, i)
+        
+        # The size of the cache should only be checked every few writes
+        self.assertEqual(self.cache.get_connection().execute("SELECT COUNT(*) FROM cache").fetchone()[0], 14)
+        
+        self.cache.set("word_14", 14)
+        
+        self.assertLessEqual(self.cache.get_connection().execute("SELECT COUNT(*) FROM cache").fetchone()[0], 10)
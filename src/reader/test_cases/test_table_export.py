@@ -0,0 +1,58 @@
+import io
+import codecs
+import zipfile
+from django.http import StreamingHttpResponse
+from . import TestReader
+from reader.utils import table_export
+
+class TestTableExport(TestReader):
+    
+    def make_rows(self, count):
+        for i in range(count):
+            yield {'verse': str(i), 'content': "λόγος"}
+    
+    def test_stream_csv(self):
+        exporter = table_export.get_exporter('csv', ['verse', 'content'], streaming=True)
+        
+        chunks = list(exporter.stream_rows(self.make_rows(250)))
+        
+        # The rows should be provided a chunk at a time
+        self.assertEqual(len(chunks), 3)
+        
+        lines = b"".join(chunks).decode("utf-8-sig").splitlines()
+        
+        self.assertEqual(lines[0], "verse,content")
+        self.assertEqual(lines[-1], "249,λόγος")
+        self.assertEqual(len(lines), 251)
+    
+    def test_stream_csv_byte_order_mark(self):
+        exporter = table_export.get_exporter('csv', ['verse', 'content'], streaming=True)
+        
+        response = StreamingHttpResponse(exporter.stream_rows(self.make_rows(250)), content_type=exporter.content_type())
+        content = b"".join(response.streaming_content)
+        
+        # The byte order mark should only be at the start of the file (not at the start of each chunk)
+        self.assertTrue(content.startswith(codecs.BOM_UTF8))
+        self.assertEqual(content.count(codecs.BOM_UTF8), 1)
+        self.assertEqual(response['Content-Type'], "text/csv; charset=utf-8")
+    
+    def test_csv_byte_order_mark(self):
+        exporter = table_export.get_exporter('csv', ['verse', 'content'])
+        
+        for row in self.make_rows(3):
+            exporter.add_row(row)
+        
+        content = exporter.getvalue()
+        
+        self.assertEqual(content.count(codecs.BOM_UTF8), 1)
+        self.assertEqual(content.decode("utf-8-sig").splitlines()[-1], "2,λόγος")
+    
+    def test_stream_xlsx(self):
+        exporter = table_export.get_exporter('xlsx', ['verse', 'content'], title='Search Results', streaming=True)
+        
+        content = b"".join(exporter.stream_rows(self.make_rows(1000)))
+        
+        # The content should be a valid workbook
+        workbook = zipfile.ZipFile(io.BytesIO(content))
+        
+        self.assertTrue('xl/worksheets/sheet1.xml' in workbook.namelist())
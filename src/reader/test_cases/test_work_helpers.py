@@ -1,13 +1,21 @@
+import json
 from xml.dom.minidom import parseString
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from . import TestReader
 from reader.importer.Perseus import PerseusTextImporter
-from reader.utils.work_helpers import get_work_page_info
-from reader.models import WorkAlias
+from reader.utils.work_helpers import get_work_page_info, get_rendered_division, get_chapters_list, get_division, get_division_and_verse, get_work_page_json, get_work_id_for_alias, clear_work_content_version, WorkNavigation
+from reader.models import WorkAlias, Work, Division, Verse, RenderedDivision
 
 class TestWorkHelpers(TestReader):
     
     def setUp(self):
         self.importer = PerseusTextImporter()
+        
+        # Don't re-use the navigation of works from other tests (the IDs may be re-used after the rollback)
+        WorkNavigation.clear()
     
     def test_get_work_page_info(self):
         # Import a work for us to use
@@ -21,3 +29,275 @@ class TestWorkHelpers(TestReader):
         data = get_work_page_info(title=self.importer.work.title_slug, division_0=1)
 
         self.assertEqual(data['title'], 'Josephi vita 1')
+
+    def make_division(self):
+        work = Work(title="test_rendered_division")
+        work.save()
+        
+        division = Division(work=work, title="Chapter 1", descriptor="1", readable_unit=True, level=1, sequence_number=1)
+        division.save()
+        
+        verse = Verse(division=division, indicator="1", sequence_number=1, content="Lorem ipsum")
+        verse.save()
+        
+        return work, division, verse
+    
+    def test_rendered_division(self):
+        work, division, verse = self.make_division()
+        
+        self.assertEqual(RenderedDivision.get_html(division), None)
+        
+        RenderedDivision.store_html(division, "<span>Λόγος</span>")
+        
+        # The stored HTML should be used without rendering the division
+        with self.assertNumQueries(1):
+            self.assertEqual(get_rendered_division(work, division), "<span>Λόγος</span>")
+        
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_rendered_division_not_stored(self):
+        cache.clear()
+        work, division, verse = self.make_division()
+        
+        # Reading a division that wasn't rendered ahead of time shouldn't write to the database
+        self.assertIn("ipsum", get_rendered_division(work, division))
+        self.assertEqual(RenderedDivision.get_html(division), None)
+        
+        # The HTML should be cached until the content changes
+        with self.assertNumQueries(1):
+            self.assertIn("ipsum", get_rendered_division(work, division))
+        
+        verse.content = "Dolor sit amet"
+        verse.save()
+        work.save()
+        
+        self.assertIn("amet", get_rendered_division(work, division))
+    
+    def test_rendered_division_invalidation(self):
+        work, division, verse = self.make_division()
+        
+        RenderedDivision.store_html(division, "<span>Lorem ipsum</span>")
+        
+        # Changing a verse should remove the rendered HTML of its division
+        verse.content = "Dolor sit amet"
+        verse.save()
+        
+        self.assertEqual(RenderedDivision.get_html(division), None)
+        
+        # So should deleting one
+        RenderedDivision.store_html(division, "<span>Dolor sit amet</span>")
+        verse.delete()
+        
+        self.assertEqual(RenderedDivision.get_html(division), None)
+        
+        # And changing the division
+        RenderedDivision.store_html(division, "<span>Lorem ipsum</span>")
+        division.title = "Chapter One"
+        division.save()
+        
+        self.assertEqual(RenderedDivision.get_html(division), None)
+        
+        # Saving the work (which the importer does once the verses are flushed) should too
+        RenderedDivision.store_html(division, "<span>Lorem ipsum</span>")
+        work.title = "test_rendered_division_invalidation"
+        work.save()
+        
+        self.assertEqual(RenderedDivision.get_html(division), None)
+
+    def make_work_with_books(self, books=2, chapters=3):
+        work = Work(title="test_work_navigation")
+        work.save()
+        
+        sequence_number = 1
+        
+        for book_number in range(1, books + 1):
+            book = Division(work=work, title="Book " + str(book_number), descriptor=str(book_number), readable_unit=False, level=1, sequence_number=sequence_number)
+            book.save()
+            sequence_number += 1
+            
+            for chapter_number in range(1, chapters + 1):
+                chapter = Division(work=work, parent_division=book, descriptor=str(chapter_number), readable_unit=True, level=2, sequence_number=sequence_number)
+                chapter.save()
+                sequence_number += 1
+        
+        return work
+    
+    def test_work_navigation(self):
+        work = self.make_work_with_books()
+        
+        with self.assertNumQueries(1):
+            navigation = WorkNavigation.get(work)
+        
+        books = navigation.toc_divisions
+        chapters = navigation.chapters
+        
+        self.assertEqual([d.descriptor for d in books], ["1", "2"])
+        self.assertEqual(len(chapters), 6)
+        
+        # The book should resolve to its first chapter
+        self.assertEqual(navigation.get_chapter_for_division(books[1]), chapters[3])
+        
+        # Everything else should be answered without any queries
+        with self.assertNumQueries(0):
+            self.assertEqual(WorkNavigation.get(work), navigation)
+            
+            self.assertEqual(navigation.get_progress(chapters[3]), (6, 4))
+            self.assertEqual(navigation.get_progress_in_book(chapters[3]), (3, 1))
+            
+            self.assertEqual(navigation.get_previous_chapter(chapters[3]), chapters[2])
+            self.assertEqual(navigation.get_next_chapter(chapters[3]), chapters[4])
+            self.assertEqual(navigation.get_previous_chapter(chapters[0]), None)
+            self.assertEqual(navigation.get_next_chapter(chapters[5]), None)
+            
+            self.assertEqual(get_chapters_list(chapters[4], count=5), chapters[3:6])
+            self.assertEqual(get_chapters_list(chapters[0], count=3), chapters[0:2])
+            
+            self.assertEqual(chapters[4].parent_division, books[1])
+    
+    def test_work_navigation_invalidation(self):
+        work = self.make_work_with_books(books=1)
+        
+        navigation = WorkNavigation.get(work)
+        self.assertEqual(len(navigation.chapters), 3)
+        
+        # Adding a division should cause the navigation to be loaded again
+        division = Division(work=work, parent_division=navigation.toc_divisions[0], descriptor="4", readable_unit=True, level=2, sequence_number=5)
+        division.save()
+        
+        self.assertEqual(len(WorkNavigation.get(work).chapters), 4)
+        
+        # So should deleting one
+        division.delete()
+        
+        self.assertEqual(len(WorkNavigation.get(work).chapters), 3)
+    
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_work_navigation_changed_by_other_process(self):
+        cache.clear()
+        work = self.make_work_with_books(books=1)
+        
+        navigation = WorkNavigation.get(work)
+        
+        # Add a division without sending the signals (like another process would, since this one wouldn't hear of it)
+        Division.objects.bulk_create([Division(work=work, parent_division=navigation.toc_divisions[0], descriptor="4", readable_unit=True, level=2, sequence_number=5)])
+        
+        self.assertEqual(WorkNavigation.get(work), navigation)
+        
+        # The navigation should be loaded again once the other process changes the version of the content
+        clear_work_content_version(work.id)
+        
+        self.assertEqual(len(WorkNavigation.get(work).chapters), 4)
+    
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_get_work_page_json_verse_changed(self):
+        cache.clear()
+        
+        work = self.make_work_with_books()
+        chapter = Division.objects.get(work=work, descriptor="1", parent_division__descriptor="2")
+        
+        verse = Verse(division=chapter, indicator="1", sequence_number=1, content="Lorem ipsum")
+        verse.save()
+        
+        status, content, etag = get_work_page_json(title=work.title_slug, division_0="2", division_1="1")
+        
+        self.assertEqual(status, 200)
+        
+        # Changing a verse should change the content and the ETag
+        verse.content = "Dolor sit amet"
+        verse.save()
+        
+        new_status, new_content, new_etag = get_work_page_json(title=work.title_slug, division_0="2", division_1="1")
+        
+        self.assertNotEqual(new_etag, etag)
+        self.assertIn("amet", json.loads(new_content)['content'])
+    
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_get_work_id_for_alias_reimported(self):
+        cache.clear()
+        
+        work = Work(title="test_work_alias_reimported")
+        work.save()
+        
+        self.assertEqual(get_work_id_for_alias(work.title_slug), work.id)
+        
+        # Import the work again; the alias should refer to the new work rather than the one that was deleted
+        work.delete()
+        
+        new_work = Work(title="test_work_alias_reimported")
+        new_work.save()
+        
+        self.assertEqual(get_work_id_for_alias(new_work.title_slug), new_work.id)
+    
+    def test_delete_work_query_count(self):
+        work = Work(title="test_delete_work_query_count")
+        work.save()
+        
+        for division_number in range(1, 11):
+            division = Division(work=work, descriptor=str(division_number), readable_unit=True, level=1, sequence_number=division_number)
+            division.save()
+            
+            Verse.objects.bulk_create([Verse(division=division, indicator=str(i), sequence_number=i, content="Lorem ipsum") for i in range(1, 51)])
+        
+        work_id = work.id
+        
+        # The divisions and verses should be deleted in bulk rather than one at a time
+        with CaptureQueriesContext(connection) as context:
+            work.delete()
+        
+        self.assertLess(len(context.captured_queries), 30)
+        self.assertEqual(Division.objects.filter(work_id=work_id).count(), 0)
+        self.assertEqual(Verse.objects.filter(division__work_id=work_id).count(), 0)
+    
+    def test_get_division(self):
+        work = self.make_work_with_books()
+        
+        book = Division.objects.get(work=work, descriptor="2", parent_division=None)
+        book.descriptor = "II Kings"
+        book.save()
+        
+        chapter = Division.objects.get(work=work, descriptor="3", parent_division=book)
+        
+        # Load the navigation
+        WorkNavigation.get(work)
+        
+        # References should be resolved without any queries
+        with self.assertNumQueries(0):
+            self.assertEqual(get_division(work, "II Kings", "3"), chapter)
+            self.assertEqual(get_division(work, "ii kings", "3"), chapter)
+            self.assertEqual(get_division(work, "2 Kings", "3"), chapter)
+            self.assertEqual(get_division(work, "II Kings"), book)
+            self.assertEqual(get_division(work, "II Kings", "4"), None)
+            self.assertEqual(get_division(work, "3"), None)
+            
+            self.assertEqual(get_division_and_verse(work, "2 Kings", "3", "7"), (chapter, "7"))
+    
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_get_work_page_json(self):
+        cache.clear()
+        
+        work = self.make_work_with_books()
+        WorkAlias.populate_alias_from_work(work)
+        
+        # Store the HTML so that the divisions don't need to be rendered
+        for division in Division.objects.filter(work=work, readable_unit=True):
+            RenderedDivision.store_html(division, "<span>Lorem ipsum</span>")
+        
+        status, content, etag = get_work_page_json(title=work.title_slug, division_0="2", division_1="1")
+        
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(content)['chapter']['descriptor'], "1")
+        
+        # The second request should be answered from the cache
+        with self.assertNumQueries(0):
+            self.assertEqual(get_work_page_json(title=work.title_slug, division_0="2", division_1="1"), (status, content, etag))
+        
+        # Changing the work should change the content and the ETag
+        work.title = "test_work_navigation changed"
+        work.save()
+        
+        for division in Division.objects.filter(work=work, readable_unit=True):
+            RenderedDivision.store_html(division, "<span>Lorem ipsum</span>")
+        
+        new_status, new_content, new_etag = get_work_page_json(title=work.title_slug, division_0="2", division_1="1")
+        
+        self.assertNotEqual(new_etag, etag)
+        self.assertEqual(json.loads(new_content)['work']['title'], "test_work_navigation changed")
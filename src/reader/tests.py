@@ -51,4 +51,6 @@
 |-----------------------------------|-------------------------------------------------------------|
 | TestUserPreference                | UserPreference class                                        |
 |-----------------------------------|-------------------------------------------------------------|
+| TestSQLiteCache                   | SQLiteCache class (the shared cache backend)                |
+|-----------------------------------|-------------------------------------------------------------|
 """
@@ -1,10 +1,18 @@
 import re
+import os
+import pickle
+import logging
+
+from django.conf import settings
 
 from reader import language_tools
 from reader.models import WordDescription, Lemma, LexiconEntry, WordForm
 from reader.shortcuts import uniquefy
 from reader.language_tools import Greek
 
+# Get an instance of a logger
+logger = logging.getLogger(__name__)
+
 def description_id_fun(x):
     """
     Provides the string necessary to uniquefy WordDescription instances.
@@ -30,7 +38,7 @@ def get_word_descriptions(word, ignore_diacritics=False):
     
     # If the lookup for the word failed, try doing a lookup without the diacritics
     if ignore_diacritics:
-        word_lookup = language_tools.strip_accents(word_lookup)
+        word_lookup = language_tools.strip_accents_word(word_lookup)
         descriptions = WordDescription.objects.filter(word_form__basic_form=word_lookup)
     
     else:
@@ -56,7 +64,7 @@ def get_lemma(word, ignore_diacritics=False):
     
     # Do a lookup without the diacritics if requested
     if ignore_diacritics:
-        word_lookup = language_tools.strip_accents(word_lookup)
+        word_lookup = language_tools.strip_accents_word(word_lookup)
         lemmas = Lemma.objects.filter(basic_lexical_form=word_lookup)
     
     else:
@@ -82,7 +90,7 @@ def get_word_form(form, ignore_diacritics=False):
     
     # Do a lookup without the diacritics if requested
     if ignore_diacritics:
-        form_lookup = language_tools.strip_accents(form_lookup)
+        form_lookup = language_tools.strip_accents_word(form_lookup)
         words = WordForm.objects.filter(form=form_lookup)
     
     else:
@@ -93,6 +101,31 @@ def get_word_form(form, ignore_diacritics=False):
     else:
         return None
 
+def get_related_forms_queryset(word, ignore_diacritics=False):
+    """
+    Gets a queryset of the distinct WordForm instances that are possibly for the same word as the one provided. The lemmas
+    of the word and the forms of those lemmas are resolved in a single query.
+    
+    Arguments:
+    word -- The word to return the related forms of
+    ignore_diacritics -- Indicates if diacritical marks should be ignored for the purposes of matching.
+    """
+    
+    # Do a search for the parse
+    word_lookup = language_tools.normalize_unicode(word.lower())
+    word_lookup = Greek.fix_final_sigma(word_lookup)
+    
+    # Get the lemmas of the matching word descriptions
+    if ignore_diacritics:
+        word_lookup = language_tools.strip_accents_word(word_lookup)
+        lemmas = WordDescription.objects.filter(word_form__basic_form=word_lookup).values('lemma_id')
+    
+    else:
+        lemmas = WordDescription.objects.filter(word_form__form=word_lookup).values('lemma_id')
+    
+    # Get all of the forms of the lemmas
+    return WordForm.objects.filter(worddescription__lemma__in=lemmas).distinct().order_by('id')
+
 def get_all_related_forms(word, ignore_diacritics=False):
     """
     Gets a list of WordForm instances that are possibly for the same word as the one provided.
@@ -115,30 +148,146 @@ def get_all_related_forms(word, ignore_diacritics=False):
     ignore_diacritics -- Indicates if diacritical marks should be ignored for the purposes of matching.
     """
     
-    # Get all matching word descriptions
-    descriptions = get_word_descriptions(word, ignore_diacritics)
+    return list(get_related_forms_queryset(word, ignore_diacritics))
+
+def get_all_related_form_strings(word, ignore_diacritics=False):
+    """
+    Gets the forms that are possibly for the same word as the one provided as strings. The forms are streamed from
+    the database so this is preferable to get_all_related_forms() when the WordForm instances are not needed.
+    
+    Arguments:
+    word -- The word to return the related forms of
+    ignore_diacritics -- Indicates if diacritical marks should be ignored for the purposes of matching.
+    """
+    
+    return get_related_forms_queryset(word, ignore_diacritics).values_list('form', flat=True).iterator()
+
+class RelatedFormsTable:
+    """
+    A precomputed table of the word forms of each lemma. This allows the forms related to a word to be found using
+    dictionary lookups instead of database queries.
+    
+    The table is made offline (see the make_related_forms_table command) and is loaded from the file defined by the
+    RELATED_FORMS_TABLE setting. It needs to be re-made whenever the analyses are re-imported.
+    """
+    
+    # The table loaded by this process along with the modification time of the file it was loaded from
+    loaded_table = None
+    loaded_table_mtime = None
+    
+    def __init__(self):
+        
+        # Maps lemma IDs to the forms of the lemma (dictionaries are used as ordered sets)
+        self.lemma_forms = {}
+        
+        # Maps forms to the IDs of the lemmas they are associated with
+        self.form_lemmas = {}
+        
+        # Maps forms without diacritics to the IDs of the lemmas they are associated with
+        self.basic_form_lemmas = {}
+    
+    def add(self, lemma_id, form, basic_form):
+        """
+        Add a form of the given lemma to the table.
+        
+        Arguments:
+        lemma_id -- The ID of the lemma
+        form -- The word form
+        basic_form -- The word form without diacritical marks
+        """
+        
+        self.lemma_forms.setdefault(lemma_id, {})[form] = None
+        self.form_lemmas.setdefault(form, {})[lemma_id] = None
+        self.basic_form_lemmas.setdefault(basic_form, {})[lemma_id] = None
+    
+    @classmethod
+    def build(cls):
+        """
+        Make the table from the word descriptions in the database.
+        """
+        
+        table = cls()
+        
+        descriptions = WordDescription.objects.order_by('id').values_list('lemma_id', 'word_form__form', 'word_form__basic_form')
+        
+        for lemma_id, form, basic_form in descriptions.iterator():
+            table.add(lemma_id, form, basic_form)
+        
+        return table
+    
+    def get_related_forms(self, word, ignore_diacritics=False):
+        """
+        Get the list of forms (as strings) that are possibly for the same word as the one provided. This returns the
+        same forms as get_all_related_forms().
+        
+        Arguments:
+        word -- The word to get the related forms of
+        ignore_diacritics -- Indicates if diacritical marks should be ignored for the purposes of matching.
+        """
+        
+        # Normalize the word the same way that get_word_descriptions() does
+        word_lookup = language_tools.normalize_unicode(word.lower())
+        word_lookup = Greek.fix_final_sigma(word_lookup)
+        
+        if ignore_diacritics:
+            lemma_ids = self.basic_form_lemmas.get(language_tools.strip_accents_word(word_lookup), {})
+        else:
+            lemma_ids = self.form_lemmas.get(word_lookup, {})
+        
+        # Use a dictionary to remove duplicates while retaining the order of the forms
+        forms = {}
+        
+        for lemma_id in lemma_ids:
+            for form in self.lemma_forms.get(lemma_id, {}):
+                forms[form] = None
+        
+        return list(forms.keys())
     
-    lemmas = []
+    def save(self, file_name):
+        """
+        Write the table to the given file.
+        """
+        
+        with open(file_name, 'wb') as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
     
-    # Get the lemma entries for the descriptions
-    for d in descriptions:
+    @classmethod
+    def load(cls, file_name):
+        """
+        Load the table from the given file.
+        """
         
-        if d.lemma not in lemmas:
-            lemmas.append(d.lemma)
-            
-    # Now that we got the lemmas, let's add all word forms for the lemmas
-    word_forms = []
+        with open(file_name, 'rb') as f:
+            return pickle.load(f)
     
-    for l in lemmas:
+    @classmethod
+    def get_table(cls):
+        """
+        Get the table for this process, loading it if necessary. The table is loaded again if the file was re-made
+        since it was loaded. Returns None if the table has not been made.
+        """
         
-        # Get the descriptions for the given lemma entry
-        matching_descs = WordDescription.objects.filter(lemma=l)
+        if not settings.RELATED_FORMS_TABLE or not os.path.exists(settings.RELATED_FORMS_TABLE):
+            cls.clear()
+            return None
         
-        for m in matching_descs:
-            if m.word_form not in word_forms:
-                word_forms.append(m.word_form)
+        mtime = os.path.getmtime(settings.RELATED_FORMS_TABLE)
+        
+        if cls.loaded_table is None or cls.loaded_table_mtime != mtime:
+            logger.info("Loading the related forms table, file=%s", settings.RELATED_FORMS_TABLE)
+            cls.loaded_table = cls.load(settings.RELATED_FORMS_TABLE)
+            cls.loaded_table_mtime = mtime
+        
+        return cls.loaded_table
     
-    return word_forms
+    @classmethod
+    def clear(cls):
+        """
+        Drop the table loaded by this process so that it is loaded again when it is next needed.
+        """
+        
+        cls.loaded_table = None
+        cls.loaded_table_mtime = None
 
 def get_lexicon_entries(lemma):
     """
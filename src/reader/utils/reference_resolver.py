@@ -1,8 +1,7 @@
 import re
-from reader.models import Division
 from django.template.defaultfilters import slugify
 from django.urls import reverse
-from reader.utils.work_helpers import get_division_and_verse
+from reader.utils.work_helpers import get_division_and_verse, WorkNavigation
 
 def assign_divisions(ref_components):
 
@@ -62,8 +61,7 @@ def resolve_division_reference(work, ref):
       url_path: that path to refer to this passage 
     '''
     # Get the division names that have spaces in them
-    divisions_with_spaces = Division.objects.filter(
-        work=work, descriptor__contains=' ').values('descriptor')
+    divisions_with_spaces = [{'descriptor': d.descriptor} for d in WorkNavigation.get(work).divisions if ' ' in d.descriptor]
 
     # Start making the arguments the we need for making the URL
     args = [work.title_slug]
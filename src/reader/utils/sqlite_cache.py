@@ -0,0 +1,207 @@
+"""
+A cache backend that stores the entries in a SQLite database. This allows the cache to be shared between the threads
+and processes of the web-server without running a separate caching service.
+
+The number of entries is bounded by MAX_ENTRIES; the least recently used entries are removed when the cache gets too
+large. The size of the cache is checked every CULL_INTERVAL writes (so the cache may briefly hold a few more entries than
+MAX_ENTRIES) and the time that an entry was used is only updated once it is ACCESS_INTERVAL seconds old so that reads
+don't need to write to the database. Use it by setting the backend in CACHES:
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'reader.utils.sqlite_cache.SQLiteCache',
+            'LOCATION': '/opt/webapps/TextCritical.com/var/cache.sqlite',
+            'OPTIONS': {
+                'MAX_ENTRIES': 3000,
+                'CULL_INTERVAL': 100,
+                'ACCESS_INTERVAL': 60
+            }
+        }
+    }
+"""
+
+import os
+import time
+import pickle
+import sqlite3
+import threading
+
+from django.core.cache.backends.base import BaseCache, DEFAULT_TIMEOUT
+
+class SQLiteCache(BaseCache):
+    """
+    A cache backend that stores the entries in a SQLite database file.
+    """
+
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    # How long to wait for another process to finish writing before giving up (in seconds)
+    BUSY_TIMEOUT = 10
+
+    # The number of writes between checks of the size of the cache
+    CULL_INTERVAL = 100
+
+    # How old the time that an entry was last used must be before it is updated (in seconds)
+    ACCESS_INTERVAL = 60
+
+    def __init__(self, location, params):
+        super().__init__(params)
+
+        options = params.get('OPTIONS', {})
+
+        self.location = location
+        self.local = threading.local()
+        self.table_created = False
+
+        self.cull_interval = max(1, int(options.get('CULL_INTERVAL', self.CULL_INTERVAL)))
+        self.access_interval = float(options.get('ACCESS_INTERVAL', self.ACCESS_INTERVAL))
+
+        # The number of writes since the size of the cache was last checked (by this instance)
+        self.writes_since_cull = 0
+
+    def get_connection(self):
+        """
+        Get the connection for the current thread (connections cannot be shared between threads or across forks).
+        """
+
+        connection = getattr(self.local, 'connection', None)
+
+        if connection is not None and self.local.pid == os.getpid():
+            return connection
+
+        directory = os.path.dirname(self.location)
+
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+
+        connection = sqlite3.connect(self.location, timeout=self.BUSY_TIMEOUT, isolation_level=None, check_same_thread=False)
+
+        # Use the write-ahead log so that readers aren't blocked by writers in other processes
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+
+        if not self.table_created:
+            connection.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB, expires REAL, accessed REAL)")
+            connection.execute("CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)")
+            self.table_created = True
+
+        self.local.connection = connection
+        self.local.pid = os.getpid()
+
+        return connection
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        connection = self.get_connection()
+        now = time.time()
+
+        row = connection.execute("SELECT value, expires, accessed FROM cache WHERE key = ?", (key,)).fetchone()
+
+        if row is None:
+            return default
+
+        value, expires, accessed = row
+
+        if expires is not None and expires <= now:
+            connection.execute("DELETE FROM cache WHERE key = ? AND expires <= ?", (key, now))
+            return default
+
+        # Note that the entry was used so that it is kept over the ones that haven't been (only once in a while so that
+        # reading an entry doesn't usually need a write)
+        if accessed is None or now - accessed >= self.access_interval:
+            connection.execute("UPDATE cache SET accessed = ? WHERE key = ?", (now, key))
+
+        return pickle.loads(value)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        connection = self.get_connection()
+
+        connection.execute("INSERT OR REPLACE INTO cache (key, value, expires, accessed) VALUES (?, ?, ?, ?)",
+                           (key, pickle.dumps(value, self.pickle_protocol), self.get_backend_timeout(timeout), time.time()))
+
+        self.cull(connection)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        connection = self.get_connection()
+        now = time.time()
+
+        # Only replace the existing entry if it expired
+        cursor = connection.execute("INSERT INTO cache (key, value, expires, accessed) VALUES (?, ?, ?, ?) "
+                                    "ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires = excluded.expires, accessed = excluded.accessed "
+                                    "WHERE cache.expires IS NOT NULL AND cache.expires <= ?",
+                                    (key, pickle.dumps(value, self.pickle_protocol), self.get_backend_timeout(timeout), now, now))
+
+        if cursor.rowcount > 0:
+            self.cull(connection)
+            return True
+
+        return False
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        connection = self.get_connection()
+        now = time.time()
+
+        cursor = connection.execute("UPDATE cache SET expires = ?, accessed = ? WHERE key = ? AND (expires IS NULL OR expires > ?)",
+                                    (self.get_backend_timeout(timeout), now, key, now))
+
+        return cursor.rowcount > 0
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+
+        cursor = self.get_connection().execute("DELETE FROM cache WHERE key = ?", (key,))
+
+        return cursor.rowcount > 0
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+
+        row = self.get_connection().execute("SELECT 1 FROM cache WHERE key = ? AND (expires IS NULL OR expires > ?)", (key, time.time())).fetchone()
+
+        return row is not None
+
+    def clear(self):
+        self.get_connection().execute("DELETE FROM cache")
+
+    def close(self, **kwargs):
+        # Keep the connection open between requests; it is cheap to hold and expensive to re-open
+        pass
+
+    def cull(self, connection):
+        """
+        Remove the expired entries and then the least recently used ones if the cache has too many entries. The size of
+        the cache is only checked every CULL_INTERVAL writes since counting the entries requires scanning the table.
+
+        Arguments:
+        connection -- The connection to use
+        """
+
+        self.writes_since_cull += 1
+
+        if self.writes_since_cull < self.cull_interval:
+            return
+
+        self.writes_since_cull = 0
+
+        count = connection.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+        if count <= self._max_entries:
+            return
+
+        connection.execute("DELETE FROM cache WHERE expires IS NOT NULL AND expires <= ?", (time.time(),))
+
+        count = connection.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+        if count <= self._max_entries:
+            return
+
+        # Remove a fraction of the entries (like the built-in backends) so that culling isn't needed on every write
+        if self._cull_frequency == 0:
+            to_remove = count
+        else:
+            to_remove = max(count - self._max_entries, count // self._cull_frequency)
+
+        connection.execute("DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY accessed LIMIT ?)", (to_remove,))
@@ -1,5 +1,7 @@
 import io
 import csv
+import codecs
+import tempfile
 import xlsxwriter
 
 # Per RFC 7111: https://www.rfc-editor.org/rfc/rfc7111
@@ -10,14 +12,19 @@ XLS_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.
 XLS_EXTENSION = ".xlsx"
 
 def get_exporter(table_type, fieldnames, **kwargs):
+    """
+    Get the exporter for the given type of file (csv or xlsx). Provide streaming=True to get an exporter that can
+    export any number of rows without holding them in memory (see stream_rows()).
+    """
     if table_type == 'csv':
         return CSVTableExport(fieldnames, **kwargs)
     elif table_type == 'xlsx' or table_type == 'xls':
         return XLSTableExport(fieldnames, **kwargs)
 
 class TableExport:
-    def __init__(self, fieldnames, **kwargs):
+    def __init__(self, fieldnames, streaming=False, **kwargs):
         self.output = io.StringIO()
+        self.streaming = streaming
         self.set_fieldnames(fieldnames)
 
     def set_fieldnames(self, fieldnames):
@@ -26,6 +33,21 @@ class TableExport:
     def add_row(self, row_dict):
         pass
 
+    def stream_rows(self, rows):
+        """
+        Add the rows and provide the content of the file as it is produced (for a StreamingHttpResponse).
+
+        Arguments:
+        rows -- An iterable of the rows (as dictionaries)
+        """
+
+        for row_dict in rows:
+            self.add_row(row_dict)
+
+        self.close()
+
+        yield self.getvalue()
+
     def getvalue(self):
         return self.output.getvalue()
 
@@ -39,8 +61,17 @@ class TableExport:
         pass
 
 class CSVTableExport(TableExport):
+
+    # The number of rows to include in each chunk when streaming
+    ROWS_PER_CHUNK = 100
+
+    # The file starts with a byte order mark so that spreadsheet applications know that it is UTF-8
+    ENCODING = "utf-8"
+    BYTE_ORDER_MARK = codecs.BOM_UTF8
+
     def __init__(self, fieldnames, **kwargs):
-        super().__init__(fieldnames)
+        super().__init__(fieldnames, **kwargs)
+        self.byte_order_mark_written = False
         self.resultswriter = csv.DictWriter(self.output, fieldnames=self.fieldnames)
         
         self.resultswriter.writeheader()
@@ -48,17 +79,68 @@ class CSVTableExport(TableExport):
     def add_row(self, row_dict):
         self.resultswriter.writerow(row_dict)
 
+    def stream_rows(self, rows):
+
+        # Provide the rows a chunk at a time and then empty the buffer so that it doesn't grow
+        for idx, row_dict in enumerate(rows, 1):
+            self.add_row(row_dict)
+
+            if idx % self.ROWS_PER_CHUNK == 0:
+                yield self.drain()
+
+        yield self.drain()
+
+    def drain(self):
+        """
+        Get the content written so far (as bytes) and empty the buffer.
+        """
+
+        value = self.encode(self.output.getvalue())
+
+        self.output.seek(0)
+        self.output.truncate()
+
+        return value
+
+    def encode(self, value):
+        """
+        Encode the content, starting with the byte order mark if it hasn't been provided yet (it must only be at the
+        start of the file and not at the start of each chunk).
+
+        Arguments:
+        value -- The content to encode
+        """
+
+        content = value.encode(self.ENCODING)
+
+        if not self.byte_order_mark_written:
+            self.byte_order_mark_written = True
+            content = self.BYTE_ORDER_MARK + content
+
+        return content
+
+    def getvalue(self):
+        return self.BYTE_ORDER_MARK + self.output.getvalue().encode(self.ENCODING)
+
     def content_type(self):
-        return CSV_CONTENT_TYPE + "; charset=utf-8-sig"
+        return CSV_CONTENT_TYPE + "; charset=" + self.ENCODING
 
     def file_extension(self):
         return CSV_EXTENSION
 
 class XLSTableExport(TableExport):
     def __init__(self, fieldnames, title = None, **kwargs):
-        super().__init__(fieldnames)
-        self.output = io.BytesIO()
-        self.workbook = xlsxwriter.workbook.Workbook(self.output, {'in_memory': True})
+        super().__init__(fieldnames, **kwargs)
+
+        # When streaming, write the rows out as they are added and assemble the file on disk so that memory use
+        # doesn't grow with the number of rows (the rows must then be added in order)
+        if self.streaming:
+            self.output = tempfile.TemporaryFile()
+            self.workbook = xlsxwriter.workbook.Workbook(self.output, {'constant_memory': True})
+        else:
+            self.output = io.BytesIO()
+            self.workbook = xlsxwriter.workbook.Workbook(self.output, {'in_memory': True})
+
         self.worksheet = self.workbook.add_worksheet(title)
         self.row = 1
 
@@ -92,6 +174,28 @@ class XLSTableExport(TableExport):
         self.output.seek(0)
         return self.output.read()
 
+    def get_file(self):
+        """
+        Get the file containing the workbook (for a FileResponse) after it has been closed.
+        """
+
+        self.output.seek(0)
+        return self.output
+
+    def stream_rows(self, rows):
+
+        for row_dict in rows:
+            self.add_row(row_dict)
+
+        self.close()
+
+        # Provide the file a chunk at a time
+        chunk = self.get_file().read(io.DEFAULT_BUFFER_SIZE)
+
+        while chunk:
+            yield chunk
+            chunk = self.output.read(io.DEFAULT_BUFFER_SIZE)
+
     def set_column_width(self, column_index, width):
         self.worksheet.set_column(column_index, column_index, width)
 
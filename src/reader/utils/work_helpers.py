@@ -1,60 +1,263 @@
 import math
 import re
+import bisect
+import threading
+import json
+import uuid
+import hashlib
+from collections import OrderedDict, defaultdict
 from django.shortcuts import get_object_or_404, render
 from django.template import loader
 from django.core.cache import cache
 from django.http import Http404
-from reader.models import Division, WorkAlias, Verse, RelatedWork, NoteReference
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from reader.models import Work, Division, WorkAlias, Verse, RelatedWork, NoteReference, RenderedDivision, division_deleted
 
-def get_chapter_for_division(division):
+class WorkNavigation():
     """
-    Get the division that contains the next part of readable content.
+    The table of contents of a work that is used for navigating it (progress, the next and previous chapters and
+    pagination). The divisions of the work are loaded once and the navigation is kept in memory so that these can
+    be looked up without querying the database. The navigation is loaded again once the version of the content of the
+    work changes (which may have been changed by another process).
+    
+    Use WorkNavigation.get() to get the navigation of a work.
     """
     
-    divisions = Division.objects.filter(work=division.work, readable_unit=True, sequence_number__gte=division.sequence_number).order_by("sequence_number")[:1]
+    # The number of works whose navigation is kept in memory
+    MAX_LOADED_WORKS = 200
     
-    if len(divisions) > 0:
-        return divisions[0]
-
-def get_chapters_list(division, count=9):
-    """
-    Get the list of chapters for pagination.
-    """
+    loaded_works = OrderedDict()
+    loaded_works_lock = threading.Lock()
     
-    pages_before = math.ceil((count - 1.0) / 2)
-    pages_after = math.floor((count - 1.0) / 2)
+    def __init__(self, work, version=None):
+        
+        self.work = work
+        self.version = version
+        
+        # Load all of the divisions along with their parents
+        self.divisions = list(Division.objects.filter(work=work).defer('original_content').order_by('sequence_number', 'id'))
+        
+        for division in self.divisions:
+            division.work = work
+        
+        Division.preload_parent_divisions(self.divisions)
+        
+        # Get the readable units (chapters) in order
+        self.chapters = [division for division in self.divisions if division.readable_unit]
+        self.chapter_sequence_numbers = [chapter.sequence_number for chapter in self.chapters]
+        
+        # Get the divisions that ought to be included in the table of contents
+        self.toc_divisions = [division for division in self.divisions if not division.readable_unit]
+        
+        # Group the chapters by the division that they are in (the book)
+        self.book_chapters = defaultdict(list)
+        
+        for chapter in self.chapters:
+            self.book_chapters[chapter.parent_division_id].append(chapter)
+        
+        self.book_chapter_sequence_numbers = {}
+        
+        for parent_division_id, chapters in self.book_chapters.items():
+            self.book_chapter_sequence_numbers[parent_division_id] = [chapter.sequence_number for chapter in chapters]
+        
+        # Map the paths of case-folded descriptors (from the top of the hierarchy down) to the divisions so that
+        # references can be resolved without a query. The earliest created division wins if there are duplicates.
+        self.first_division = None
+        self.descriptor_paths = {}
+        
+        for division in sorted(self.divisions, key=lambda d: d.id):
+            
+            if self.first_division is None:
+                self.first_division = division
+            
+            path = self.get_descriptor_path(division)
+            
+            if path not in self.descriptor_paths:
+                self.descriptor_paths[path] = division
     
-    # Filter down the list to ones within the given work that are readable units
-    divisions = Division.objects.filter(work=division.work, readable_unit=True)
+    @staticmethod
+    def get_descriptor_path(division):
+        """
+        Get the tuple of case-folded descriptors leading to the given division (starting at the top of the hierarchy).
+        
+        Arguments:
+        division -- The division to get the path of
+        """
+        
+        path = []
+        
+        while division is not None:
+            path.insert(0, (division.descriptor or "").casefold())
+            division = division.parent_division
+        
+        return tuple(path)
     
-    # Filter down the list to those in the same parent division
-    if division.parent_division is not None:
-        divisions = divisions.filter(parent_division=division.parent_division)
+    @classmethod
+    def get(cls, work):
+        """
+        Get the navigation for the given work, loading it if necessary.
         
-    # If no parent division was found, then filter the list down to the parent of the first division
-    # so that we don't show entries for different divisions in the list
-    else:
+        Arguments:
+        work -- The work to get the navigation of
+        """
         
-        # Try to get the first division
-        first_division = divisions[:1]
+        # Get the version of the content so that navigation loaded before the work was changed isn't used
+        version = get_work_content_version(work.id)
         
-        # If we got a first division, then filter on this one's parent
-        if len(first_division) > 0 and first_division[0].parent_division is not None:
-            divisions = divisions.filter(parent_division=first_division[0].parent_division)
-        else:
-            divisions = divisions.filter(parent_division=None)
+        with cls.loaded_works_lock:
+            navigation = cls.loaded_works.get(work.id)
+            
+            if navigation is not None and navigation.version == version:
+                cls.loaded_works.move_to_end(work.id)
+                return navigation
+        
+        navigation = WorkNavigation(work, version)
+        
+        with cls.loaded_works_lock:
+            cls.loaded_works[work.id] = navigation
+            
+            # Drop the least recently used works
+            while len(cls.loaded_works) > cls.MAX_LOADED_WORKS:
+                cls.loaded_works.popitem(last=False)
+        
+        return navigation
     
-    # Get the number of pages before
-    divisions_before = divisions.filter(sequence_number__lte=division.sequence_number).order_by("-sequence_number")[:pages_before]
+    @classmethod
+    def clear(cls, work_id=None):
+        """
+        Remove the navigation from memory so that it is loaded again the next time that it is needed.
+        
+        Arguments:
+        work_id -- The ID of the work to remove (all works will be removed if none)
+        """
+        
+        with cls.loaded_works_lock:
+            if work_id is None:
+                cls.loaded_works.clear()
+            else:
+                cls.loaded_works.pop(work_id, None)
+    
+    def get_chapter_for_division(self, division):
+        """
+        Get the chapter that contains the next part of readable content.
+        
+        Arguments:
+        division -- The division to get the chapter for
+        """
+        
+        index = bisect.bisect_left(self.chapter_sequence_numbers, division.sequence_number)
+        
+        if index < len(self.chapters):
+            return self.chapters[index]
     
-    divisions_after = divisions.filter(sequence_number__gt=division.sequence_number).order_by("sequence_number")[:pages_after]
+    def get_division(self, *descriptors):
+        """
+        Get the division with the given descriptors (from the top of the hierarchy down) or None if there isn't one.
+        The first division of the work is returned if no descriptors are provided.
+        
+        Arguments:
+        descriptors -- The descriptors of the divisions leading to the division
+        """
+        
+        if len(descriptors) == 0:
+            return self.first_division
+        
+        return self.descriptor_paths.get(tuple(str(descriptor).casefold() for descriptor in descriptors))
     
-    final_list = []
-    final_list.extend(divisions_before)
-    final_list.reverse()
-    final_list.extend(divisions_after)
+    def get_progress(self, chapter):
+        """
+        Get the total number of chapters and the number of chapters up to and including the given one.
+        
+        Arguments:
+        chapter -- The chapter
+        """
+        
+        return len(self.chapters), bisect.bisect_right(self.chapter_sequence_numbers, chapter.sequence_number)
+    
+    def get_progress_in_book(self, chapter):
+        """
+        Get the total number of chapters within the book (the parent division) of the given chapter and the number of
+        them up to and including the given one.
+        
+        Arguments:
+        chapter -- The chapter
+        """
+        
+        sequence_numbers = self.book_chapter_sequence_numbers.get(chapter.parent_division_id, [])
+        
+        return len(sequence_numbers), bisect.bisect_right(sequence_numbers, chapter.sequence_number)
+    
+    def get_previous_chapter(self, chapter):
+        """
+        Get the chapter before the given one (or None if it is the first).
+        
+        Arguments:
+        chapter -- The chapter
+        """
+        
+        index = bisect.bisect_left(self.chapter_sequence_numbers, chapter.sequence_number)
+        
+        if index > 0:
+            return self.chapters[index - 1]
+    
+    def get_next_chapter(self, chapter):
+        """
+        Get the chapter after the given one (or None if it is the last).
+        
+        Arguments:
+        chapter -- The chapter
+        """
+        
+        index = bisect.bisect_right(self.chapter_sequence_numbers, chapter.sequence_number)
+        
+        if index < len(self.chapters):
+            return self.chapters[index]
     
-    return final_list
+    def get_chapters_list(self, chapter, count=9):
+        """
+        Get the list of chapters for pagination.
+        
+        Arguments:
+        chapter -- The chapter that is being displayed
+        count -- The number of chapters to include
+        """
+        
+        pages_before = math.ceil((count - 1.0) / 2)
+        pages_after = math.floor((count - 1.0) / 2)
+        
+        # Use the chapters in the same parent division
+        if chapter.parent_division_id is not None:
+            parent_division_id = chapter.parent_division_id
+        
+        # If no parent division was found, then use the parent of the first chapter so that we don't show entries for
+        # different divisions in the list
+        elif len(self.chapters) > 0:
+            parent_division_id = self.chapters[0].parent_division_id
+        
+        else:
+            parent_division_id = None
+        
+        chapters = self.book_chapters.get(parent_division_id, [])
+        sequence_numbers = self.book_chapter_sequence_numbers.get(parent_division_id, [])
+        
+        index = bisect.bisect_right(sequence_numbers, chapter.sequence_number)
+        
+        return chapters[max(index - pages_before, 0):index] + chapters[index:index + pages_after]
+    
+def get_chapter_for_division(division):
+    """
+    Get the division that contains the next part of readable content.
+    """
+    
+    return WorkNavigation.get(division.work).get_chapter_for_division(division)
+
+def get_chapters_list(division, count=9):
+    """
+    Get the list of chapters for pagination.
+    """
+    
+    return WorkNavigation.get(division.work).get_chapters_list(division, count)
 
 def get_division_and_verse(work, division_0=None, division_1=None, division_2=None, division_3=None, division_4=None):
     """
@@ -170,43 +373,27 @@ def get_division(work, division_0=None, division_1=None, division_2=None, divisi
     try_to_match_converting_numbering -- If not none, then attempt get a match by normalizing the division name
     """
 
-    # Filter down the list to the division within the given work
-    divisions = Division.objects.filter(work=work)
-    
-    # Get the division if we got four levels deep of descriptors ("1.2.3.4")
+    # Get the descriptors that are being looked up
     if division_0 is not None and division_1 is not None and division_2 is not None and division_3 is not None:
-        
-        divisions = divisions.filter(parent_division__parent_division__parent_division__parent_division=None,
-                                     parent_division__parent_division__parent_division__descriptor__iexact=division_0,
-                                     parent_division__parent_division__descriptor__iexact=division_1,
-                                     parent_division__descriptor__iexact=division_2,
-                                     descriptor__iexact=division_3)
+        descriptors = [division_0, division_1, division_2, division_3]
     
-    # Get the division if we got three levels deep of descriptors ("1.2.3")
     elif division_0 is not None and division_1 is not None and division_2 is not None:
-        
-        divisions = divisions.filter(parent_division__parent_division__parent_division=None,
-                                     parent_division__parent_division__descriptor__iexact=division_0,
-                                     parent_division__descriptor__iexact=division_1,
-                                     descriptor__iexact=division_2)
-        
-    # Get the division if we got two levels deep of descriptors ("1.2")
+        descriptors = [division_0, division_1, division_2]
+    
     elif division_0 is not None and division_1:
-        
-        divisions = divisions.filter(parent_division__parent_division=None,
-                                     parent_division__descriptor__iexact=division_0,
-                                     descriptor__iexact=division_1)
+        descriptors = [division_0, division_1]
     
-    # Get the division if we got one level deep of descriptors ("1")
     elif division_0 is not None:
-        divisions = divisions.filter(parent_division=None,
-                                     descriptor__iexact=division_0)
+        descriptors = [division_0]
     
-    # Only grab one
-    divisions = divisions[:1]
+    else:
+        descriptors = []
     
-    if len(divisions) > 0:
-        return divisions[0]
+    # Resolve the division using the navigation of the work (this doesn't require a query once it is loaded)
+    division = WorkNavigation.get(work).get_division(*descriptors)
+    
+    if division is not None:
+        return division
     else:
         
         if try_to_match_converting_numbering and (has_numbered_book_number(division_0) or has_numbered_book_number(division_1) or has_numbered_book_number(division_2) or has_numbered_book_number(division_3)):
@@ -216,16 +403,147 @@ def get_division(work, division_0=None, division_1=None, division_2=None, divisi
         
         return None # We couldn't find a matching division, perhaps one doesn't exist with the given set of descriptors?
     
-def make_cache_key_for_work(title, divisions):
+def make_cache_key_for_work(title, divisions, version=None):
     # Remove none
     processed_list = list(filter(None, [title, *divisions]))
 
     # Convert ints to strings
     processed_list = [str(elem) for elem in processed_list]
 
+    # Include the version of the content so that entries for content that changed aren't used
+    if version is not None:
+        return '/'.join(processed_list) + '@' + version
+
     # Return the result
     return '/'.join(processed_list)
 
+def get_work_id_for_alias(title_slug):
+    """
+    Get the ID of the work with the given alias (or None if there isn't one). This uses the cache so that the database
+    needn't be queried.
+    
+    Arguments:
+    title_slug -- The title slug of the work alias
+    """
+    
+    cache_key = "work_alias_id:" + str(title_slug)
+    work_id = cache.get(cache_key)
+    
+    if work_id is None:
+        work_id = WorkAlias.objects.filter(title_slug=title_slug).values_list('work_id', flat=True).first()
+        
+        if work_id is not None:
+            cache.set(cache_key, work_id, None)
+    
+    return work_id
+
+def clear_work_id_for_alias(title_slug):
+    """
+    Remove the cached ID of the work with the given alias so that an alias that now refers to another work (such as
+    one that was imported again) is looked up again.
+    
+    Arguments:
+    title_slug -- The title slug of the work alias
+    """
+    
+    cache.delete("work_alias_id:" + str(title_slug))
+
+def get_work_content_version(work_id):
+    """
+    Get a token that identifies the version of the content of the given work. The token changes whenever the work,
+    its divisions or its verses are changed (see clear_work_content_version). The importer saves the work once its
+    divisions and verses are flushed.
+    
+    Arguments:
+    work_id -- The ID of the work
+    """
+    
+    cache_key = "work_content_version:" + str(work_id)
+    version = cache.get(cache_key)
+    
+    # Make a new version if there isn't one (add() won't replace one made by another process)
+    if version is None:
+        cache.add(cache_key, uuid.uuid4().hex, None)
+        version = cache.get(cache_key)
+    
+    return version
+
+def clear_work_content_version(work_id):
+    """
+    Note that the content of the given work changed so that the cache entries for the old content are no longer used.
+    
+    Arguments:
+    work_id -- The ID of the work
+    """
+    
+    cache.delete("work_content_version:" + str(work_id))
+
+def get_work_page_version(title):
+    """
+    Get the version of the content of the work with the given alias (or None if the work doesn't exist).
+    
+    Arguments:
+    title -- The title slug of the work alias
+    """
+    
+    work_id = get_work_id_for_alias(title)
+    
+    if work_id is not None:
+        return get_work_content_version(work_id)
+
+def render_division(work, division):
+    """
+    Render the verses of the division into HTML.
+    
+    Arguments:
+    work -- The work that the division is in
+    division -- The readable division to render
+    """
+    
+    # Get the verses to display
+    verses = Verse.objects.filter(division=division).all()
+    
+    # Convert the verses to an HTML blob
+    template = loader.get_template('work_verses.html')
+    
+    return template.render({
+        'work'    : work,
+        'verses'  : verses,
+        'chapter' : division,
+    })
+
+def get_rendered_division(work, division):
+    """
+    Get the HTML of the verses of the division. The pre-rendered HTML will be used if it is available (see the
+    render_divisions command). Otherwise, the division will be rendered and kept in the cache (the library database
+    isn't written to while reading).
+    
+    Arguments:
+    work -- The work that the division is in
+    division -- The readable division to get the HTML of
+    """
+    
+    html = RenderedDivision.get_html(division)
+    
+    if html is not None:
+        return html
+    
+    # Key the rendered HTML by the version of the content so that the HTML of content that changed isn't used (there
+    # is no version if the cache doesn't keep entries)
+    version = get_work_content_version(work.id)
+    
+    if version is None:
+        return render_division(work, division)
+    
+    cache_key = "rendered_division:" + str(division.id) + "@" + version
+    html = cache.get(cache_key)
+    
+    if html is None:
+        html = render_division(work, division)
+        cache.set(cache_key, html)
+    
+    return html
+
 def get_work_page_info(author=None, language=None, title=None, division_0=None, division_1=None, division_2=None, division_3=None, division_4=None, leftovers=None, logger=None, **kwargs):
     """
     This will get dictionary full of information that can be used to render information about a work.
@@ -246,7 +564,8 @@ def get_work_page_info(author=None, language=None, title=None, division_0=None,
     # Make the cache key
     divisions_list = [division_0, division_1, division_2, division_3, division_4]
     divisions_list = list(filter(None, divisions_list))
-    cache_key = make_cache_key_for_work(title, divisions_list)
+    version = get_work_page_version(title)
+    cache_key = make_cache_key_for_work(title, divisions_list, version)
 
     # See if we have a cache entry for this
     data = cache.get(cache_key)
@@ -286,7 +605,7 @@ def get_work_page_info(author=None, language=None, title=None, division_0=None,
 
     # Make the cache key for the entry without the verse, then see if we have a hit for the division
     if data is None and verse_to_highlight is not None:
-        cache_key = make_cache_key_for_work(title, divisions_list[0:-1])
+        cache_key = make_cache_key_for_work(title, divisions_list[0:-1], version)
         data = cache.get(cache_key)
 
         if data is not None and logger:
@@ -314,29 +633,22 @@ def get_work_page_info(author=None, language=None, title=None, division_0=None,
             warnings.append(("Verse not found", "The verse you specified couldn't be found."))
             verse_not_found = True
     
+    # Get the navigation for the work
+    navigation = WorkNavigation.get(work)
+    
     # Get the readable unit
-    chapter = get_chapter_for_division(division)
+    chapter = navigation.get_chapter_for_division(division)
 
     # Make the data if we didn't get a cache hit
     if data is None:
         if logger:
             logger.info("Cache miss for %s", cache_key)
         
-        # Get the verses to display
-        verses = Verse.objects.filter(division=chapter).all()
-        
         # Get the divisions that ought to be included in the table of contents
-        divisions = Division.objects.filter(work=work, readable_unit=False)
-        
-        if len(divisions) == 0:
-            divisions = None
-        
-        # Get the list of chapters for pagination
-        chapters = get_chapters_list(chapter)
+        divisions = navigation.toc_divisions
         
         # Get the amount of progress (based on chapters)
-        total_chapters     = Division.objects.filter(work=division.work, readable_unit=True).count()
-        completed_chapters = Division.objects.filter(work=division.work, readable_unit=True, sequence_number__lte=chapter.sequence_number).count()
+        total_chapters, completed_chapters = navigation.get_progress(chapter)
         remaining_chapters = total_chapters - completed_chapters
         progress = ((1.0 * completed_chapters) / total_chapters) * 100
         
@@ -347,24 +659,13 @@ def get_work_page_info(author=None, language=None, title=None, division_0=None,
         progress_in_book = None
         
         if chapter.parent_division is not None:
-            total_chapters_in_book = Division.objects.filter(parent_division=chapter.parent_division, readable_unit=True).count()
-            completed_chapters_in_book = Division.objects.filter(parent_division=chapter.parent_division, readable_unit=True, sequence_number__lte=chapter.sequence_number).count()
+            total_chapters_in_book, completed_chapters_in_book = navigation.get_progress_in_book(chapter)
             remaining_chapters_in_book = total_chapters_in_book - completed_chapters_in_book
             progress_in_book = ((1.0 * completed_chapters_in_book) / total_chapters_in_book) * 100
         
         # Get the next and previous chapter number
-        previous_chapter = Division.objects.filter(work=work, readable_unit=True, sequence_number__lt=chapter.sequence_number).order_by('-sequence_number')[:1]
-        next_chapter = Division.objects.filter(work=work, readable_unit=True, sequence_number__gt=chapter.sequence_number).order_by('sequence_number')[:1]
-        
-        if len(previous_chapter) > 0:
-            previous_chapter = previous_chapter[0]
-        else:
-            previous_chapter = None
-            
-        if len(next_chapter) > 0:
-            next_chapter = next_chapter[0]
-        else:
-            next_chapter = None
+        previous_chapter = navigation.get_previous_chapter(chapter)
+        next_chapter = navigation.get_next_chapter(chapter)
         
         # Get related works
         related_works_tmp = RelatedWork.objects.filter(work=work)
@@ -424,15 +725,8 @@ def get_work_page_info(author=None, language=None, title=None, division_0=None,
                 'reference_descriptor'       : chapter_description,
         }
 
-        # Convert the verses to an HTML blob
-        template = loader.get_template('work_verses.html')
-
         # Add in the processed HTML content
-        data['content'] = template.render({
-            'work'    : work,
-            'verses'  : verses,
-            'chapter' : chapter,
-        })
+        data['content'] = get_rendered_division(work, chapter)
 
         # Save the entry to the cache
         # We are saving this without the verse information since we don't want to store every verse
@@ -471,6 +765,53 @@ def get_work_page_info(author=None, language=None, title=None, division_0=None,
 
     return data
 
+def get_work_page_json(author=None, language=None, title=None, division_0=None, division_1=None, division_2=None, division_3=None, division_4=None, leftovers=None, logger=None, **kwargs):
+    """
+    Get the information about a work (see get_work_page_info) serialized as JSON. This returns a tuple with the
+    following (or None if the work could not be found):
+    
+      status: the HTTP status code (210 if the verse could not be found)
+      content: the JSON
+      etag: a strong ETag for the content
+    
+    The serialized content is cached so that the same content can be returned (or validated against the ETag) without
+    querying the database.
+    """
+    
+    divisions_list = list(filter(None, [division_0, division_1, division_2, division_3, division_4]))
+    version = get_work_page_version(title)
+    
+    # Return the cached entry if available
+    cache_key = "work_page_json:" + make_cache_key_for_work(title, divisions_list, version)
+    
+    if version is not None and leftovers is None:
+        entry = cache.get(cache_key)
+        
+        if entry is not None:
+            return entry
+    
+    data = get_work_page_info(author, language, title, division_0, division_1, division_2, division_3, division_4, leftovers, logger=logger)
+    
+    if data is None:
+        return None
+    
+    # If the verse could not be found, set a response code to note that we couldn't get the content that the user wanted
+    status = 200
+    
+    if data['verse_not_found']:
+        status = 210
+    
+    content = json.dumps(data)
+    etag = '"%s"' % hashlib.sha1(content.encode('utf-8')).hexdigest()
+    
+    entry = (status, content, etag)
+    
+    # Cache the entry unless the reference was wrong
+    if status == 200 and version is not None and leftovers is None and len(data['warnings']) == 0:
+        cache.set(cache_key, entry, 365 * 86400)
+    
+    return entry
+
 def work_to_json(work):
     if work:
         return {
@@ -584,3 +925,22 @@ def note_to_json(note, get_references=True):
         return note_dict
         
     return None
+
+# Remove the navigation and the cached pages of works that have changed
+@receiver(post_save, sender=Work)
+@receiver(post_delete, sender=Work)
+def work_navigation_change(sender, instance, **kwargs):
+    WorkNavigation.clear(instance.id)
+    clear_work_content_version(instance.id)
+    clear_work_id_for_alias(instance.title_slug)
+
+@receiver(post_save, sender=Division)
+@receiver(division_deleted, sender=Division)
+def division_navigation_change(sender, instance, **kwargs):
+    WorkNavigation.clear(instance.work_id)
+    clear_work_content_version(instance.work_id)
+
+@receiver(post_save, sender=WorkAlias)
+@receiver(post_delete, sender=WorkAlias)
+def work_alias_change(sender, instance, **kwargs):
+    clear_work_id_for_alias(instance.title_slug)
@@ -2,12 +2,13 @@ from django.shortcuts import get_object_or_404, render
 from django.urls import NoReverseMatch
 from django.core import serializers
 from django.urls import reverse
-from django.http import HttpResponse, Http404, JsonResponse
+from django.http import HttpResponse, Http404, JsonResponse, StreamingHttpResponse, FileResponse
 from wsgiref.util import FileWrapper
 from django.template.context import RequestContext
 from django.template import loader, TemplateDoesNotExist
 from django.views.decorators.cache import cache_page
-from django.utils.cache import patch_response_headers
+from django.utils.cache import patch_response_headers, get_conditional_response
+from django.utils.http import RFC3986_SUBDELIMS
 from django.template.defaultfilters import slugify
 from django.conf import settings
 from django.core.exceptions import ObjectDoesNotExist
@@ -22,7 +23,7 @@ import difflib
 import re
 import os
 import tempfile
-from urllib.parse import urlencode
+from urllib.parse import urlencode, quote
 
 from reader.templatetags.reader_extras import transform_perseus_text
 from reader.models import Work, WorkAlias, Verse, Author, UserPreference, WikiArticle, WorkSource, Note, NoteReference, RelatedWork
@@ -31,10 +32,10 @@ from reader import language_tools
 from reader.shortcuts import string_limiter, uniquefy, convert_xml_to_html5
 from reader.utils.reference_resolver import resolve_division_reference
 from reader.utils import get_word_descriptions, get_lexicon_entries, table_export
-from reader.contentsearch import search_verses, search_stats, GreekVariations
+from reader.contentsearch import search_stats, search_verses_and_stats, VerseSearchResultsStream, GreekVariations
 from reader.language_tools import normalize_unicode
 from reader.bookcover import makeCoverImage
-from reader.utils.work_helpers import get_division_and_verse, get_work_page_info, get_chapter_for_division, note_to_json, get_division
+from reader.utils.work_helpers import get_division_and_verse, get_work_page_info, get_work_page_json, get_chapter_for_division, note_to_json, get_division
 from reader.exporter import text, docx
 from reader.notes import get_related_notes
 
@@ -389,6 +390,178 @@ def api_search_stats(request, search_text=None):
     return render_api_response(request, stats)
 
 
+def get_search_result_division_info(division, division_info_cache=None):
+    """
+    Get the information about a division that is included in each search result within it (the URL, the description
+    and whether the division has more than one verse). The information is stored in the given dictionary so that it
+    is made only once for the hits within the same division.
+
+    Arguments:
+    division -- The division
+    division_info_cache -- A dictionary of the information made for the divisions so far
+    """
+
+    if division_info_cache is not None and division.id in division_info_cache:
+        return division_info_cache[division.id]
+
+    # Build the list of arguments necessary to make the URL
+    args = [division.work.title_slug]
+    args.extend(division.get_division_indicators())
+
+    division_info = {
+        'url': reverse('read_work', args=args),
+        'description': division.get_division_description(),
+        'has_multiple_verses': division.get_verse_count() > 1,
+    }
+
+    if division_info_cache is not None:
+        division_info_cache[division.id] = division_info
+
+    return division_info
+
+
+def search_result_to_json(result, division_info_cache=None):
+    """
+    Make the dictionary describing a search result for the search API.
+
+    Arguments:
+    result -- The VerseSearchResult
+    division_info_cache -- A dictionary used to re-use the information about the divisions across results
+    """
+
+    d = {}
+
+    division_info = get_search_result_division_info(result.verse.division, division_info_cache)
+
+    # Determine if the last verse is a lone verse. If it is, then don't put the verse in the URL.
+    division_has_multiple_verses = division_info['has_multiple_verses']
+
+    d['verse'] = str(result.verse)
+
+    # Add the verse to the URL (quoted the same way that reverse() would)
+    if division_has_multiple_verses:
+        d['url'] = division_info['url'] + "/" + quote(d['verse'], safe=RFC3986_SUBDELIMS + "/~:@")
+    else:
+        d['url'] = division_info['url']
+
+    d['division'] = division_info['description']
+    d['work_title_slug'] = result.verse.division.work.title_slug
+    d['work'] = result.verse.division.work.title
+    d['highlights'] = result.highlights
+    d['content_snippet'] = string_limiter(result.verse.content, 80)
+
+    # If the verse is not a lone verse (has other verses next to it under the parent division) then add the verse information to the list
+    if division_has_multiple_verses:
+
+        if '.' in d['division']:
+            d['description'] = d['division'] + "." + d['verse']
+        else:
+            d['description'] = d['division'] + ":" + d['verse']
+
+    # If the verse is a lone verse, don't bother adding it
+    else:
+        d['description'] = d['division']
+
+    return d
+
+
+def export_search_results(request, search_text, table_type, include_related_forms, ignore_diacritics):
+    """
+    Provide all of the results of a search as a file. The results are streamed so that memory use doesn't grow with
+    the number of results.
+
+    Arguments:
+    request -- The request
+    search_text -- The search query
+    table_type -- The type of file to make (csv or xlsx)
+    include_related_forms -- Expand the words into all of the related forms
+    ignore_diacritics -- Search ignoring dia-critical marks
+    """
+
+    current_site = Site.objects.get_current()
+
+    # Make the results the download
+    fieldnames = ['url', 'description', 'content_snippet', 'work', 'division', 'verse']
+    exporter = table_export.get_exporter(table_type, fieldnames, title='Search Results', streaming=True)
+
+    # Stop if we could not find an exporter to use
+    if exporter is None:
+        return render_api_error(request, "Invalid download format: " + str(table_type), 404)
+
+    # Set the column widths (if available)
+    if(hasattr(exporter, 'set_column_widths')):
+        exporter.set_column_widths([
+            50,
+            15,
+            80,
+            20,
+            15,
+            5
+        ])
+
+    search_results = VerseSearchResultsStream(search_text, include_related_forms=include_related_forms, ignore_diacritics=ignore_diacritics)
+
+    def make_rows():
+        division_info_cache = {}
+
+        for search_result in search_results:
+            result = search_result_to_json(search_result, division_info_cache)
+
+            yield {
+                'url': 'https://' + current_site.domain + result['url'],
+                'description': result['description'],
+                'content_snippet': result['content_snippet'],
+                'work': result['work'],
+                'division': result['division'],
+                'verse': result['verse'],
+            }
+
+    # Stream the rows out as they are made unless a meta page needs to be added after them
+    if not (hasattr(exporter, 'add_worksheet') and hasattr(exporter, 'set_cell')):
+        response = StreamingHttpResponse(exporter.stream_rows(make_rows()), content_type=exporter.content_type())
+
+    else:
+        for row in make_rows():
+            exporter.add_row(row)
+
+        # Add the meta page
+        exporter.add_worksheet('Meta Data')
+        exporter.set_cell(0, 0, 'Search Query')
+        exporter.set_cell(0, 1, search_text)
+
+        exporter.set_cell(1, 0, 'URL')
+
+        search_args = {}
+        search_args["q"] = search_text
+
+        if ignore_diacritics:
+            search_args["ignore_diacritics"] = "1"
+
+        if include_related_forms:
+            search_args["include_related"] = "1"
+
+        exporter.set_cell(1, 1, 'https://' + current_site.domain + reverse('search') + "/?" + urlencode(search_args))
+
+        exporter.set_cell(2, 0, 'Result Count')
+        exporter.set_cell(2, 1, search_results.result_count)
+
+        exporter.set_cell(3, 0, 'Match Count')
+        exporter.set_cell(3, 1, search_results.stats['matches'])
+
+        if(hasattr(exporter, 'set_column_widths')):
+            exporter.set_column_widths([13, 50])
+
+        exporter.close()
+
+        # Stream the file from the disk
+        response = FileResponse(exporter.get_file(), content_type=exporter.content_type())
+
+    response['Content-Disposition'] = 'attachment; filename="%s"' % (
+        'search_results' + exporter.file_extension())
+
+    return response
+
+
 @cache_page(15 * minutes)
 def api_search(request, search_text=None):
 
@@ -445,127 +618,22 @@ def api_search(request, search_text=None):
     else:
         download_results = None
 
-    # Perform the search
-    search_results = search_verses(search_text, page=page, pagelen=pagelen,
-                                   include_related_forms=include_related_forms, ignore_diacritics=ignore_diacritics)
+    # Provide all of the results as a file if that is what is requested
+    if download_results is not None:
+        return export_search_results(request, search_text, download_results, include_related_forms, ignore_diacritics)
+
+    # Perform the search and get the search stats in the same pass
+    search_results, stats = search_verses_and_stats(search_text, page=page, pagelen=pagelen,
+                                                    include_related_forms=include_related_forms, ignore_diacritics=ignore_diacritics)
 
     # This will be were the results are stored
     results_lists = []
 
     # Prepare the results
-    for result in search_results.verses:
-
-        d = {}
-
-        # Build the list of arguments necessary to make the URL
-        args = [result.verse.division.work.title_slug]
-        args.extend(result.verse.division.get_division_indicators())
-
-        # Determine if the last verse is a lone verse. If it is, then don't put the verse in the URL args.
-        if Verse.objects.filter(division=result.verse.division).count() > 1:
-            division_has_multiple_verses = True
-            args.append(str(result.verse))
-        else:
-            division_has_multiple_verses = False
-
-        d['url'] = reverse('read_work', args=args)
-        d['verse'] = str(result.verse)
-        d['division'] = result.verse.division.get_division_description()
-        d['work_title_slug'] = result.verse.division.work.title_slug
-        d['work'] = result.verse.division.work.title
-        d['highlights'] = result.highlights
-        d['content_snippet'] = string_limiter(result.verse.content, 80)
-
-        # If the verse is not a lone verse (has other verses next to it under the parent division) then add the verse information to the list
-        if division_has_multiple_verses:
-
-            if '.' in d['division']:
-                d['description'] = d['division'] + "." + d['verse']
-            else:
-                d['description'] = d['division'] + ":" + d['verse']
-
-        # If the verse is a lone verse, don't bother adding it
-        else:
-            d['description'] = d['division']
-
-        # Append the results
-        results_lists.append(d)
-
-    # Get the search stats
-    stats = search_stats(
-        search_text, include_related_forms=include_related_forms, ignore_diacritics=ignore_diacritics)
-
-    # Provide the results as a file if that is what is requested
-    if download_results is not None:
-        current_site = Site.objects.get_current()
+    division_info_cache = {}
 
-        # Make the results the download
-        fieldnames = ['url', 'description', 'content_snippet', 'work', 'division', 'verse']
-        exporter = table_export.get_exporter(download_results, fieldnames, title='Search Results')
-
-        # Stop if we could not find an exporter to use
-        if exporter is None:
-            return render_api_error(request, "Invalid download format: " + str(download_results), 404)
-
-        # Set the column widths (if available)
-        if(hasattr(exporter, 'set_column_widths')):
-            exporter.set_column_widths([
-                50,
-                15,
-                80,
-                20,
-                15,
-                5
-            ])
-
-        # Add the results
-        for result in results_lists:
-            exporter.add_row({
-                'url': 'https://' + current_site.domain + result['url'],
-                'description': result['description'],
-                'content_snippet': result['content_snippet'],
-                'work': result['work'],
-                'division': result['division'],
-                'verse': result['verse'],
-            })
-
-        # Add the meta page
-        if(hasattr(exporter, 'add_worksheet') and hasattr(exporter, 'set_cell')):
-            exporter.add_worksheet('Meta Data')
-            exporter.set_cell(0, 0, 'Search Query')
-            exporter.set_cell(0, 1, search_text)
-
-            exporter.set_cell(1, 0, 'URL')
-
-            search_args = {}
-            search_args["q"] = search_text
-
-            if ignore_diacritics:
-                search_args["ignore_diacritics"] = "1"
-    
-            if include_related_forms:
-                search_args["include_related"] = "1"
-            
-            current_site = Site.objects.get_current()
-            exporter.set_cell(1, 1, 'https://' + current_site.domain + reverse('search') + "/?" + urlencode(search_args))
-
-            exporter.set_cell(2, 0, 'Result Count')
-            exporter.set_cell(2, 1, search_results.result_count)
-
-            exporter.set_cell(3, 0, 'Match Count')
-            exporter.set_cell(3, 1, stats['matches'])
-
-            if(hasattr(exporter, 'set_column_widths')):
-                exporter.set_column_widths([13, 50])
-
-        exporter.close()
-
-        # Stream the file results
-        response = HttpResponse(exporter.getvalue(), content_type=exporter.content_type())
-        response['Content-Disposition'] = 'attachment; filename="%s"' % (
-            'search_results' + exporter.file_extension())
-
-        return response
+    for result in search_results.verses:
+        results_lists.append(search_result_to_json(result, division_info_cache))
 
     results_set = {
         'result_count': search_results.result_count,
@@ -826,27 +894,24 @@ def api_works_list(request, author=None):
 
 
 def api_read_work(request, author=None, language=None, title=None, division_0=None, division_1=None, division_2=None, division_3=None, division_4=None, leftovers=None, **kwargs):
-    data = get_work_page_info(author, language, title, division_0, division_1,
-                              division_2, division_3, division_4, leftovers, logger=logger)
+    entry = get_work_page_json(author, language, title, division_0, division_1,
+                               division_2, division_3, division_4, leftovers, logger=logger)
 
     # Return a 404 if the work could not be found
-    if data is None:
+    if entry is None:
         return render_api_response(request, [], status=404)
 
-    # If the verse could not be found, set a response code to note that we couldn't get the content that the user wanted so that caching doesn't take place
-    status_code = 200
-    if data['verse_not_found']:
-        status_code = 210
+    status_code, raw_content, etag = entry
 
-    # Convert the content to JSON
-    data_json = {}
-    for k, v in data.items():
-        if hasattr(v, '__dict__'):
-            data_json[k] = v.__dict__
-        else:
-            data_json[k] = v
+    response = HttpResponse(raw_content, content_type=JSON_CONTENT_TYPE, status=status_code)
+    patch_response_headers(response, 12 * months)
+
+    # Return a 304 if the client already has this content
+    if status_code == 200:
+        response['ETag'] = etag
+        return get_conditional_response(request, etag=etag, response=response)
 
-    return render_api_response(request, data, status=status_code, cache_timeout=12 * months)
+    return response
 
 def get_work_text(request, title=None, division_0=None, division_1=None, division_2=None, division_3=None, division_4=None):
     # Try to get the work
@@ -47,23 +47,26 @@ if not TESTING:
 # This is the location where the indexes are located
 SEARCH_INDEXES = os.path.join("..", "var", "indexes")
 
-# This website supports page level caching. Uncomment the CACHES setting below and set the LOCATION to being using it
-"""
+# This website supports page level caching. The cache is kept in a SQLite database so that it is shared between the
+# web-server's threads and processes (use the warm_cache command to populate it after deploying). Set the BACKEND to
+# 'django.core.cache.backends.dummy.DummyCache' to turn caching off.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
-        'LOCATION': '/opt/webapps/TextCritical.com/var/cache', #Enter the full path to the cache directory here
+        'BACKEND': 'reader.utils.sqlite_cache.SQLiteCache',
+        'LOCATION': os.path.join("..", "var", "cache.sqlite"),
         'OPTIONS': {
-            'MAX_ENTRIES': '30000'
+            'MAX_ENTRIES': 30000
         }
     }
 }
-"""
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+
+# Don't cache content when running the tests
+if TESTING:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+        }
     }
-}
 
 # Local time zone for this installation. Choices can be found here:
 # http://en.wikipedia.org/wiki/List_of_tz_zones_by_name
@@ -181,6 +184,22 @@ EBOOK_CONVERT = "ebook-convert"
 SEARCH_INDEXER_MEMORY_MB = 128
 SEARCH_INDEXER_PROCS = 1
 
+# Record the changes to works, divisions and verses so that they can be applied to the search index incrementally (see
+# the update_search_indexes command)
+SEARCH_INDEX_CHANGE_JOURNAL = True
+
+# The number of open index searchers that each process keeps for re-use between searches
+SEARCH_SEARCHER_POOL_SIZE = 4
+
+# The number of expanded search terms (related forms of a word) that each process keeps in memory
+SEARCH_VARIATIONS_CACHE_SIZE = 10000
+
+# Set this to a number of seconds to also store the expanded search terms in the shared cache (see CACHES)
+SEARCH_VARIATIONS_SHARED_CACHE_TIMEOUT = None
+
+# The location of the precomputed table of related word forms (made by the make_related_forms_table command)
+RELATED_FORMS_TABLE = os.path.join("..", "var", "related_forms.pickle")
+
 # List of finder classes that know how to find static files in
 # various locations.
 STATICFILES_FINDERS = (
@@ -72,10 +72,10 @@ INSTALLED_APPS = (
 if not DEBUG:
     CACHES = {
         'default': {
-            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
-            'LOCATION': '/usr/src/app/var/cache',
+            'BACKEND': 'reader.utils.sqlite_cache.SQLiteCache',
+            'LOCATION': '/usr/src/app/var/cache/cache.sqlite',
             'OPTIONS': {
-                'MAX_ENTRIES': '3000'
+                'MAX_ENTRIES': 3000
             }
         }
     }